@@ -2,565 +2,266 @@
 # Bilingual Terminology Extractor with Gradio Interface
 # Enhanced: Custom Prompt Mode - Follow user commands directly!
 # Repository: https://github.com/digimarketingai
+#
+# The extraction pipeline lives in the term_extract package; this file only builds the UI.
 
-import gradio as gr
-import openai
-import json
-import re
-import time
-
-def get_client(token=""):
-    return openai.OpenAI(
-        base_url="https://api.llm7.io/v1",
-        api_key=token if token.strip() else "unused",
-    )
-
-MAX_CHARS = 20000
-CHUNK_SIZE = 1500
-
-def smart_chunk(text, size=1500):
-    if not text or len(text) <= size:
-        return [text] if text else []
-    
-    chunks = []
-    paragraphs = re.split(r'\n\s*\n', text)
-    current = ""
-    
-    for para in paragraphs:
-        para = para.strip()
-        if not para:
-            continue
-        if len(current) + len(para) + 2 <= size:
-            current += para + "\n\n"
-        else:
-            if current:
-                chunks.append(current.strip())
-            current = para + "\n\n" if len(para) <= size else para[:size]
-    
-    if current:
-        chunks.append(current.strip())
-    
-    return chunks if chunks else [text[:size]]
-
-def align_chunks(source_chunks, target_chunks):
-    if not target_chunks:
-        return [(s, "") for s in source_chunks]
-    
-    if len(source_chunks) == len(target_chunks):
-        return list(zip(source_chunks, target_chunks))
-    
-    full_target = "\n\n".join(target_chunks)
-    target_len = len(full_target)
-    source_lengths = [len(s) for s in source_chunks]
-    total_source = sum(source_lengths)
-    
-    aligned = []
-    pos = 0
-    for i, src in enumerate(source_chunks):
-        ratio = source_lengths[i] / total_source
-        chunk_len = int(ratio * target_len)
-        end_pos = min(pos + chunk_len, target_len)
-        
-        if end_pos < target_len:
-            boundary = full_target.rfind('\n', pos, end_pos + 200)
-            if boundary > pos:
-                end_pos = boundary
-        
-        aligned.append((src, full_target[pos:end_pos].strip()))
-        pos = end_pos
-    
-    return aligned
+import threading
 
-def parse_terms(content):
-    terms = []
-    
-    content = content.strip()
-    if content.startswith("```"):
-        content = re.sub(r'^```\w*\n?', '', content)
-        content = re.sub(r'\n?```$', '', content)
-    
-    try:
-        match = re.search(r'\[[\s\S]*\]', content)
-        if match:
-            data = json.loads(match.group())
-            for item in data:
-                if isinstance(item, dict) and item.get('source'):
-                    src = str(item.get('source', '')).strip()
-                    tgt = str(item.get('target', item.get('translation', ''))).strip()
-                    cat = str(item.get('category', 'general')).strip().lower()
-                    
-                    if src == tgt and re.match(r'^[A-Za-z\s]+$', src):
-                        continue
-                    if any(x in src.lower() for x in ['extract', 'priority', 'category', 'include', 'skip', 'rules']):
-                        continue
-                    
-                    if src and len(src) >= 2:
-                        terms.append({'source': src, 'target': tgt, 'category': cat})
-            return terms
-    except:
-        pass
-    
-    for obj_str in re.findall(r'\{[^{}]+\}', content):
-        try:
-            obj = json.loads(obj_str)
-            if obj.get('source'):
-                src = str(obj.get('source', '')).strip()
-                tgt = str(obj.get('target', '')).strip()
-                
-                if src == tgt and re.match(r'^[A-Za-z\s]+$', src):
-                    continue
-                    
-                terms.append({
-                    'source': src,
-                    'target': tgt,
-                    'category': str(obj.get('category', 'general')).strip().lower()
-                })
-        except:
-            pass
-    
-    return terms
+import gradio as gr
 
-def is_custom_command(focus_text):
-    """
-    Detect if the focus field contains a custom command/prompt.
-    Returns True if user wants to use custom extraction logic.
-    """
-    if not focus_text or not focus_text.strip():
-        return False
-    
-    focus_lower = focus_text.lower().strip()
-    
-    # Command indicators - words that suggest a custom instruction
-    command_indicators = [
-        # English command words
-        'extract', 'find', 'get', 'list', 'identify', 'locate', 'search',
-        'only', 'just', 'specifically', 'exclusively',
-        'please', 'i want', 'i need', 'give me', 'show me',
-        'focus on', 'look for', 'pull out', 'pick out',
-        'include', 'exclude', 'ignore', 'skip',
-        'all', 'every', 'any', 'must', 'should',
-        # Chinese command words
-        '提取', '找', '找出', '列出', '識別', '搜尋', '搜索',
-        '只要', '僅', '專門', '特別',
-        '請', '我要', '我需要', '給我', '顯示',
-        '專注', '尋找', '挑出',
-        '包含', '排除', '忽略', '跳過',
-        '所有', '每個', '任何', '必須', '應該',
-        # Pattern indicators
-        'term', 'terms', 'word', 'words', 'phrase', 'phrases',
-        'name', 'names', 'entity', 'entities',
-        '術語', '詞', '詞彙', '名稱', '實體',
-    ]
-    
-    # Check for command indicators
-    for indicator in command_indicators:
-        if indicator in focus_lower:
-            return True
-    
-    # Check for sentence-like structure (has verb-like patterns)
-    # If it's longer than typical keywords and has spaces, likely a command
-    if len(focus_text.strip()) > 20 and ' ' in focus_text:
-        return True
-    
-    # Check for punctuation that suggests a sentence/command
-    if any(p in focus_text for p in ['。', '，', '.', ',', '!', '！', '?', '？']):
-        return True
-    
-    return False
+from term_extract.cancel import CancelToken
+from term_extract.export import EXPORT_FORMATS, export_terms, session_export_path
+from term_extract.config import EXTRACT_ALL_CATEGORIES, METRICS_PORT, RUN_BUDGET, UI_CONCURRENCY, UI_QUEUE_SIZE
+from term_extract.glossary import get_glossary
+from term_extract.incremental import SegmentMemo
+from term_extract.metrics import start_metrics_server
+from term_extract.pipeline import iter_extraction, iter_file_extraction
+from term_extract.scheduler import QueueFullError, scheduler
+from term_extract.termbase import termbase
+from term_extract.terms import FILTER_CHOICES, SORT_CHOICES
+
+# The CancelToken of each session's running extraction, for Stop and closed tabs
+active_runs = {}
+active_runs_lock = threading.Lock()
+
+def start_run(session, budget):
+    """A CancelToken for a new run of session; a run of the same session still going is stopped."""
+    cancel = CancelToken(budget or None)
+    if session is not None:
+        with active_runs_lock:
+            previous = active_runs.get(session)
+            active_runs[session] = cancel
+        if previous is not None:
+            previous.cancel("superseded")
+    return cancel
+
+def end_run(session, cancel):
+    with active_runs_lock:
+        if active_runs.get(session) is cancel:
+            del active_runs[session]
+
+def stop_run(request: gr.Request = None):
+    """Stop the session's run: queued and waiting segment calls are dropped, not just the UI update."""
+    session = request.session_hash if request is not None else None
+    with active_runs_lock:
+        cancel = active_runs.get(session)
+    if cancel is not None:
+        cancel.cancel("stopped")
+
+def close_session(request: gr.Request = None):
+    session = request.session_hash if request is not None else None
+    with active_runs_lock:
+        cancel = active_runs.pop(session, None)
+    if cancel is not None:
+        cancel.cancel("disconnected")
+
+def format_table(terms):
+    table = "| # | Source | Target | Category |\n|:---:|:---|:---|:---:|\n"
+    for i, t in enumerate(terms, 1):
+        src = t['source'].replace('|', '∣')
+        tgt = t['target'].replace('|', '∣')
+        cat = t.get('category', 'general')
+        table += f"| {i} | {src} | {tgt} | {cat} |\n"
+    return table
 
-def get_focus_instruction(focus):
-    """Get predefined focus instruction for simple keywords."""
-    if not focus or not focus.strip():
+def format_wait(seconds):
+    if seconds is None:
         return ""
-    
-    focus_lower = focus.lower().strip()
-    
-    focus_map = {
-        "social media": "Pay special attention to social media platforms, Facebook pages, Instagram accounts, YouTube channels, websites.",
-        "medical": "Pay special attention to diseases, symptoms, medical procedures, health terms.",
-        "organization": "Pay special attention to government departments, agencies, official bodies.",
-        "place": "Pay special attention to locations, districts, trails, parks, countries.",
-        "technical": "Pay special attention to equipment, devices, machinery, technical procedures.",
-        "chemical": "Pay special attention to chemical compounds, pesticides, larvicides, active ingredients.",
-        "date": "Pay special attention to dates, times, years, months, days, periods."
-    }
-    
-    for key, instruction in focus_map.items():
-        if key in focus_lower:
-            return instruction
-    
-    return f"Pay special attention to terms related to: {focus}"
-
-def extract_chunk_custom(source, target, custom_prompt, client):
+    if seconds < 60:
+        return f" · about {max(1, round(seconds))}s left"
+    return f" · about {seconds / 60:.0f} min left"
+
+def extract_terms(source_text, target_text, focus, term_filter, max_terms, api_token,
+                  source_file=None, target_file=None, glossary_file=None, sort_order="category",
+                  extract_all=EXTRACT_ALL_CATEGORIES, budget=RUN_BUDGET, memo=None, request: gr.Request = None,
+                  progress=gr.Progress()):
     """
-    Extract terms using custom user prompt - follows user instructions directly!
+    Stream results to the UI: the table is refreshed after every segment.
+    memo is the session's SegmentMemo, so re-runs after an edit only send
+    the changed segments to the model. Segments share the server's slots
+    with other sessions through the fair scheduler. The last output is the
+    run's TermView, which refilter_terms queries when the filter, cap or
+    sort order changes; it is None while a run is streaming.
+    budget is a time limit in seconds (0 for none): the run then stops
+    calling the model and shows the terms found so far. Stop and closing
+    the tab cancel the run's calls through its CancelToken.
     """
-    if target:
-        max_target = min(len(target), 3000 - len(source))
-        target_truncated = target[:max_target]
-        
-        prompt = f"""You are a bilingual terminology extractor. Follow the user's specific instructions.
-
-<source_text>
-{source}
-</source_text>
-
-<target_text>
-{target_truncated}
-</target_text>
-
-USER INSTRUCTION: {custom_prompt}
-
-Based on the user's instruction above, extract the requested terms from the texts.
-Output ONLY a JSON array in this format:
-[{{"source":"來源術語","target":"target term","category":"type"}}]
-
-Important:
-- Follow the user's instruction precisely
-- If user asks for specific types of terms, only extract those
-- Match source terms with their translations from the target text
-- Use appropriate categories: medical, organization, place, social, technical, chemical, date, name, general"""
-
-    else:
-        prompt = f"""You are a bilingual terminology extractor. Follow the user's specific instructions.
-
-<text>
-{source}
-</text>
-
-USER INSTRUCTION: {custom_prompt}
-
-Based on the user's instruction above, extract the requested terms from the text.
-Output ONLY a JSON array in this format:
-[{{"source":"來源術語","target":"English translation","category":"type"}}]
-
-Important:
-- Follow the user's instruction precisely
-- If user asks for specific types of terms, only extract those
-- Provide accurate translations for extracted terms
-- Use appropriate categories: medical, organization, place, social, technical, chemical, date, name, general"""
-
+    session = request.session_hash if request is not None else None
+    cancel = start_run(session, budget)
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4.1-nano-2025-04-14",
-            messages=[
-                {"role": "system", "content": "You are a precise terminology extractor. Follow user instructions exactly. Output only valid JSON arrays."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            max_tokens=2500,
-        )
-        
-        content = resp.choices[0].message.content.strip()
-        terms = parse_terms(content)
-        return terms, content
-        
-    except Exception as e:
-        return [], str(e)
-
-def extract_chunk(source, target, focus, term_filter, client):
-    """Standard extraction with predefined logic."""
-    focus_instruction = get_focus_instruction(focus)
-    extract_all = (term_filter == "all")
-    
-    term_target = "40-60" if extract_all else "25-40"
-    
-    if target:
-        max_target = min(len(target), 3000 - len(source))
-        target_truncated = target[:max_target]
-        
-        prompt = f"""You are a bilingual terminology extractor. Extract Chinese-English term pairs from the parallel texts below.
-
-<source_chinese>
-{source}
-</source_chinese>
-
-<target_english>
-{target_truncated}
-</target_english>
-
-Instructions:
-- Extract {term_target} terminology pairs
-- Match Chinese terms with their English translations from the texts
-- Include: proper nouns, technical terms, organizations, places, dates/times, chemicals, medical terms
-- {focus_instruction if focus_instruction else "Extract all types of terminology"}
-- Use categories: medical, organization, place, social, technical, chemical, date, general
-
-Output ONLY a JSON array like this:
-[{{"source":"中文術語","target":"English term","category":"type"}}]"""
-
-    else:
-        prompt = f"""You are a bilingual terminology extractor. Extract key Chinese terms with English translations from the text below.
-
-<chinese_text>
-{source}
-</chinese_text>
-
-Instructions:
-- Extract {term_target} terms with accurate English translations
-- Include: proper nouns, technical terms, organizations, places, dates/times, chemicals, medical terms
-- {focus_instruction if focus_instruction else "Extract all types of terminology"}
-- Use categories: medical, organization, place, social, technical, chemical, date, general
-
-Output ONLY a JSON array like this:
-[{{"source":"中文術語","target":"English term","category":"type"}}]"""
-
+        yield from _extract_terms(source_text, target_text, focus, term_filter, max_terms, api_token,
+                                  source_file, target_file, glossary_file, sort_order, extract_all, memo,
+                                  session, cancel, progress)
+    finally:
+        end_run(session, cancel)
+
+def _extract_terms(source_text, target_text, focus, term_filter, max_terms, api_token, source_file, target_file,
+                   glossary_file, sort_order, extract_all, memo, session, cancel, progress):
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4.1-nano-2025-04-14",
-            messages=[
-                {"role": "system", "content": "You extract terminology from texts. Output only valid JSON arrays. Never include instruction text in your output."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            max_tokens=2500,
-        )
-        
-        content = resp.choices[0].message.content.strip()
-        terms = parse_terms(content)
-        return terms, content
-        
+        glossary = get_glossary(glossary_file)
     except Exception as e:
-        return [], str(e)
-
-def dedupe(terms):
-    seen = {}
-    for t in terms:
-        key = t['source'].lower()
-        if key not in seen:
-            seen[key] = t
-        elif len(t['target']) > len(seen[key]['target']):
-            seen[key] = t
-    return list(seen.values())
-
-def validate_terms(terms):
-    valid = []
-    
-    garbage_patterns = [
-        r'^[A-Za-z\s]{2,}$',
-        r'extract|priority|category|include|skip|rules|instructions',
-        r'^[\d\.\s]+$',
-    ]
-    
-    for t in terms:
-        src = t['source'].strip()
-        tgt = t['target'].strip()
-        
-        if not src or not tgt:
-            continue
-        
-        if src.lower() == tgt.lower() and re.match(r'^[A-Za-z0-9\s\-]+$', src):
-            if len(src) <= 6 or src.upper() == src:
-                pass
-            else:
-                continue
-        
-        if any(re.search(p, src.lower()) for p in garbage_patterns[1:2]):
-            continue
-        
-        if re.match(r'^[A-Za-z\s]{10,}$', src):
-            continue
-            
-        valid.append(t)
-    
-    return valid
-
-def apply_filter(terms, term_filter):
-    if term_filter == "all":
-        terms.sort(key=lambda t: (t.get('category', 'zzz'), t['source']))
-        return terms
-    
-    filter_cats = {
-        "names": ["name", "organization", "place", "social", "website"],
-        "social": ["social", "website"],
-        "medical": ["medical", "chemical"],
-        "technical": ["technical", "equipment"],
-        "organizations": ["organization"],
-        "places": ["place", "location"],
-        "dates": ["date", "time"],
-        "general": ["general"]
-    }
-    
-    allowed = filter_cats.get(term_filter, [term_filter])
-    filtered = [t for t in terms if t.get('category', 'general') in allowed]
-    filtered.sort(key=lambda t: (t.get('category', 'zzz'), t['source']))
-    
-    return filtered
-
-def extract_terms(source_text, target_text, focus, term_filter, max_terms, api_token, progress=gr.Progress()):
-    if not source_text or not source_text.strip():
-        return "❌ Please enter source text. | 請輸入來源文本。", "", gr.update(visible=False), ""
-    
-    client = get_client(api_token)
-    
-    source_text = source_text.strip()[:MAX_CHARS]
-    target_text = target_text.strip()[:MAX_CHARS] if target_text else ""
-    focus = focus.strip() if focus else ""
-    
-    # Detect if using custom command mode
-    use_custom_mode = is_custom_command(focus) and term_filter == "all"
-    
-    progress(0.05, desc="📝 Preparing...")
-    
-    if use_custom_mode:
-        progress(0.1, desc="🎯 Custom command detected! Following your instructions...")
-    
-    source_chunks = smart_chunk(source_text, CHUNK_SIZE)
-    target_chunks = smart_chunk(target_text, CHUNK_SIZE) if target_text else []
-    aligned_pairs = align_chunks(source_chunks, target_chunks)
-    
-    progress(0.1, desc=f"🔄 Processing {len(aligned_pairs)} segment(s)...")
-    
-    all_terms = []
-    debug_logs = []
-    start_time = time.time()
-    
-    mode_label = "CUSTOM COMMAND" if use_custom_mode else "STANDARD"
-    debug_logs.append(f"Mode: {mode_label}\n")
-    if use_custom_mode:
-        debug_logs.append(f"User Command: {focus}\n")
-    
-    for i, (src, tgt) in enumerate(aligned_pairs):
-        progress(0.1 + 0.7 * ((i + 1) / len(aligned_pairs)), 
-                desc=f"🤖 Segment {i+1}/{len(aligned_pairs)}...")
-        
-        # Use custom extraction if in custom mode
-        if use_custom_mode:
-            terms, raw = extract_chunk_custom(src, tgt, focus, client)
-        else:
-            terms, raw = extract_chunk(src, tgt, focus, term_filter, client)
-        
-        debug_logs.append(f"""
-=== Segment {i+1} ===
-Source: {len(src)} chars | Target: {len(tgt)} chars
-Raw terms: {len(terms)}
-Response preview: {raw[:600]}...
-""")
-        
-        all_terms.extend(terms)
-        
-        if i < len(aligned_pairs) - 1:
-            time.sleep(0.5)
-    
-    progress(0.85, desc="🔍 Cleaning results...")
-    
-    valid_terms = validate_terms(all_terms)
-    unique_terms = dedupe(valid_terms)
-    raw_count = len(unique_terms)
-    
-    # Skip category filtering in custom mode - respect user's instruction
-    if use_custom_mode:
-        filtered_terms = unique_terms
-        filtered_terms.sort(key=lambda t: (t.get('category', 'zzz'), t['source']))
+        yield f"❌ Could not read glossary: {e} | 無法讀取術語表。", [], gr.update(visible=False), "", None
+        return
+    
+    if source_file:
+        # Uploaded files are streamed from disk without the pasted-text length cap
+        runs = iter_file_extraction(source_file, target_file, focus, term_filter, max_terms,
+                                    api_token=api_token, progress=progress, glossary=glossary,
+                                    termbase=termbase, memo=memo, scheduler=scheduler, session=session,
+                                    extract_all=extract_all, cancel=cancel)
+    elif source_text and source_text.strip():
+        runs = iter_extraction(source_text, target_text, focus, term_filter, max_terms,
+                               api_token=api_token, progress=progress, glossary=glossary,
+                               termbase=termbase, memo=memo, scheduler=scheduler, session=session,
+                               extract_all=extract_all, cancel=cancel)
     else:
-        filtered_terms = apply_filter(unique_terms, term_filter)
-    
-    filtered_count = len(filtered_terms)
-    
-    final_terms = filtered_terms[:max_terms]
+        yield "❌ Please enter source text. | 請輸入來源文本。", [], gr.update(visible=False), "", None
+        return
     
-    elapsed = time.time() - start_time
-    
-    debug_log = f"""=== EXTRACTION SUMMARY ===
-Mode: {mode_label}
-Token: {'Provided' if api_token.strip() else 'Anonymous'}
-Focus/Command: {focus if focus else 'None'}
-Filter: {term_filter}
-Segments: {len(aligned_pairs)}
-Time: {elapsed:.1f}s
-
-Raw extracted: {len(all_terms)}
-After validation: {len(valid_terms)}
-After dedupe: {raw_count}
-After filter: {filtered_count}
-Final: {len(final_terms)}
-
-{"".join(debug_logs)}
-"""
+    final = None
+    try:
+        for run in runs:
+            if not run['done']:
+                wait = format_wait(run.get('estimated_wait'))
+                if run['terms']:
+                    status = (f"⏳ **{len(run['terms'])} terms** so far · "
+                              f"segment {run['segments_done']}/{run['segments']}{wait} | 處理中...")
+                    yield (f"{status}\n\n{format_table(run['terms'])}", run['terms'],
+                           gr.update(visible=True), "", None)
+                elif not run['segments_done']:
+                    yield (f"⏳ Queued: {run['segments']} segment(s){wait} | 排隊中...", [],
+                           gr.update(visible=False), "", None)
+                continue
+            final = run
+    except QueueFullError as e:
+        yield f"🚦 Server busy: {e} | 伺服器繁忙，請稍後再試。", [], gr.update(visible=False), "", None
+        return
+    
+    if final is None:
+        # The run stopped without its final result; there is nothing to report
+        yield "❌ The run ended without a result. | 未能完成提取。", [], gr.update(visible=False), "", None
+        return
+    run = final
+    final_terms = run['terms']
+    use_custom_mode = run['custom_mode']
+    raw_count = run['raw_count']
+    debug_log = run['debug_log']
     
     if not final_terms:
+        if run['failed_segments'] and len(run['failed_segments']) == run['segments']:
+            error = run['failed_segments'][0]['error']
+            yield (f"❌ All API calls failed: {error} | API 調用失敗。", [], gr.update(visible=False), debug_log,
+                   None)
+            return
         msg = f"⚠️ No terms found"
-        if use_custom_mode:
+        if run['partial']:
+            msg = (f"⏱️ Stopped ({run['partial']}) after {run['segments_done']}/{run['segments']} segments "
+                   f"with no terms yet.\n💡 Allow more time or leave the budget at 0. | 時間不足。")
+        elif use_custom_mode:
             msg += f" matching your command.\n💡 Try a different instruction or simpler request."
         elif term_filter != "all":
             msg += f" matching filter '{term_filter}'.\n💡 Try setting Filter to **'all'**."
-        return msg, "", gr.update(visible=False), debug_log
+        yield msg, [], gr.update(visible=False), debug_log, run['view']
+        return
     
     progress(0.95, desc="📊 Formatting...")
     
-    # Build result table
-    table = "| # | Source | Target | Category |\n|:---:|:---|:---|:---:|\n"
-    for i, t in enumerate(final_terms, 1):
-        src = t['source'].replace('|', '∣')
-        tgt = t['target'].replace('|', '∣')
-        cat = t.get('category', 'general')
-        table += f"| {i} | {src} | {tgt} | {cat} |\n"
+    view = run['view']
+    if sort_order != "category":
+        _, final_terms = view.query(term_filter, int(max_terms), sort_order)
     
-    # Build CSV
-    csv_lines = ["Source,Target,Category"]
-    for t in final_terms:
-        src_csv = t["source"].replace('"', '""')
-        tgt_csv = t["target"].replace('"', '""')
-        csv_lines.append(f'"{src_csv}","{tgt_csv}","{t.get("category", "general")}"')
-    csv_content = "\n".join(csv_lines)
+    # Build result table
+    recorder = run['recorder']
+    with recorder.span("format", terms=len(final_terms)):
+        table = format_table(final_terms)
+    recorder.flush()
     
     progress(1.0, desc="✅ Done!")
     
     # Build result message
     mode_note = "🎯 **Custom Mode**" if use_custom_mode else ""
     filter_note = ""
-    if not use_custom_mode and filtered_count < raw_count:
+    if not use_custom_mode and run['filtered_count'] < raw_count:
         filter_note = f" (filtered from {raw_count})"
     
-    result = f"✅ **{len(final_terms)} terms** extracted in {elapsed:.1f}s{filter_note}\n{mode_note}\n\n{table}"
-    
-    return result, csv_content, gr.update(visible=True), debug_log
-
-def save_file(csv_content, fmt):
-    if not csv_content:
+    failed = run['failed_segments']
+    failed_note = ""
+    if failed:
+        failed_note = (f"\n⚠️ {len(failed)} of {run['segments']} segment(s) failed and were skipped: "
+                       f"{', '.join(str(f['segment']) for f in failed)} (see Debug Log) | 部分段落失敗")
+    
+    reuse_note = ""
+    if run['reused_segments']:
+        reuse_note = f" · {run['reused_segments']}/{run['segments']} unchanged segments reused"
+    recalled = run['sentence_memory']
+    if recalled and recalled['recalled']:
+        reuse_note += (f" · {recalled['recalled']}/{recalled['sentences']} sentences recalled "
+                       f"({recalled['tokens_saved']} tokens not sent)")
+    
+    partial_note = ""
+    if run['partial']:
+        partial_note = (f"\n⏱️ **Partial result**: stopped ({run['partial']}) after {run['segments_done']} of "
+                        f"{run['segments']} segments; run again to finish (done segments are reused) | 部分結果")
+    
+    result = (f"✅ **{len(final_terms)} terms** extracted in {run['elapsed']:.1f}s{filter_note}{reuse_note}\n{mode_note}"
+              f"{partial_note}{failed_note}\n\n{table}")
+    
+    yield result, final_terms, gr.update(visible=True), debug_log, view
+
+def refilter_terms(view, term_filter, max_terms, sort_order, focus=""):
+    """Re-filter, re-cap or re-sort the last run's terms locally; no model calls."""
+    if view is None:
+        return gr.update(), gr.update()
+    filtered, terms = view.query(term_filter, int(max_terms), sort_order)
+    coverage_note = ""
+    if view.command is not None and not view.covers(term_filter, focus):
+        coverage_note = (f"\n⚠️ The last run followed a custom command, which may have limited its terms; "
+                         f"press Extract for the full '{term_filter}' set. | 請重新提取以取得完整結果。")
+    elif not view.covers(term_filter, focus):
+        coverage_note = (f"\n⚠️ The last run only extracted '{view.extracted_filter}' terms; "
+                         f"press Extract for the full '{term_filter}' set. | 請重新提取以取得完整結果。")
+    if not terms:
+        return f"⚠️ None of the last run's {len(view)} terms match filter '{term_filter}'.{coverage_note}", []
+    cap_note = f" (first {len(terms)} of {len(filtered)})" if len(terms) < len(filtered) else ""
+    return (f"🔁 **{len(terms)} terms**{cap_note} · filter '{term_filter}' · sorted by {sort_order} · "
+            f"from the last run's {len(view)} terms, no new extraction | 本地篩選{coverage_note}\n\n"
+            f"{format_table(terms)}", terms)
+
+def save_file(terms, fmt, request: gr.Request = None):
+    """Write the session's terms straight to a download file private to that session."""
+    if not terms or fmt not in EXPORT_FORMATS:
         return None
-    
-    lines = csv_content.strip().split('\n')[1:]
-    terms = []
-    for line in lines:
-        parts = line.split('","')
-        if len(parts) >= 3:
-            terms.append({
-                'source': parts[0].strip('"'),
-                'target': parts[1],
-                'category': parts[2].strip('"')
-            })
-    
-    paths = {"csv": "/tmp/terms.csv", "json": "/tmp/terms.json", 
-             "tsv": "/tmp/glossary.tsv", "tbx": "/tmp/terms.tbx"}
-    path = paths.get(fmt)
-    
-    if fmt == "csv":
-        with open(path, "w", encoding="utf-8-sig") as f:
-            f.write(csv_content)
-    elif fmt == "json":
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"terms": terms}, f, indent=2, ensure_ascii=False)
-    elif fmt == "tsv":
-        with open(path, "w", encoding="utf-8") as f:
-            for t in terms:
-                f.write(f"{t['source']}\t{t['target']}\n")
-    elif fmt == "tbx":
-        tbx = '<?xml version="1.0"?>\n<martif type="TBX"><text><body>\n'
-        for i, t in enumerate(terms):
-            tbx += f'<termEntry id="t{i+1}"><langSet xml:lang="zh"><tig><term>{t["source"]}</term></tig></langSet><langSet xml:lang="en"><tig><term>{t["target"]}</term></tig></langSet></termEntry>\n'
-        tbx += '</body></text></martif>'
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(tbx)
-    
-    return path
+    session_id = request.session_hash if request is not None else None
+    try:
+        return export_terms(terms, fmt, session_export_path(session_id, fmt))
+    except ValueError as e:
+        raise gr.Error(str(e))
+
+def download_handler(fmt):
+    def handler(terms, request: gr.Request):
+        return save_file(terms, fmt, request)
+    return handler
+
+def search_termbase(query, term_filter):
+    """Look up the accumulated termbase by source prefix, or list a category."""
+    if termbase is None:
+        return "Termbase is disabled. | 術語庫已停用。"
+    query = (query or "").strip()
+    if query:
+        terms = termbase.lookup_prefix(query, limit=200)
+    else:
+        terms = termbase.select(term_filter, limit=200)
+    if not terms:
+        return f"No stored terms found ({termbase.size()} in termbase). | 找不到術語。"
+    return f"**{len(terms)}** of {termbase.size()} stored terms\n\n{format_table(terms)}"
 
 def clear_all():
-    return "", "", "", "all", 150, "", "📋 Ready | 準備就緒", "", gr.update(visible=False)
+    return ("", "", "", "all", 150, "category", EXTRACT_ALL_CATEGORIES, RUN_BUDGET, "", "📋 Ready | 準備就緒", [],
+            gr.update(visible=False), None, None, None, SegmentMemo(), None)
 
 # ========== UI ==========
 with gr.Blocks(title="Term Extractor v3.7", theme=gr.themes.Soft()) as demo:
-    
+
     gr.Markdown("# 🔤 Terminology Extraction Tool v3.7")
     gr.Markdown("Extract bilingual terminology from parallel texts. | 從平行文本中提取雙語術語。")
     gr.Markdown("*By [digimarketingai](https://github.com/digimarketingai)*")
@@ -579,6 +280,26 @@ with gr.Blocks(title="Term Extractor v3.7", theme=gr.themes.Soft()) as demo:
                 placeholder="Paste English translation for better accuracy... | 貼上英文翻譯以提高準確性..."
             )
     
+    with gr.Accordion("📂 Upload Files (no length limit) | 上傳檔案（無長度限制）", open=False):
+        with gr.Row():
+            source_file = gr.File(
+                label="📄 Source File | 來源檔案",
+                file_types=[".txt", ".md"],
+                type="filepath"
+            )
+            target_file = gr.File(
+                label="📝 Target File (Optional) | 目標檔案（選填）",
+                file_types=[".txt", ".md"],
+                type="filepath"
+            )
+        gr.Markdown("Uploaded files are used instead of the text boxes above. | 上傳檔案時將取代上方文本框。")
+        glossary_file = gr.File(
+            label="📚 Known Glossary (Optional) | 已知術語表（選填）",
+            file_types=[".csv", ".tsv", ".json", ".tbx"],
+            type="filepath"
+        )
+        gr.Markdown("Glossary terms found in the source are added directly and skipped by the model. | 來源中出現的已知術語會直接加入，模型不再重複提取。")
+    
     with gr.Row():
         focus_box = gr.Textbox(
             label="🎯 Focus / Custom Command | 提取重點 / 自訂指令", 
@@ -588,7 +309,7 @@ with gr.Blocks(title="Term Extractor v3.7", theme=gr.themes.Soft()) as demo:
         )
         filter_dd = gr.Dropdown(
             label="📁 Filter | 篩選", 
-            choices=["all", "social", "medical", "organizations", "places", "dates", "technical", "general"], 
+            choices=FILTER_CHOICES, 
             value="all",
             info="Set to 'all' for custom commands | 設為 'all' 以使用自訂指令",
             scale=1
@@ -602,6 +323,27 @@ with gr.Blocks(title="Term Extractor v3.7", theme=gr.themes.Soft()) as demo:
             scale=1
         )
     
+    with gr.Row():
+        sort_dd = gr.Dropdown(
+            label="↕️ Sort | 排序",
+            choices=SORT_CHOICES,
+            value="category",
+            scale=1
+        )
+        extract_all_box = gr.Checkbox(
+            label="Extract all categories once | 一次提取所有類別",
+            value=EXTRACT_ALL_CATEGORIES,
+            info="Any filter is then applied to the same results without calling the model again | 之後切換篩選不需重新提取",
+            scale=2
+        )
+        budget_box = gr.Number(
+            label="⏱️ Time Budget (s) | 時間限制（秒）",
+            value=RUN_BUDGET,
+            minimum=0,
+            info="Stop and show the terms found so far after this long; 0 for no limit | 0 表示不限時",
+            scale=1
+        )
+    
     with gr.Accordion("🔑 API Token (Optional) | API 令牌（選填）", open=False):
         token_box = gr.Textbox(
             label="LLM7 Token", 
@@ -612,17 +354,28 @@ with gr.Blocks(title="Term Extractor v3.7", theme=gr.themes.Soft()) as demo:
     
     with gr.Row():
         extract_btn = gr.Button("🚀 Extract | 提取", variant="primary", scale=2)
+        stop_btn = gr.Button("⏹️ Stop | 停止", scale=1)
         clear_btn = gr.Button("🗑️ Clear | 清除", scale=1)
     
     result_box = gr.Markdown("📋 Ready | 準備就緒")
-    csv_state = gr.State("")
+    terms_state = gr.State([])  # list of term dicts for this session
+    memo_state = gr.State(SegmentMemo())  # per-segment results, reused when the text is edited and re-run
+    view_state = gr.State(None)  # the last run's TermView, re-queried when the filter, cap or sort changes
     
     download_row = gr.Row(visible=False)
     with download_row:
-        gr.Button("📥 CSV").click(lambda c: save_file(c, "csv"), [csv_state], [gr.File()])
-        gr.Button("📥 JSON").click(lambda c: save_file(c, "json"), [csv_state], [gr.File()])
-        gr.Button("📥 TSV").click(lambda c: save_file(c, "tsv"), [csv_state], [gr.File()])
-        gr.Button("📥 TBX").click(lambda c: save_file(c, "tbx"), [csv_state], [gr.File()])
+        for fmt in EXPORT_FORMATS:
+            gr.Button(f"📥 {fmt.upper()}").click(download_handler(fmt), [terms_state], [gr.File()])
+    
+    with gr.Accordion("🗄️ Termbase | 術語庫", open=False):
+        gr.Markdown("Every extraction is merged into a persistent termbase. Search by source prefix, or leave empty to list a category. | 每次提取結果都會併入術語庫。")
+        with gr.Row():
+            termbase_query = gr.Textbox(label="Source prefix | 來源前綴", scale=2)
+            termbase_filter = gr.Dropdown(label="📁 Filter | 篩選", choices=FILTER_CHOICES, value="all", scale=1)
+            termbase_btn = gr.Button("🔎 Search | 搜尋", scale=1)
+        termbase_box = gr.Markdown()
+        termbase_btn.click(search_termbase, [termbase_query, termbase_filter], [termbase_box])
+        termbase_query.submit(search_termbase, [termbase_query, termbase_filter], [termbase_box])
     
     with gr.Accordion("🔧 Debug Log | 除錯日誌", open=False):
         debug_box = gr.Textbox(lines=15, show_copy_button=True)
@@ -666,18 +419,37 @@ with gr.Blocks(title="Term Extractor v3.7", theme=gr.themes.Soft()) as demo:
 - **Filter = 'all'**: Maximum extraction OR custom commands
 - **With target text**: More accurate translations
 - **Max Terms**: Limit results to top N terms
+- **Filter, Max Terms and Sort** re-query the last run's results instantly; only a filter outside what was extracted needs a new run
         """)
     
-    extract_btn.click(
+    # Minimal progress keeps the partial table visible while segments stream in
+    # Many runs at once; the scheduler shares the API fairly between their segments
+    extract_event = extract_btn.click(
         extract_terms, 
-        [source_box, target_box, focus_box, filter_dd, max_slider, token_box],
-        [result_box, csv_state, download_row, debug_box]
+        [source_box, target_box, focus_box, filter_dd, max_slider, token_box, source_file, target_file, glossary_file,
+         sort_dd, extract_all_box, budget_box, memo_state],
+        [result_box, terms_state, download_row, debug_box, view_state],
+        show_progress="minimal",
+        concurrency_limit=UI_CONCURRENCY,
     )
+    # Stop also cancels the run's segment calls, which would otherwise go on after the UI stops listening
+    stop_btn.click(stop_run, cancels=[extract_event])
+    demo.unload(close_session)
+    
+    # Local queries on the last run: user changes only, so clear_all's resets don't trigger them
+    refilter_inputs = [view_state, filter_dd, max_slider, sort_dd, focus_box]
+    filter_dd.input(refilter_terms, refilter_inputs, [result_box, terms_state])
+    sort_dd.input(refilter_terms, refilter_inputs, [result_box, terms_state])
+    max_slider.release(refilter_terms, refilter_inputs, [result_box, terms_state])
     
     clear_btn.click(clear_all, outputs=[
-        source_box, target_box, focus_box, filter_dd, max_slider, 
-        token_box, result_box, csv_state, download_row
+        source_box, target_box, focus_box, filter_dd, max_slider, sort_dd, extract_all_box, budget_box,
+        token_box, result_box, terms_state, download_row, source_file, target_file, glossary_file, memo_state,
+        view_state
     ])
 
 if __name__ == "__main__":
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    demo.queue(max_size=UI_QUEUE_SIZE)
     demo.launch(share=True)
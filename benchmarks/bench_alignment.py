@@ -0,0 +1,110 @@
+# Benchmark: sentence aligner speed and accuracy, and how much target text reaches the prompt.
+#
+#   python benchmarks/bench_alignment.py [--sentences 10000] [--band 30]
+#
+# Builds a synthetic parallel document from known sentence pairs with
+# random deletions, insertions and 1-2 merges, so the gold alignment is
+# known. Reports align_sentences time and bead recall/precision, and
+# compares the share of target text that ends up in prompts for the old
+# chunk path (smart_chunk + align_chunks + 3000-char rule) and the new one
+# (align_segments + fit_target).
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from term_extract.alignment import align_segments, align_sentences
+from term_extract.chunking import align_chunks, smart_chunk
+from term_extract.config import ALIGN_BAND, CHUNK_SIZE
+from term_extract.prompts import fit_target
+
+PAIRS = [
+    ("衞生署衞生防護中心今日呼籲市民提高警覺，預防登革熱。",
+     "The Centre for Health Protection of the Department of Health today urged the public to stay alert against dengue fever."),
+    ("漁農自然護理署在郊野公園進行滅蚊工作，使用殺幼蟲劑。",
+     "The Agriculture, Fisheries and Conservation Department carried out mosquito control in country parks using larvicides."),
+    ("食物環境衞生署將加強屋苑及建築地盤的防蚊措施。",
+     "The Food and Environmental Hygiene Department will step up anti-mosquito measures at housing estates and construction sites."),
+    ("市民可瀏覽衞生防護中心網頁或Facebook專頁了解最新消息。",
+     "Members of the public may visit the CHP website or Facebook page for the latest information."),
+    ("二零二四年七月，香港錄得多宗本地登革熱個案。",
+     "In July 2024, Hong Kong recorded several local cases of dengue fever."),
+    ("你有沒有注意到？", "Have you noticed?"),
+    ("如出現發燒等症狀，請立即求醫！", "Seek medical advice immediately if you develop a fever!"),
+    ("截至今日共錄得12宗個案，其中3宗為本地個案。", "So far 12 cases have been recorded, 3 of which are local."),
+]
+
+def synthetic_document(sentences, seed=11):
+    rng = random.Random(seed)
+    source, target, gold = [], [], set()
+    for _ in range(sentences):
+        zh, en = rng.choice(PAIRS)
+        r = rng.random()
+        if r < 0.03:
+            source.append(zh)
+        elif r < 0.06:
+            target.append(en)
+        elif r < 0.12:
+            zh2, en2 = rng.choice(PAIRS)
+            source.append(zh + zh2)
+            target.extend([en, en2])
+            gold.add(((len(source) - 1,), (len(target) - 2, len(target) - 1)))
+        else:
+            source.append(zh)
+            target.append(en)
+            gold.add(((len(source) - 1,), (len(target) - 1,)))
+    return source, target, gold
+
+def paragraphs(sentences, rng, joiner):
+    out, i = [], 0
+    while i < len(sentences):
+        n = rng.randint(2, 8)
+        out.append(joiner.join(sentences[i:i + n]))
+        i += n
+    return "\n\n".join(out)
+
+def target_share_old(source_text, target_text):
+    pairs = align_chunks(smart_chunk(source_text, CHUNK_SIZE), smart_chunk(target_text, CHUNK_SIZE))
+    sent = sum(len(tgt[:max(0, min(len(tgt), 3000 - len(src)))]) for src, tgt in pairs)
+    return len(pairs), sent
+
+def target_share_new(source_text, target_text):
+    pairs = align_segments(source_text, target_text)
+    sent = sum(len(fit_target(src, tgt)) for src, tgt in pairs)
+    return len(pairs), sent
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentence alignment benchmark")
+    parser.add_argument("--sentences", type=int, default=10000, help="Sentence pairs in the document")
+    parser.add_argument("--band", type=int, default=ALIGN_BAND, help="Aligner band half-width")
+    args = parser.parse_args()
+    
+    source, target, gold = synthetic_document(args.sentences)
+    start = time.perf_counter()
+    beads = align_sentences(source, target, args.band)
+    elapsed = time.perf_counter() - start
+    found = {b for b in beads if b[0] and b[1]}
+    correct = len(found & gold)
+    
+    print(f"Source sentences: {len(source):,} | Target sentences: {len(target):,} | Band: {args.band}")
+    print(f"align_sentences: {elapsed:.2f}s ({len(source) / elapsed:,.0f} sentences/s)")
+    print(f"Bead precision: {correct / len(found):.3f} | recall: {correct / len(gold):.3f}")
+    
+    rng = random.Random(5)
+    source_text = paragraphs(source, rng, "")
+    target_text = paragraphs(target, rng, " ")
+    target_chars = len(target_text)
+    print(f"{'segmenter':<34}{'segments':>10}{'target chars sent':>20}{'seconds':>10}")
+    for name, fn in (("smart_chunk + align_chunks", target_share_old),
+                     ("align_segments + fit_target", target_share_new)):
+        start = time.perf_counter()
+        segments, sent = fn(source_text, target_text)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<34}{segments:>10}{100.0 * sent / target_chars:>19.1f}%{elapsed:>10.2f}")
+
+if __name__ == "__main__":
+    main()
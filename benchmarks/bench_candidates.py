@@ -0,0 +1,113 @@
+# Benchmark: statistical candidate ranking speed, and prompt tokens saved by prefilter mode.
+#
+#   python benchmarks/bench_candidates.py [--mb 1 5] [--doc-kb 200]
+#
+# Generates synthetic Chinese text: random filler words with a Zipf
+# distribution and a planted vocabulary of terms scattered through it.
+# First times rank_candidates on documents of each --mb size and reports
+# how many of the planted terms that occur at least twice it ranks.
+# Then runs one --doc-kb document through run_file_extraction against
+# benchmarks/mock_server.py twice, with whole segments and with
+# prefilter, and compares model calls and prompt tokens. (The mock's
+# answers do not depend on what it is asked, so completion tokens are
+# only indicative.)
+
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mock_server import MockServer
+
+from term_extract import llm, memory
+from term_extract.candidates import rank_candidates
+from term_extract.llm import RateLimiter
+from term_extract.metrics import Recorder
+from term_extract.pipeline import run_file_extraction
+
+HAN = [chr(c) for c in range(0x4e00, 0x4e00 + 2500)]
+
+def synthetic_document(chars, seed, terms=400, words=4000):
+    """(text, planted terms) with about chars characters."""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices(HAN, k=rng.randint(2, 6))) for _ in range(terms)]
+    filler = ["".join(rng.choices(HAN, k=rng.randint(1, 2))) for _ in range(words)]
+    filler_weights = [1 / (rank + 1) for rank in range(words)]
+    term_weights = [1 / (rank + 1) ** 0.8 for rank in range(terms)]
+    parts, size = [], 0
+    while size < chars:
+        tokens = rng.choices(filler, filler_weights, k=rng.randint(6, 18))
+        for i in range(len(tokens)):
+            if rng.random() < 0.12:
+                tokens[i] = rng.choices(vocabulary, term_weights)[0]
+        sentence = "".join(tokens) + rng.choice("。。。，")
+        if rng.random() < 0.15:
+            sentence += "\n"
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts), vocabulary
+
+def rank_speed(mb, seed):
+    text, vocabulary = synthetic_document(int(mb * 1024 * 1024 / 3), seed)  # ~3 bytes a character in UTF-8
+    start = time.perf_counter()
+    candidates = rank_candidates(text, limit=None)
+    elapsed = time.perf_counter() - start
+    counts = Counter()
+    for term in vocabulary:
+        counts[term] = text.count(term)
+    repeated = {t for t, c in counts.items() if c >= 2}
+    found = repeated & {c['source'] for c in candidates}
+    top = repeated & {c['source'] for c in candidates[:len(repeated)]}
+    print(f"{len(text.encode('utf-8')) / (1024 * 1024):5.1f} MB {len(text):>10,} chars {elapsed:7.1f}s "
+          f"{len(text) / elapsed:>10,.0f} chars/s {len(candidates):>8,} candidates | planted terms ranked "
+          f"{len(found)}/{len(repeated)}, in the top {len(repeated)}: {len(top)}")
+
+def token_savings(doc_kb, seed):
+    text, _ = synthetic_document(doc_kb * 1024 // 3, seed)
+    llm.response_cache = None
+    memory.sentence_memory = None
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, MockServer(latency="fixed:0.01") as server:
+        path = os.path.join(tmp, "source.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        client = llm.new_client("bench", server.url)
+        for label, prefilter in (("segments", False), ("prefilter", True)):
+            recorder = Recorder()
+            start = time.perf_counter()
+            result = run_file_extraction(path, client=client, limiter=RateLimiter(0), recorder=recorder,
+                                         prefilter=prefilter)
+            elapsed = time.perf_counter() - start
+            usage = recorder.summary().get("llm.call", {})
+            rows.append((label, result['segments'], usage.get('count', 0), usage.get('prompt_tokens', 0),
+                         usage.get('completion_tokens', 0), len(result['terms']), elapsed))
+        client.close()
+    
+    print(f"\n{doc_kb} KB document ({len(text):,} chars)")
+    print(f"{'mode':<11}{'segments':>9}{'calls':>7}{'prompt tok':>12}{'compl. tok':>12}{'terms':>7}{'time':>8}")
+    for label, segments, calls, prompt, completion, terms, elapsed in rows:
+        print(f"{label:<11}{segments:>9}{calls:>7}{prompt:>12,}{completion:>12,}{terms:>7}{elapsed:>7.1f}s")
+    base, pre = rows[0][3], rows[1][3]
+    if base:
+        print(f"Prompt tokens saved: {100 * (base - pre) / base:.0f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Candidate ranking and prefilter benchmark")
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 5], help="Document sizes to rank, in MB")
+    parser.add_argument("--doc-kb", type=int, default=200, help="Document size for the token comparison")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    for mb in args.mb:
+        rank_speed(mb, args.seed)
+    print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB")
+    token_savings(args.doc_kb, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Benchmark: a new OpenAI client per request versus the shared client pool.
+#
+#   python benchmarks/bench_clients.py [--users 8] [--runs 10] [--calls 4] [--tokens 2]
+#                                      [--latency fixed:0.02] [--handshake 0.05]
+#
+# Simulates the UI under multi-user load against benchmarks/mock_server.py:
+# --users threads each perform --runs extractions of --calls model calls,
+# spread over --tokens distinct API tokens. "per-request" builds a fresh
+# client (and connection pool) for every run, as get_client used to;
+# "pooled" leases the shared client for the token from llm.client_pool.
+# The mock server's --handshake delay stands in for the TCP and TLS setup
+# of a real endpoint, so the difference shows up as connections opened and
+# per-call latency. Client construction time is reported separately.
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mock_server import MockServer
+
+from term_extract import llm, memory
+from term_extract.llm import ClientPool, chat_completion, new_client
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return pick(0.5), pick(0.9), pick(0.99)
+
+def run_mode(mode, args):
+    pool = ClientPool()
+    setup, calls, runs = [], [], []
+    lock = threading.Lock()
+    
+    with MockServer(latency=args.latency, handshake=args.handshake, seed=args.seed) as server:
+        def user(u):
+            token = f"token-{u % args.tokens}"
+            for r in range(args.runs):
+                run_start = time.perf_counter()
+                if mode == "pooled":
+                    lease = pool.lease(token, server.url)
+                    client = lease.__enter__()
+                else:
+                    client = new_client(token, server.url)
+                setup_seconds = time.perf_counter() - run_start
+                samples = []
+                for c in range(args.calls):
+                    start = time.perf_counter()
+                    chat_completion(client, "system", f"<text>用戶{u}請求{r}段落{c}</text>")
+                    samples.append(time.perf_counter() - start)
+                if mode == "pooled":
+                    lease.__exit__(None, None, None)
+                else:
+                    client.close()
+                with lock:
+                    setup.append(setup_seconds)
+                    calls.extend(samples)
+                    runs.append(time.perf_counter() - run_start)
+        
+        start = time.perf_counter()
+        threads = [threading.Thread(target=user, args=(u,)) for u in range(args.users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - start
+        stats = dict(server.stats)
+    pool.close()
+    return {
+        "mode": mode,
+        "connections": stats["connections"],
+        "requests": stats["requests"],
+        "setup": percentiles(setup),
+        "call": percentiles(calls),
+        "run": percentiles(runs),
+        "wall": wall,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request clients versus the shared client pool")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent users (threads)")
+    parser.add_argument("--runs", type=int, default=10, help="Extractions per user")
+    parser.add_argument("--calls", type=int, default=4, help="Model calls per extraction")
+    parser.add_argument("--tokens", type=int, default=2, help="Distinct API tokens among the users")
+    parser.add_argument("--latency", default="fixed:0.02", help="Mock latency spec (see mock_server.py)")
+    parser.add_argument("--handshake", type=float, default=0.05, help="Mock connection setup seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    llm.response_cache = None
+    memory.sentence_memory = None
+    results = [run_mode("per-request", args), run_mode("pooled", args)]
+    
+    print(f"{args.users} users x {args.runs} runs x {args.calls} calls, {args.tokens} token(s), "
+          f"latency {args.latency}, handshake {args.handshake:g}s")
+    print(f"{'mode':<13}{'conns':>7}{'setup p50':>11}{'call p50':>10}{'call p90':>10}{'call p99':>10}"
+          f"{'run p50':>10}{'wall s':>8}")
+    for r in results:
+        print(f"{r['mode']:<13}{r['connections']:>7}{r['setup'][0]:>9.2f}ms{r['call'][0]:>8.1f}ms"
+              f"{r['call'][1]:>8.1f}ms{r['call'][2]:>8.1f}ms{r['run'][0]:>8.1f}ms{r['wall']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Benchmark: exporting a large glossary in every format.
+#
+#   python benchmarks/bench_export.py [--terms 1000000]
+#
+# Each format runs in a fresh subprocess that first builds the term list
+# (as the UI holds it in session state), then exports it; "growth" is the
+# peak RSS added by the export itself. "csv (legacy)" is the previous UI
+# path: build the whole CSV string, split it back into terms and write it.
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+CATEGORIES = ["medical", "organization", "place", "social", "technical", "chemical", "date", "general"]
+
+def synthetic_terms(count):
+    return [
+        {'source': f"衞生防護中心{i}號", 'target': f'Centre "{i}" for Health & Protection', 'category': CATEGORIES[i % 8]}
+        for i in range(count)
+    ]
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def legacy_csv(terms, path):
+    from term_extract.export import format_csv
+    csv_content = format_csv(terms)
+    parsed = []
+    for line in csv_content.strip().split('\n')[1:]:
+        parts = line.split('","')
+        if len(parts) >= 3:
+            parsed.append({'source': parts[0].strip('"'), 'target': parts[1], 'category': parts[2].strip('"')})
+    with open(path, "w", encoding="utf-8-sig") as f:
+        f.write(csv_content)
+
+def run_format(fmt, count, directory):
+    from term_extract.export import export_terms
+    
+    terms = synthetic_terms(count)
+    baseline = peak_rss_mb()
+    path = os.path.join(directory, f"terms.{fmt.split()[0]}")
+    start = time.perf_counter()
+    if fmt == "csv (legacy)":
+        legacy_csv(terms, path)
+    else:
+        export_terms(terms, fmt, path)
+    elapsed = time.perf_counter() - start
+    return {
+        "format": fmt,
+        "seconds": round(elapsed, 2),
+        "mb": round(os.path.getsize(path) / (1024 * 1024), 1),
+        "growth_mb": round(peak_rss_mb() - baseline, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Export benchmark")
+    parser.add_argument("--terms", type=int, default=1_000_000, help="Terms to export")
+    parser.add_argument("--format", help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.format:
+        print(json.dumps(run_format(args.format, args.terms, args.dir)))
+        return
+    
+    print(f"Terms: {args.terms:,}")
+    print(f"{'format':<14}{'seconds':>10}{'file':>10}{'RSS growth':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("csv (legacy)", "csv", "json", "tsv", "tbx", "xlsx"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--terms", str(args.terms), "--format", fmt, "--dir", tmp],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{r['format']:<14}{r['seconds']:>10}{r['mb']:>7} MB{r['growth_mb']:>11} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Benchmark: streaming large-document input vs the in-memory text path.
+#
+#   python benchmarks/bench_large_document.py [--mb 5]
+#
+# Writes a synthetic Chinese/English document pair of the given size to a
+# temp directory, then runs each mode in a fresh subprocess so peak RSS is
+# measured independently. The model is replaced by an instant canned
+# response so only local work is timed. memory-pipeline goes through the
+# pasted-text path and is therefore still capped at MAX_CHARS.
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+ZH_SENTENCES = [
+    "衞生署衞生防護中心今日呼籲市民提高警覺，預防登革熱。",
+    "漁農自然護理署在郊野公園進行滅蚊工作，使用殺幼蟲劑。",
+    "食物環境衞生署將加強屋苑及建築地盤的防蚊措施。",
+    "市民可瀏覽衞生防護中心網頁或Facebook專頁了解最新消息。",
+    "二零二四年七月，香港錄得多宗本地登革熱個案。",
+]
+EN_SENTENCES = [
+    "The Centre for Health Protection of the Department of Health today urged the public to stay alert against dengue fever.",
+    "The Agriculture, Fisheries and Conservation Department carried out mosquito control in country parks using larvicides.",
+    "The Food and Environmental Hygiene Department will step up anti-mosquito measures at housing estates and construction sites.",
+    "Members of the public may visit the CHP website or Facebook page for the latest information.",
+    "In July 2024, Hong Kong recorded several local cases of dengue fever.",
+]
+
+CANNED = json.dumps([
+    {"source": "登革熱", "target": "dengue fever", "category": "medical"},
+    {"source": "衞生防護中心", "target": "Centre for Health Protection", "category": "organization"},
+], ensure_ascii=False)
+
+class _Message:
+    content = CANNED
+
+class _Choice:
+    message = _Message()
+    finish_reason = "stop"
+
+class _Response:
+    choices = [_Choice()]
+
+class CannedClient:
+    """Stands in for openai.OpenAI and answers every call instantly."""
+    
+    class chat:
+        class completions:
+            @staticmethod
+            def create(**kwargs):
+                return _Response()
+
+def write_document(path, sentences, target_bytes, seed):
+    rng = random.Random(seed)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target_bytes:
+            para = "".join(rng.choice(sentences) for _ in range(rng.randint(2, 6))) + "\n\n"
+            f.write(para)
+            written += len(para.encode("utf-8"))
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def run_mode(mode, source_path, target_path):
+    from term_extract import llm, memory
+    from term_extract.chunking import align_chunks, token_chunk
+    from term_extract.documents import iter_document_pairs
+    from term_extract.llm import RateLimiter
+    from term_extract.pipeline import run_extraction, run_file_extraction
+    
+    llm.response_cache = None
+    memory.sentence_memory = None
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    segments = 0
+    
+    if mode == "stream-chunking":
+        count, pairs = iter_document_pairs(source_path, target_path)
+        for _ in pairs:
+            segments += 1
+    elif mode == "memory-chunking":
+        # The pasted-text path without the MAX_CHARS cap
+        with open(source_path, encoding="utf-8") as f:
+            source = f.read()
+        with open(target_path, encoding="utf-8") as f:
+            target = f.read()
+        segments = len(align_chunks(token_chunk(source), token_chunk(target)))
+    elif mode == "stream-pipeline":
+        result = run_file_extraction(source_path, target_path, client=CannedClient, limiter=RateLimiter(rate=0))
+        segments = result['segments']
+    elif mode == "memory-pipeline":
+        with open(source_path, encoding="utf-8") as f:
+            source = f.read()
+        with open(target_path, encoding="utf-8") as f:
+            target = f.read()
+        result = run_extraction(source, target, client=CannedClient, limiter=RateLimiter(rate=0))
+        segments = result['segments']
+    else:
+        raise ValueError(mode)
+    
+    elapsed = time.perf_counter() - start
+    size_mb = (os.path.getsize(source_path) + os.path.getsize(target_path)) / (1024 * 1024)
+    return {
+        "mode": mode,
+        "segments": segments,
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(size_mb / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - baseline, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Large-document streaming benchmark")
+    parser.add_argument("--mb", type=float, default=5.0, help="Size of each document in MB")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--target", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.source, args.target)))
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, "source.zh.txt")
+        target_path = os.path.join(tmp, "target.en.txt")
+        write_document(source_path, ZH_SENTENCES, int(args.mb * 1024 * 1024), seed=1)
+        write_document(target_path, EN_SENTENCES, int(args.mb * 1024 * 1024), seed=2)
+        
+        print(f"Document pair: {args.mb:g} MB + {args.mb:g} MB")
+        print(f"{'mode':<18}{'segments':>10}{'seconds':>10}{'MB/s':>10}{'peak RSS':>12}{'growth':>10}")
+        for mode in ("stream-chunking", "memory-chunking", "stream-pipeline", "memory-pipeline"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--source", source_path, "--target", target_path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{r['mode']:<18}{r['segments']:>10}{r['seconds']:>10}{r['mb_per_s']:>10}"
+                  f"{r['peak_rss_mb']:>10} MB{r['rss_growth_mb']:>7} MB")
+
+if __name__ == "__main__":
+    main()
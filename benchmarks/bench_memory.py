@@ -0,0 +1,118 @@
+# Benchmark: model calls and prompt tokens saved by the sentence memory on a corpus with shared boilerplate.
+#
+#   python benchmarks/bench_memory.py [--documents 20] [--doc-kb 20] [--shared 0.4] [--pool 60]
+#
+# Builds a synthetic corpus: each document is its own random text (see
+# bench_candidates.synthetic_document) with sentences from a common pool of
+# --pool boilerplate sentences mixed in at random places, --shared of them in all, so the
+# same sentences fall into differently cut segments in every document.
+# Runs the corpus as one batch job against benchmarks/mock_server.py
+# without the sentence memory, with an empty one, and again with the one
+# the previous job filled, and reports model calls, prompt tokens, the
+# memory's hit rate and source tokens not sent, and how many of the terms
+# of the job without it the others found. (The mock takes some of its
+# terms from the start of the text it is sent, so that share is only
+# indicative.)
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_candidates import synthetic_document
+from mock_server import MockServer
+
+from term_extract import llm, memory
+from term_extract.batch import run_batch
+from term_extract.memory import SentenceMemory, split_lines
+from term_extract.metrics import Recorder
+from term_extract.terms import TermMerger
+
+def corpus(documents, chars, shared, pool_size, seed):
+    """Document texts, each mixing its own sentences with ones from a shared pool."""
+    rng = random.Random(seed)
+    pool_text, _ = synthetic_document(chars, seed + 1)
+    pool = [s for s in split_lines(pool_text) if s.strip()][:pool_size]
+    texts = []
+    for n in range(documents):
+        text, _ = synthetic_document(int(chars * (1 - shared)), seed + 2 + n)
+        sentences = split_lines(text)
+        boilerplate_chars = 0
+        while boilerplate_chars < chars * shared:
+            sentence = rng.choice(pool)
+            sentences.insert(rng.randrange(len(sentences) + 1), sentence)
+            boilerplate_chars += len(sentence)
+        texts.append("".join(sentences))
+    return texts
+
+def run(label, documents, tmp, sentence_memory):
+    memory.sentence_memory = sentence_memory
+    recorder = Recorder()
+    start = time.perf_counter()
+    with MockServer(latency="fixed:0.005") as server:
+        client = llm.new_client("bench", server.url)
+        summary = run_batch(documents, os.path.join(tmp, label.replace(" ", "-")), client=client, rate=0,
+                            recorder=recorder)
+        client.close()
+    elapsed = time.perf_counter() - start
+    usage = recorder.summary().get("llm.call", {})
+    merged = TermMerger()
+    for entry in summary['documents']:
+        with open(entry['path'], encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))[1:]
+        merged.add([{'source': row[0], 'target': row[1]} for row in rows if len(row) > 1])
+    recalled = summary['sentence_memory']
+    return {
+        'label': label,
+        'segments': summary['segments'],
+        'calls': usage.get('count', 0),
+        'prompt': usage.get('prompt_tokens', 0),
+        'hit_rate': f"{recalled['hit_rate']:.0%}" if recalled else "-",
+        'saved': recalled['tokens_saved'] if recalled else 0,
+        'sources': {t['source'] for t in merged.terms()},
+        'elapsed': elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentence memory benchmark")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--doc-kb", type=int, default=20, help="Size of each document")
+    parser.add_argument("--shared", type=float, default=0.4, help="Fraction of each document from the shared pool")
+    parser.add_argument("--pool", type=int, default=60, help="Boilerplate sentences shared by the documents")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    llm.response_cache = None
+    texts = corpus(args.documents, args.doc_kb * 1024 // 3, args.shared, args.pool, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        documents = []
+        for n, text in enumerate(texts):
+            path = os.path.join(tmp, f"doc{n}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            documents.append({"id": f"doc{n}", "source": path, "target": None})
+        print(f"{args.documents} documents of {args.doc_kb} KB, {args.shared:.0%} from {args.pool} shared sentences")
+        
+        store = SentenceMemory(os.path.join(tmp, "sentences.sqlite3"))
+        rows = [run("no memory", documents, tmp, None),
+                run("empty memory", documents, tmp, store),
+                run("filled memory", documents, tmp, store)]
+        memory.sentence_memory = None
+    
+    base = rows[0]
+    print(f"{'run':<15}{'segments':>9}{'calls':>7}{'prompt tok':>12}{'hit rate':>10}{'not sent':>10}"
+          f"{'terms':>7}{'of base':>9}{'time':>8}")
+    for row in rows:
+        kept = len(row['sources'] & base['sources']) / len(base['sources']) if base['sources'] else 1.0
+        print(f"{row['label']:<15}{row['segments']:>9}{row['calls']:>7}{row['prompt']:>12,}{row['hit_rate']:>10}"
+              f"{row['saved']:>10,}{len(row['sources']):>7}{kept:>9.0%}{row['elapsed']:>7.1f}s")
+    if base['prompt']:
+        print(f"Prompt tokens saved with an empty memory: {100 * (base['prompt'] - rows[1]['prompt']) / base['prompt']:.0f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Benchmark: validating and merging very large numbers of raw terms.
+#
+#   python benchmarks/bench_merge.py [--terms 1000000] [--unique 0.2] [--trace]
+#   python benchmarks/bench_merge.py --terms 10000000 --only merger
+#
+# Generates raw terms as they come back from many segments: each distinct
+# term repeats, in full-width, spaced, Traditional/Simplified and quoted
+# spellings, sometimes with a different target. Times validate_terms, the
+# old dict dedupe (merge_terms) and TermMerger, and with --trace the memory
+# each index holds (tracemalloc, which slows the run down). The raw terms
+# are generated in chunks, so only the index has to fit in memory at 10M.
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from term_extract.normalize import term_key
+from term_extract.terms import TermMerger, validate_terms
+
+CATEGORIES = ["medical", "organization", "place", "social", "technical", "chemical", "date", "general"]
+TRADITIONAL = "衞國醫藥療護處務會區島機關統計劃時間電網頁開門問題點應對變發現實驗證據營養"
+CJK = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)] + list(TRADITIONAL)
+WIDE = str.maketrans({chr(c): chr(c + 0xfee0) for c in range(0x21, 0x7f)})
+
+def merge_terms(seen, terms):
+    """The old dedupe, kept as the baseline: lowercased source -> term, the longer target wins."""
+    for t in terms:
+        key = t['source'].lower()
+        if key not in seen:
+            seen[key] = t
+        elif len(t['target']) > len(seen[key]['target']):
+            seen[key] = t
+    return seen
+
+def variant(source, rng):
+    """One of the spellings the model returns for the same term."""
+    pick = rng.random()
+    if pick < 0.1:
+        return source.translate(WIDE)
+    if pick < 0.2:
+        return " ".join(source)
+    if pick < 0.3:
+        return f"「{source}」"
+    if pick < 0.4:
+        return term_key(source)  # the Simplified spelling
+    return source
+
+def raw_terms(count, unique, seed, chunk=100_000):
+    """Chunks of raw term dicts; about count * unique distinct sources."""
+    rng = random.Random(seed)
+    distinct = max(1, int(count * unique))
+    for start in range(0, count, chunk):
+        batch = []
+        for _ in range(min(chunk, count - start)):
+            i = rng.randrange(distinct)
+            base = random.Random(i)
+            source = "".join(base.choice(CJK) for _ in range(base.randint(2, 5))) + ("ＡＢ" if i % 7 == 0 else "")
+            target = f"term {i}" if rng.random() < 0.9 else f"term {i} (alt)"
+            batch.append({'source': variant(source, rng), 'target': target,
+                          'category': CATEGORIES[i % len(CATEGORIES)]})
+        yield batch
+
+def run(label, args, fold):
+    if args.trace:
+        tracemalloc.start()
+    elapsed = 0.0
+    index = None
+    for batch in raw_terms(args.terms, args.unique, args.seed):
+        start = time.perf_counter()
+        index = fold(index, batch)
+        elapsed += time.perf_counter() - start
+    del batch
+    memory = ""
+    if args.trace:
+        memory = f"{tracemalloc.get_traced_memory()[0] / (1024 * 1024):>8.0f} MB"
+        tracemalloc.stop()
+    size = index if isinstance(index, int) else len(index)
+    print(f"{label:<13}{elapsed:>7.1f}s {args.terms / elapsed:>12,.0f} terms/s {size:>11,} kept {memory}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Term validation and merge benchmark")
+    parser.add_argument("--terms", type=int, default=1_000_000, help="Raw terms to merge")
+    parser.add_argument("--unique", type=float, default=0.2, help="Distinct terms as a share of raw terms")
+    parser.add_argument("--only", choices=["validate", "dict", "merger"], help="Run one stage")
+    parser.add_argument("--trace", action="store_true", help="Report memory held by each index")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    print(f"{args.terms:,} raw terms, about {int(args.terms * args.unique):,} distinct")
+    if args.only in (None, "validate"):
+        run("validate", args, lambda kept, batch: (kept or 0) + len(validate_terms(batch)))
+    if args.only in (None, "dict"):
+        run("merge_terms", args, lambda seen, batch: merge_terms(seen if seen is not None else {}, batch))
+    if args.only in (None, "merger"):
+        run("TermMerger", args, lambda merger, batch: (merger if merger is not None else TermMerger()).add(batch))
+    print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# Benchmark suite: end-to-end extraction against a local mock API.
+#
+#   python benchmarks/bench_pipeline.py [--latency fixed:0.05] [--rate-limit 0.05] [--malformed 0.02]
+#                                       [--large-mb 1] [--repeat 3] [--json results.json]
+#
+# Starts benchmarks/mock_server.py in-process, points get_client at it and
+# runs the real pipeline (openai client included) on small, medium and very
+# large inputs: small and medium go through the pasted-text path, large is
+# a file pair streamed from disk. The response cache is disabled and the
+# rate limiter is off unless --rate is given, so local overhead is measured.
+#
+# Reported per input size: segments/sec, end-to-end run time and per-call
+# latency percentiles, call errors, and CPU time per stage. Stage CPU is
+# measured by replaying each stage single-threaded on the same input and
+# on the responses the run received. --json writes everything as one JSON
+# document ("-" for stdout) for regression tracking.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mock_server import MockServer
+
+from term_extract import __version__, llm, memory
+from term_extract.alignment import align_segments
+from term_extract.chunking import align_chunks, smart_chunk, token_chunk
+from term_extract.config import CHUNK_SIZE, MAX_IN_FLIGHT
+from term_extract.llm import RateLimiter, get_client
+from term_extract.parsing import parse_terms
+from term_extract.pipeline import run_extraction, run_file_extraction
+from term_extract.terms import dedupe, validate_terms
+
+ZH_SENTENCES = [
+    "衞生署衞生防護中心今日呼籲市民提高警覺，預防登革熱。",
+    "漁農自然護理署在郊野公園進行滅蚊工作，使用殺幼蟲劑。",
+    "食物環境衞生署將加強屋苑及建築地盤的防蚊措施。",
+    "市民可瀏覽衞生防護中心網頁或Facebook專頁了解最新消息。",
+    "二零二四年七月，香港錄得多宗本地登革熱個案。",
+]
+EN_SENTENCES = [
+    "The Centre for Health Protection of the Department of Health today urged the public to stay alert against dengue fever.",
+    "The Agriculture, Fisheries and Conservation Department carried out mosquito control in country parks using larvicides.",
+    "The Food and Environmental Hygiene Department will step up anti-mosquito measures at housing estates and construction sites.",
+    "Members of the public may visit the CHP website or Facebook page for the latest information.",
+    "In July 2024, Hong Kong recorded several local cases of dengue fever.",
+]
+
+class TimedClient:
+    """Wraps an OpenAI client, recording the latency, outcome and content of every call."""
+    
+    def __init__(self, client):
+        self.client = client
+        self.chat = self
+        self.completions = self
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.latencies = []
+        self.errors = 0
+        self.contents = []
+    
+    def create(self, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = self.client.chat.completions.create(**kwargs)
+        except Exception:
+            with self.lock:
+                self.errors += 1
+                self.latencies.append(time.perf_counter() - start)
+            raise
+        with self.lock:
+            self.latencies.append(time.perf_counter() - start)
+            self.contents.append(resp.choices[0].message.content or "")
+        return resp
+
+def parallel_text(chars, seed):
+    """Chinese text of about chars characters and its translation, sentence for sentence."""
+    rng = random.Random(seed)
+    source, target = [], []
+    size = 0
+    while size < chars:
+        n = rng.randint(2, 6)
+        picks = [rng.randrange(len(ZH_SENTENCES)) for _ in range(n)]
+        para = "".join(ZH_SENTENCES[p] for p in picks)
+        source.append(para)
+        target.append(" ".join(EN_SENTENCES[p] for p in picks))
+        size += len(para) + 2
+    return "\n\n".join(source), "\n\n".join(target)
+
+def percentiles(samples, scale=1.0):
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * scale, 3)
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": round(samples[-1] * scale, 3)}
+
+def cpu_time(fn, *args):
+    start = time.process_time()
+    fn(*args)
+    return round(time.process_time() - start, 4)
+
+def stage_cpu(source, target, contents):
+    parsed = [parse_terms(c) for c in contents]
+    valid = [t for terms in parsed for t in validate_terms(terms)]
+    return {
+        "smart_chunk": cpu_time(smart_chunk, source, CHUNK_SIZE),
+        "align_chunks": cpu_time(lambda: align_chunks(smart_chunk(source, CHUNK_SIZE), smart_chunk(target, CHUNK_SIZE))),
+        "token_chunk": cpu_time(token_chunk, source),
+        "align_segments": cpu_time(align_segments, source, target),
+        "parse_terms": cpu_time(lambda: [parse_terms(c) for c in contents]),
+        "validate_terms": cpu_time(lambda: [validate_terms(terms) for terms in parsed]),
+        "dedupe": cpu_time(dedupe, valid),
+    }
+
+def run_size(name, client, limiter, repeat, source=None, target=None, paths=None):
+    run_seconds = []
+    latencies = []
+    errors = segments = 0
+    contents = []
+    for _ in range(repeat):
+        client.reset()
+        start = time.perf_counter()
+        if paths:
+            result = run_file_extraction(paths[0], paths[1], client=client, limiter=limiter)
+        else:
+            result = run_extraction(source, target, client=client, limiter=limiter)
+        run_seconds.append(time.perf_counter() - start)
+        segments += result['segments']
+        latencies.extend(client.latencies)
+        errors += client.errors
+        contents = client.contents
+        terms = len(result['terms'])
+    
+    if paths:
+        with open(paths[0], encoding="utf-8") as f:
+            source = f.read()
+        with open(paths[1], encoding="utf-8") as f:
+            target = f.read()
+    return {
+        "size": name,
+        "source_chars": len(source),
+        "target_chars": len(target),
+        "runs": repeat,
+        "segments": segments // repeat,
+        "terms": terms,
+        "segments_per_s": round(segments / sum(run_seconds), 2),
+        "run_seconds": percentiles(run_seconds),
+        "call_latency_ms": percentiles(latencies, 1000),
+        "calls": len(latencies),
+        "call_errors": errors,
+        "cpu_seconds": stage_cpu(source, target, contents),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against a mock API")
+    parser.add_argument("--latency", default="fixed:0.05", help="Mock latency spec (see mock_server.py)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of calls answered 429")
+    parser.add_argument("--malformed", type=float, default=0.0, help="Fraction of truncated JSON answers")
+    parser.add_argument("--bad-body", type=float, default=0.0, help="Fraction of invalid HTTP bodies")
+    parser.add_argument("--rate", type=float, default=0.0, help="Client calls/s (0: limiter off)")
+    parser.add_argument("--large-mb", type=float, default=1.0, help="Size of each large document in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the small and medium inputs")
+    parser.add_argument("--json", help="Write machine-readable results to this file ('-' for stdout)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    llm.response_cache = None
+    memory.sentence_memory = None
+    results = []
+    with MockServer(latency=args.latency, rate_limit=args.rate_limit, malformed=args.malformed,
+                    bad_body=args.bad_body, seed=args.seed) as server, tempfile.TemporaryDirectory() as tmp:
+        client = TimedClient(get_client("", server.url))
+        limiter = RateLimiter(rate=args.rate)
+        
+        small = parallel_text(2000, seed=1)
+        medium = parallel_text(20000, seed=2)
+        large_source, large_target = parallel_text(int(args.large_mb * 1024 * 1024 / 3), seed=3)
+        paths = (os.path.join(tmp, "large.zh.txt"), os.path.join(tmp, "large.en.txt"))
+        for path, text in zip(paths, (large_source, large_target)):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        del large_source, large_target
+        
+        results.append(run_size("small", client, limiter, args.repeat, *small))
+        results.append(run_size("medium", client, limiter, args.repeat, *medium))
+        results.append(run_size("large", client, limiter, 1, paths=paths))
+        server_stats = dict(server.stats)
+    
+    report = {
+        "version": __version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {
+            "latency": args.latency, "rate_limit": args.rate_limit, "malformed": args.malformed,
+            "bad_body": args.bad_body, "client_rate": args.rate, "max_in_flight": MAX_IN_FLIGHT,
+        },
+        "server": server_stats,
+        "results": results,
+    }
+    
+    out = sys.stderr if args.json == "-" else sys.stdout
+    print(f"{'size':<8}{'segments':>10}{'seg/s':>8}{'run p50 s':>11}{'call p50 ms':>13}"
+          f"{'call p99 ms':>13}{'errors':>8}", file=out)
+    for r in results:
+        print(f"{r['size']:<8}{r['segments']:>10}{r['segments_per_s']:>8}{r['run_seconds']['p50']:>11}"
+              f"{r['call_latency_ms']['p50']:>13}{r['call_latency_ms']['p99']:>13}{r['call_errors']:>8}", file=out)
+    stages = list(results[0]["cpu_seconds"])
+    print("\nCPU seconds per stage", file=out)
+    print(f"{'size':<8}" + "".join(f"{s:>16}" for s in stages), file=out)
+    for r in results:
+        print(f"{r['size']:<8}" + "".join(f"{r['cpu_seconds'][s]:>16}" for s in stages), file=out)
+    print(f"\nServer: {json.dumps(server_stats)}", file=out)
+    
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
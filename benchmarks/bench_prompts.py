@@ -0,0 +1,82 @@
+# Benchmark: prompt tokens cached by the endpoint with instructions first vs the texts first.
+#
+#   python benchmarks/bench_prompts.py [--doc-kb 200] [--cache-min 128 1024]
+#
+# Runs one synthetic document through run_file_extraction against
+# benchmarks/mock_server.py with --prefix-cache, once per minimum cacheable
+# prefix, with the prompt layout of prompts.PromptTemplate (fixed
+# instructions, then the segment's texts) and with the texts first and the
+# instructions after them, as the prompts used to be laid out. Reports the
+# prompt tokens counted before sending and the fixed prefix share of them,
+# and the mock's prompt, cached and uncached tokens (two characters a token,
+# so these are only comparable with each other).
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_candidates import synthetic_document
+from mock_server import MockServer
+
+from term_extract import extraction, llm, memory, prompts
+from term_extract.llm import RateLimiter
+from term_extract.metrics import Recorder
+from term_extract.pipeline import run_file_extraction
+
+class TextFirstTemplate(prompts.PromptTemplate):
+    """The same prompt with the segment's texts before the instructions."""
+    
+    def _layout(self, skip, source, target):
+        parts = [f"<{self.source_tag}>\n{source}\n</{self.source_tag}>"]
+        if self.target_tag is not None:
+            parts += ["", f"<{self.target_tag}>\n{target}\n</{self.target_tag}>"]
+        parts += ["", self.instructions]
+        if skip:
+            parts += ["", skip]
+        return "\n".join(parts)
+
+def text_first(focus, term_filter, bilingual):
+    template = prompts.standard_template(focus, term_filter, bilingual)
+    return TextFirstTemplate(template.system, template.instructions, template.source_tag, template.target_tag)
+
+def run(path, cache_min, layout):
+    llm.response_cache = None
+    memory.sentence_memory = None
+    extraction.standard_template = text_first if layout == "text first" else prompts.standard_template
+    try:
+        with MockServer(latency="fixed:0.005", prefix_cache=cache_min) as server:
+            client = llm.new_client("bench", server.url)
+            result = run_file_extraction(path, client=client, limiter=RateLimiter(0), recorder=Recorder())
+            client.close()
+    finally:
+        extraction.standard_template = prompts.standard_template
+    tokens = result['tokens']
+    share = 100 * tokens['cached'] / tokens['prompt'] if tokens['prompt'] else 0.0
+    print(f"{cache_min:>9} {layout:<20}{result['segments']:>9}{tokens['counted']:>10,}{tokens['prefix']:>9,}"
+          f"{tokens['prompt']:>10,}{tokens['cached']:>9,}{tokens['uncached']:>10,}{share:>8.0f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt layout and prefix caching benchmark")
+    parser.add_argument("--doc-kb", type=int, default=200, help="Document size")
+    parser.add_argument("--cache-min", type=int, nargs="+", default=[128, 1024],
+                        help="Smallest cacheable prefix of the mock endpoint, in tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    text, _ = synthetic_document(args.doc_kb * 1024 // 3, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "source.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"{args.doc_kb} KB document ({len(text):,} chars)")
+        print(f"{'cache min':>9} {'layout':<20}{'segments':>9}{'counted':>10}{'prefix':>9}"
+              f"{'mock':>10}{'cached':>9}{'uncached':>10}{'cached':>9}")
+        for cache_min in args.cache_min:
+            for layout in ("instructions first", "text first"):
+                run(path, cache_min, layout)
+
+if __name__ == "__main__":
+    main()
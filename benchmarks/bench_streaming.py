@@ -0,0 +1,69 @@
+# Benchmark: buffered versus streamed completions, per segment call.
+#
+#   python benchmarks/bench_streaming.py [--calls 40] [--latency lognormal:0.8,0.5] [--limit 6]
+#
+# Runs the same extract_chunk calls against benchmarks/mock_server.py three
+# ways: buffered (STREAM_RESPONSES off), streamed, and streamed with
+# STREAM_TERM_LIMIT=--limit. Reports time to the first parsed term and to
+# the end of the call; buffered calls only have terms once the whole
+# response is in.
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mock_server import MockServer
+
+from term_extract import extraction, llm, memory
+from term_extract.metrics import Recorder
+
+SOURCE = "登革熱是一種由蚊傳播的疾病。衞生防護中心今日公布，郊野公園發現白紋伊蚊，衞生署已使用殺幼蟲劑。"
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return pick(0.5), pick(0.9)
+
+def run_mode(label, stream, limit, args):
+    extraction.STREAM_RESPONSES = stream
+    extraction.STREAM_TERM_LIMIT = limit
+    first, total, terms = [], [], 0
+    with MockServer(latency=args.latency, seed=args.seed) as server:
+        client = llm.new_client("bench", server.url)
+        for c in range(args.calls):
+            recorder = Recorder()
+            start = time.perf_counter()
+            found, _ = extraction.extract_chunk(f"{SOURCE}（第{c}段）", "", "", "all", client, recorder=recorder)
+            total.append(time.perf_counter() - start)
+            spans = {r["span"]: r["seconds"] for r in recorder.spans}
+            first.append(spans.get("first_term", total[-1]))
+            terms += len(found)
+        client.close()
+    return label, percentiles(first), percentiles(total), terms / args.calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Buffered versus streamed completions")
+    parser.add_argument("--calls", type=int, default=40, help="Segment calls per mode")
+    parser.add_argument("--latency", default="lognormal:0.8,0.5", help="Mock latency spec (see mock_server.py)")
+    parser.add_argument("--limit", type=int, default=6, help="STREAM_TERM_LIMIT for the last mode")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    llm.response_cache = None
+    memory.sentence_memory = None
+    results = [
+        run_mode("buffered", False, 0, args),
+        run_mode("streamed", True, 0, args),
+        run_mode(f"limit {args.limit}", True, args.limit, args),
+    ]
+    
+    print(f"{args.calls} calls per mode, latency {args.latency}")
+    print(f"{'mode':<11}{'first p50':>11}{'first p90':>11}{'call p50':>10}{'call p90':>10}{'terms':>7}")
+    for label, first, total, terms in results:
+        print(f"{label:<11}{first[0]:>9.0f}ms{first[1]:>9.0f}ms{total[0]:>8.0f}ms{total[1]:>8.0f}ms{terms:>7.1f}")
+
+if __name__ == "__main__":
+    main()
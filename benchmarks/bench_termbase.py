@@ -0,0 +1,84 @@
+# Benchmark: SQLite termbase bulk upserts and lookups at scale.
+#
+#   python benchmarks/bench_termbase.py [--terms 1000000] [--batch 100000]
+#
+# Fills a fresh termbase in a temp directory with synthetic terms, one
+# transaction per batch, then re-upserts a batch of existing terms (the
+# merge path) and times point lookups, prefix scans, filtered selects and
+# a full streaming scan. Latencies are per call, from 10,000 random calls.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from term_extract.termbase import TermBase
+
+CATEGORIES = ["medical", "organization", "place", "social", "technical", "chemical", "date", "general"]
+CJK = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+
+def synthetic_terms(count, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        source = "".join(rng.choice(CJK) for _ in range(rng.randint(2, 6))) + str(i)
+        yield {'source': source, 'target': f"term {i}", 'category': rng.choice(CATEGORIES)}
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return f"p50 {pick(0.5):.3f} ms | p99 {pick(0.99):.3f} ms"
+
+def timed_calls(fn, args):
+    samples = []
+    for a in args:
+        start = time.perf_counter()
+        fn(a)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Termbase benchmark")
+    parser.add_argument("--terms", type=int, default=1_000_000, help="Terms to insert")
+    parser.add_argument("--batch", type=int, default=100_000, help="Terms per upsert transaction")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        base = TermBase(os.path.join(tmp, "termbase.sqlite3"))
+        start = time.perf_counter()
+        batch = []
+        for term in synthetic_terms(args.terms, seed=3):
+            batch.append(term)
+            if len(batch) == args.batch:
+                base.upsert(batch)
+                batch = []
+        if batch:
+            base.upsert(batch)
+        elapsed = time.perf_counter() - start
+        print(f"Insert {args.terms:,} terms: {elapsed:.1f}s ({args.terms / elapsed:,.0f} terms/s)")
+        
+        existing = list(synthetic_terms(min(args.batch, args.terms), seed=3))
+        start = time.perf_counter()
+        base.upsert(existing)
+        elapsed = time.perf_counter() - start
+        print(f"Merge {len(existing):,} existing terms: {elapsed:.2f}s ({len(existing) / elapsed:,.0f} terms/s)")
+        print(f"Stored: {base.size():,} | File: {os.path.getsize(base.path) / (1024 * 1024):.0f} MB")
+        
+        rng = random.Random(9)
+        sample = [t['source'] for t in rng.sample(existing, min(10_000, len(existing)))]
+        print(f"get:           {percentiles(timed_calls(base.get, sample))}")
+        print(f"lookup_prefix: {percentiles(timed_calls(lambda s: base.lookup_prefix(s[:2], 20), sample))}")
+        print(f"select (filter, 100 rows): "
+              f"{percentiles(timed_calls(lambda f: base.select(f, limit=100), ['medical', 'places', 'dates'] * 100))}")
+        
+        start = time.perf_counter()
+        scanned = sum(1 for _ in base.iter_terms())
+        elapsed = time.perf_counter() - start
+        print(f"iter_terms: {scanned:,} terms in {elapsed:.1f}s ({scanned / elapsed:,.0f} terms/s)")
+        base.close()
+
+if __name__ == "__main__":
+    main()
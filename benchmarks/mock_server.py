@@ -0,0 +1,300 @@
+# Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint.
+#
+#   python benchmarks/mock_server.py [--port 8765] [--latency lognormal:0.8,0.5] [--handshake 0.05]
+#                                    [--rate-limit 0.05] [--malformed 0.02] [--bad-body 0.01]
+#
+# Then point the tool at it:  LLM7_BASE_URL=http://127.0.0.1:8765/v1 python app.py
+#
+# Every response answers with a JSON array of terms: the canned terms (or
+# those in --canned FILE) plus a few pulled from the Chinese text of the
+# prompt, so dedupe and filtering see realistic overlap. Faults are drawn
+# per request:
+#   --rate-limit  fraction answered 429 with a Retry-After header
+#   --malformed   fraction whose message content is a truncated JSON array
+#   --bad-body    fraction whose HTTP body is not valid JSON at all
+# Latency specs: fixed:S, uniform:LO,HI, lognormal:MEDIAN,SIGMA (seconds).
+# --handshake delays the first request of every new connection, standing in
+# for the TCP and TLS round trips a real endpoint costs; keep-alive
+# connections pay it once.
+# Requests with "stream": true get server-sent events of --stream-chunk
+# characters: the first after --first-token of the drawn latency, the rest
+# spread over the remainder, as a model generates tokens.
+# --prefix-cache N reports cached_tokens as endpoints with automatic prompt
+# caching do: the longest prefix of the messages already seen, in steps of
+# 128 tokens from N tokens on (a token here is two characters).
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_TERMS = [
+    {"source": "登革熱", "target": "dengue fever", "category": "medical"},
+    {"source": "衞生防護中心", "target": "Centre for Health Protection", "category": "organization"},
+    {"source": "衞生署", "target": "Department of Health", "category": "organization"},
+    {"source": "殺幼蟲劑", "target": "larvicide", "category": "chemical"},
+    {"source": "郊野公園", "target": "country park", "category": "place"},
+]
+CJK_RUN = re.compile(r'[\u4e00-\u9fff]{2,6}')
+SOURCE_BLOCK = re.compile(r'<(source_chinese|chinese_text|source_text|text|candidates)>(.*?)</\1>', re.S)
+CATEGORIES = ["medical", "organization", "place", "technical", "chemical", "date", "general"]
+
+def parse_latency(spec):
+    """Turn a latency spec into a function returning seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def log_message(self, format, *args):
+            pass
+        
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; without this, Nagle plus
+            # delayed ACKs add about 40 ms to every keep-alive response
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            server._count("connections")
+            self.fresh = True
+        
+        def _send(self, status, payload, headers=()):
+            data = payload.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def _write_chunk(self, text):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        
+        def _stream(self, body, content, seconds):
+            """Send content as chat.completion.chunk events over seconds."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            size = server.stream_chunk
+            pieces = [content[i:i + size] for i in range(0, len(content), size)]
+            base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": body.get("model", "mock")}
+            events = [dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                      for piece in pieces]
+            events.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+            gap = seconds / max(1, len(pieces))
+            try:
+                for i, event in enumerate(events):
+                    if 0 < i < len(pieces):
+                        time.sleep(gap)
+                    self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                self._write_chunk("data: [DONE]\n\n")
+                self._write_chunk("")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading early
+                server._count("streams_cut")
+                self.close_connection = True
+        
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send(200, json.dumps({"object": "list", "data": [{"id": "mock", "object": "model"}]}))
+            else:
+                self._send(404, json.dumps({"error": {"message": "not found"}}))
+        
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length)
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, json.dumps({"error": {"message": "not found"}}))
+                return
+            server._count("requests")
+            fault, delay, kind = server._draw()
+            streaming = fault >= server.bad_body + server.rate_limit and b'"stream"' in raw
+            generation = delay * (1 - server.first_token) if streaming else 0.0
+            if self.fresh:
+                self.fresh = False
+                delay += server.handshake
+            time.sleep(delay - generation)
+            
+            if fault < server.rate_limit:
+                server._count("rate_limited")
+                self._send(429, json.dumps({"error": {"message": "Rate limit exceeded", "type": "rate_limit"}}),
+                           [("Retry-After", f"{server.retry_after:g}")])
+                return
+            fault -= server.rate_limit
+            if fault < server.bad_body:
+                server._count("bad_body")
+                self._send(200, '{"id": "chatcmpl-mock", "choices": [{"message": ')
+                return
+            fault -= server.bad_body
+            
+            body = json.loads(raw or b"{}")
+            content = server.answer(body)
+            if fault < server.malformed:
+                server._count("malformed")
+                content = content[:int(len(content) * kind)]
+            else:
+                server._count("ok")
+            if body.get("stream"):
+                self._stream(body, content, generation)
+                return
+            prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 2
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 2,
+                     "total_tokens": prompt_tokens + len(content) // 2}
+            if server.prefix_cache:
+                usage["prompt_tokens_details"] = {"cached_tokens": server.cached_tokens(body)}
+            self._send(200, json.dumps({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            }, ensure_ascii=False))
+    
+    return Handler
+
+class MockServer:
+    """
+    Threaded mock server; use as a context manager or call start()/stop().
+    Counters of what was served are kept in .stats.
+    """
+    
+    def __init__(self, host="127.0.0.1", port=0, latency="fixed:0", rate_limit=0.0, malformed=0.0,
+                 bad_body=0.0, canned=None, derived_terms=8, retry_after=0.05, handshake=0.0, stream_chunk=16,
+                 first_token=0.2, prefix_cache=0, seed=0):
+        self.latency = parse_latency(latency)
+        self.rate_limit = rate_limit
+        self.malformed = malformed
+        self.bad_body = bad_body
+        self.canned = canned if canned is not None else CANNED_TERMS
+        self.derived_terms = derived_terms
+        self.retry_after = retry_after
+        self.handshake = handshake
+        self.stream_chunk = stream_chunk
+        self.first_token = first_token
+        self.prefix_cache = prefix_cache
+        self.prefixes = set()  # digests of the prompt prefixes seen, at each cache step
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats = {"connections": 0, "requests": 0, "ok": 0, "rate_limited": 0, "malformed": 0, "bad_body": 0,
+                      "streams_cut": 0}
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self.thread = None
+    
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    def _draw(self):
+        with self.rng_lock:
+            return self.rng.random(), self.latency(self.rng), self.rng.random()
+    
+    def _count(self, key):
+        with self.rng_lock:
+            self.stats[key] += 1
+    
+    def cached_tokens(self, body):
+        """Tokens of the longest cacheable prefix of this request that an earlier one shared."""
+        text = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        step = 256  # characters in 128 tokens
+        cached = 0
+        digest = hashlib.sha256()
+        digests = []
+        done = 0
+        for end in range(self.prefix_cache * 2, len(text) + 1, step):
+            digest.update(text[done:end].encode("utf-8"))
+            done = end
+            digests.append((end, digest.copy().hexdigest()))
+        with self.rng_lock:
+            for end, key in digests:
+                if key not in self.prefixes:
+                    break
+                cached = end // 2
+            self.prefixes.update(key for _, key in digests)
+        return cached
+    
+    def answer(self, body):
+        """Term array for a request, built from the canned terms and the prompt's Chinese text."""
+        prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+        block = SOURCE_BLOCK.search(prompt)
+        terms = list(self.canned)
+        for i, run in enumerate(dict.fromkeys(CJK_RUN.findall(block.group(2) if block else ""))):
+            if i >= self.derived_terms:
+                break
+            terms.append({"source": run, "target": f"term {len(run)}-{i}", "category": CATEGORIES[i % len(CATEGORIES)]})
+        return json.dumps(terms, ensure_ascii=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5", help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--handshake", type=float, default=0.0, help="Extra seconds on each new connection's first request")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered 429")
+    parser.add_argument("--malformed", type=float, default=0.0, help="Fraction with truncated JSON content")
+    parser.add_argument("--bad-body", type=float, default=0.0, help="Fraction with an invalid HTTP body")
+    parser.add_argument("--stream-chunk", type=int, default=16, help="Characters per streamed event")
+    parser.add_argument("--first-token", type=float, default=0.2,
+                        help="Fraction of the latency before the first streamed event")
+    parser.add_argument("--prefix-cache", type=int, default=0,
+                        help="Report prompt prefixes seen before as cached from this many tokens (0: off)")
+    parser.add_argument("--canned", help="JSON file with the term array to answer with")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    canned = None
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            canned = json.load(f)
+    server = MockServer(args.host, args.port, args.latency, args.rate_limit, args.malformed, args.bad_body,
+                        canned=canned, handshake=args.handshake, stream_chunk=args.stream_chunk,
+                        first_token=args.first_token, prefix_cache=args.prefix_cache, seed=args.seed)
+    print(f"Mock server on {server.url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Headless core of the Term Extraction Tool.
+
+Submodules are imported on first attribute access, so `import term_extract`
+stays cheap and the OpenAI client is only loaded when a client is created.
+"""
+
+import importlib
+
+__version__ = "3.7"
+
+_EXPORTS = {
+    "smart_chunk": "chunking",
+    "token_chunk": "chunking",
+    "align_chunks": "chunking",
+    "count_tokens": "tokens",
+    "align_sentences": "alignment",
+    "align_segments": "alignment",
+    "parse_terms": "parsing",
+    "TermStreamParser": "parsing",
+    "is_custom_command": "extraction",
+    "get_focus_instruction": "prompts",
+    "PromptTemplate": "prompts",
+    "extract_chunk": "extraction",
+    "extract_chunk_custom": "extraction",
+    "run_segments": "extraction",
+    "get_client": "llm",
+    "chat_completion": "llm",
+    "LLMCallError": "llm",
+    "RateLimiter": "llm",
+    "ResponseCache": "llm",
+    "Glossary": "glossary",
+    "load_glossary": "glossary",
+    "TermBase": "termbase",
+    "Recorder": "metrics",
+    "FairScheduler": "scheduler",
+    "QueueFullError": "scheduler",
+    "CancelToken": "cancel",
+    "RunCancelled": "cancel",
+    "SegmentMemo": "incremental",
+    "SentenceMemory": "memory",
+    "rank_candidates": "candidates",
+    "CandidateSet": "candidates",
+    "dedupe": "terms",
+    "TermMerger": "terms",
+    "TermView": "terms",
+    "term_key": "normalize",
+    "validate_terms": "terms",
+    "apply_filter": "terms",
+    "FILTER_CHOICES": "terms",
+    "run_extraction": "pipeline",
+    "run_batch": "batch",
+    "load_manifest": "batch",
+    "export_terms": "export",
+    "format_csv": "export",
+    "write_terms": "export",
+    "write_xlsx": "export",
+    "EXPORT_FORMATS": "export",
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,328 @@
+# Sentence-level alignment of a source text and its translation (Gale-Church
+# length model in a diagonal band, with number/word/punctuation anchors).
+
+import math
+import re
+from itertools import islice
+
+from .chunking import split_sentences, split_to_budget
+from .config import ALIGN_BAND, ALIGN_WINDOW, CHUNK_TOKENS, SEGMENT_TOKENS
+from .tokens import count_tokens
+
+# (source sentences, target sentences, -log prior) per bead type
+BEADS = (
+    (1, 1, -math.log(0.89)),
+    (1, 0, -math.log(0.005)),
+    (0, 1, -math.log(0.005)),
+    (2, 1, -math.log(0.0445)),
+    (1, 2, -math.log(0.0445)),
+    (2, 2, -math.log(0.011)),
+)
+VARIANCE = 6.8          # Gale-Church variance per source character
+ANCHOR_WEIGHT = 3.0     # cost bonus for fully shared anchors, half of it as a penalty for none
+MAX_DRIFT = 3           # bands the followed centre line may stray from the diagonal
+WINDOW_MARGIN = 0.25    # extra target text read into a window, as a share of what its source calls for
+
+ANCHOR_PATTERN = re.compile(r'\d+(?:[.,:]\d+)*|[A-Za-z][A-Za-z0-9]+')
+SQRT2 = math.sqrt(2)
+QUESTION_MARKS = ('？', '?')
+EXCLAMATION_MARKS = ('！', '!')
+
+def _anchors(sentence):
+    """Digits and Latin words shared verbatim between Chinese and English."""
+    return frozenset(a.replace(',', '').lower() for a in ANCHOR_PATTERN.findall(sentence))
+
+def _ending(sentence):
+    sentence = sentence.rstrip()
+    if sentence.endswith(QUESTION_MARKS):
+        return "?"
+    if sentence.endswith(EXCLAMATION_MARKS):
+        return "!"
+    return ""
+
+def _length_cost(source_len, target_len, ratio):
+    if source_len == 0 and target_len == 0:
+        return 0.0
+    mean = (source_len + target_len / ratio) / 2
+    delta = abs(target_len - source_len * ratio) / math.sqrt(max(mean, 1) * VARIANCE * ratio)
+    # -log of the two-tailed probability of a deviation at least this large
+    return -math.log(max(math.erfc(delta / SQRT2), 1e-12))
+
+def _anchor_cost(source_anchors, target_anchors):
+    if not source_anchors or not target_anchors:
+        return 0.0
+    shared = len(source_anchors & target_anchors)
+    if not shared:
+        return ANCHOR_WEIGHT / 2
+    return -ANCHOR_WEIGHT * shared / len(source_anchors | target_anchors)
+
+def _band_centers(source_lens, target_lens, ratio):
+    """For each source prefix, the target prefix of matching length: the band's centre line."""
+    centers = [0]
+    j = 0
+    target_pos = 0
+    source_pos = 0
+    for length in source_lens:
+        source_pos += length * ratio
+        while j < len(target_lens) and target_pos + target_lens[j] / 2 <= source_pos:
+            target_pos += target_lens[j]
+            j += 1
+        centers.append(j)
+    return centers
+
+def align_sentences(source_sentences, target_sentences, band=ALIGN_BAND, ratio=None):
+    """
+    Align two sentence lists. Returns a list of (source indices, target
+    indices) beads covering both lists in order. ratio is the expected
+    target/source length ratio, by default the lists' own. Each row of the
+    dynamic program visits the cells within band sentences of two centre
+    lines: the length-proportional diagonal, and the best cell of the row
+    before, which follows the alignment where deleted or inserted sentences
+    have moved it off the diagonal (up to MAX_DRIFT bands). So it runs in linear time, and the
+    length costs, which only depend on the lengths, are computed once per
+    pair of lengths.
+    """
+    n, m = len(source_sentences), len(target_sentences)
+    if not n or not m:
+        return [((i,), ()) for i in range(n)] + [((), (j,)) for j in range(m)]
+    
+    source_lens = [len(s) for s in source_sentences]
+    target_lens = [len(t) for t in target_sentences]
+    if ratio is None:
+        ratio = max(sum(target_lens), 1) / max(sum(source_lens), 1)
+    source_anchors = [_anchors(s) for s in source_sentences]
+    source_endings = [_ending(s) for s in source_sentences]
+    centers = _band_centers(source_lens, target_lens, ratio)
+    
+    # Per target position j (the bead's last sentence is j - 1): its one and two sentence spans
+    target_anchors = [_anchors(t) for t in target_sentences]
+    one_len = [0] + target_lens
+    two_len = [0, 0] + [target_lens[j - 1] + target_lens[j] for j in range(1, m)]
+    one_anchors = [None] + target_anchors
+    two_anchors = [None, None] + [target_anchors[j - 1] | target_anchors[j] for j in range(1, m)]
+    endings = [None] + [_ending(t) for t in target_sentences]
+    (_, _, prior_11), (_, _, prior_10), (_, _, prior_01), (_, _, prior_21), (_, _, prior_12), (_, _, prior_22) = BEADS
+    insert_cost = [0.0] + [prior_01 + _length_cost(0, length, ratio) for length in target_lens]
+    length_costs = {}
+    
+    def length_cost(source_len, target_len):
+        cost = length_costs.get((source_len, target_len))
+        if cost is None:
+            cost = length_costs[source_len, target_len] = _length_cost(source_len, target_len, ratio)
+        return cost
+    
+    # Wide enough that consecutive rows always overlap
+    band = max(band, max(centers[i + 1] - centers[i] for i in range(n)) + 2)
+    drift = MAX_DRIFT * band
+    inf = float("inf")
+    
+    bounds = []
+    rows = []           # cost per cell, offset by the row's lower bound
+    moves = []          # bead index taken into each cell
+    best_j = 0
+    for i in range(n + 1):
+        followed = best_j + (centers[i] - centers[i - 1] if i else 0)
+        followed = min(max(followed, centers[i] - drift), centers[i] + drift)
+        lo = max(0, min(centers[i], followed) - band)
+        # The last row runs to the end of the target: 0-1 beads reach (n, m) along it
+        hi = m if i == n else min(m, max(centers[i], followed) + band)
+        bounds.append(lo)
+        cost_row = [inf] * (hi - lo + 1)
+        move_row = bytearray(hi - lo + 1)
+        rows.append(cost_row)
+        # Beads reach back one or two rows; k1 and k2 below index those rows
+        prev1, lo1 = (rows[i - 1], bounds[i - 1]) if i >= 1 else ([], 0)
+        prev2, lo2 = (rows[i - 2], bounds[i - 2]) if i >= 2 else ([], 0)
+        len1, len2 = len(prev1), len(prev2)
+        if i >= 1:
+            one_source = source_lens[i - 1]
+            one_source_anchors = source_anchors[i - 1]
+            ending = source_endings[i - 1]
+            delete_cost = prior_10 + _length_cost(one_source, 0, ratio)
+        if i >= 2:
+            two_source = one_source + source_lens[i - 2]
+            two_source_anchors = source_anchors[i - 2] | one_source_anchors
+        
+        # The beads in BEADS order, each only if it can still win: length costs are never negative
+        for j in range(lo, hi + 1):
+            if i == 0 and j == 0:
+                cost_row[0] = 0.0
+                continue
+            best, best_move = inf, 0
+            k1, k2 = j - lo1, j - lo2
+            if j and 0 < k1 <= len1:
+                best = prev1[k1 - 1] + prior_11 + length_cost(one_source, one_len[j])
+                if one_source_anchors and one_anchors[j]:
+                    best += _anchor_cost(one_source_anchors, one_anchors[j])
+                if ending != endings[j]:
+                    best += 1.0
+            if 0 <= k1 < len1:
+                cost = prev1[k1] + delete_cost
+                if cost < best:
+                    best, best_move = cost, 1
+            if j > lo:
+                cost = cost_row[j - 1 - lo] + insert_cost[j]
+                if cost < best:
+                    best, best_move = cost, 2
+            if j and 0 < k2 <= len2:
+                cost = prev2[k2 - 1] + prior_21
+                if cost < best + ANCHOR_WEIGHT:
+                    cost += length_cost(two_source, one_len[j])
+                    if two_source_anchors and one_anchors[j]:
+                        cost += _anchor_cost(two_source_anchors, one_anchors[j])
+                    if ending != endings[j]:
+                        cost += 1.0
+                    if cost < best:
+                        best, best_move = cost, 3
+            if j >= 2 and 1 < k1 <= len1 + 1:
+                cost = prev1[k1 - 2] + prior_12
+                if cost < best + ANCHOR_WEIGHT:
+                    cost += length_cost(one_source, two_len[j])
+                    if one_source_anchors and two_anchors[j]:
+                        cost += _anchor_cost(one_source_anchors, two_anchors[j])
+                    if ending != endings[j]:
+                        cost += 1.0
+                    if cost < best:
+                        best, best_move = cost, 4
+            if j >= 2 and 1 < k2 <= len2 + 1:
+                cost = prev2[k2 - 2] + prior_22
+                if cost < best + ANCHOR_WEIGHT:
+                    cost += length_cost(two_source, two_len[j])
+                    if two_source_anchors and two_anchors[j]:
+                        cost += _anchor_cost(two_source_anchors, two_anchors[j])
+                    if ending != endings[j]:
+                        cost += 1.0
+                    if cost < best:
+                        best, best_move = cost, 5
+            cost_row[j - lo] = best
+            move_row[j - lo] = best_move
+        
+        moves.append(move_row)
+        best_j = lo + min(range(len(cost_row)), key=cost_row.__getitem__)
+        if i >= 2:
+            rows[i - 2] = None      # beads reach back at most two rows
+    
+    beads = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        di, dj, _ = BEADS[moves[i][j - bounds[i]]]
+        beads.append((tuple(range(i - di, i)), tuple(range(j - dj, j))))
+        i, j = i - di, j - dj
+    beads.reverse()
+    return beads
+
+def iter_beads(source_sentences, target_sentences, ratio, band=ALIGN_BAND, window=ALIGN_WINDOW):
+    """
+    Align two sentence streams window by window, yielding (source
+    sentences, target sentences) beads in order; ratio is the target/source
+    length ratio of the whole texts. A window aligns up to window source
+    sentences with the target sentences their length calls for, plus
+    WINDOW_MARGIN, and keeps the beads of its first three quarters; the
+    rest are aligned again in the next window, so the forced end of a
+    window does not fix any bead. Texts of up to window sentences are
+    aligned in one go, exactly as align_sentences aligns them.
+    """
+    sources, targets = iter(source_sentences), iter(target_sentences)
+    src, tgt = [], []
+    target_chars = 0
+    targets_left = True
+    while True:
+        src.extend(islice(sources, window - len(src)))
+        last = len(src) < window
+        if last:
+            tgt.extend(targets)
+        else:
+            wanted = sum(len(s) for s in src) * ratio * (1 + WINDOW_MARGIN)
+            while targets_left and target_chars < wanted:
+                sentence = next(targets, None)
+                if sentence is None:
+                    targets_left = False
+                    break
+                tgt.append(sentence)
+                target_chars += len(sentence)
+        beads = align_sentences(src, tgt, band, ratio)
+        if last:
+            for src_ids, tgt_ids in beads:
+                yield [src[i] for i in src_ids], [tgt[j] for j in tgt_ids]
+            return
+        
+        keep = len(src) * 3 // 4
+        src_used = tgt_used = 0
+        for src_ids, tgt_ids in beads:
+            if src_ids and src_ids[-1] >= keep:
+                break
+            yield [src[i] for i in src_ids], [tgt[j] for j in tgt_ids]
+            src_used += len(src_ids)
+            tgt_used += len(tgt_ids)
+        target_chars -= sum(len(t) for t in tgt[:tgt_used])
+        del src[:src_used], tgt[:tgt_used]
+
+def iter_sentence_units(paragraphs, budget):
+    """The non-empty sentences of paragraphs, with any over budget tokens cut into pieces that fit."""
+    for para in paragraphs:
+        for sentence in split_sentences(para):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            for piece, _ in split_to_budget(sentence, count_tokens(sentence), budget):
+                piece = piece.strip()
+                if piece:
+                    yield piece
+
+def length_ratio(source_chars, target_chars):
+    """Target/source length ratio for iter_beads, as align_sentences works it out from the lists."""
+    return max(target_chars, 1) / max(source_chars, 1)
+
+def pack_beads(beads, budget=CHUNK_TOKENS, pair_budget=SEGMENT_TOKENS, breaks=None, starts=None):
+    """
+    Pack consecutive (source sentences, target sentences) beads into
+    segments of at most budget source tokens and pair_budget source +
+    target tokens, yielded as (source sentences, target sentences). A
+    trailing run of untranslated target sentences is folded into the last
+    segment. breaks and starts work as in chunking.token_chunk, on source
+    sentence indices.
+    """
+    segment = None
+    src, tgt = [], []
+    src_used = pair_used = 0
+    index = 0           # of the next source sentence
+    for src_part, tgt_part in beads:
+        s_tokens = sum(count_tokens(s) for s in src_part)
+        t_tokens = sum(count_tokens(t) for t in tgt_part)
+        first = index if src_part else None
+        index += len(src_part)
+        if src and (src_used + s_tokens > budget or pair_used + s_tokens + t_tokens > pair_budget
+                    or (breaks and first in breaks)):
+            if segment is not None:
+                yield segment
+            segment = (src, tgt)
+            src, tgt = [], []
+            src_used = pair_used = 0
+        if starts is not None and not src and first is not None:
+            starts.append(first)
+        src.extend(src_part)
+        tgt.extend(tgt_part)
+        src_used += s_tokens
+        pair_used += s_tokens + t_tokens
+    if segment is not None and not src:
+        src, tgt = segment[0], segment[1] + tgt
+    elif segment is not None:
+        yield segment
+    if src or tgt:
+        yield src, tgt
+
+def align_segments(source_text, target_text, budget=CHUNK_TOKENS, pair_budget=SEGMENT_TOKENS, band=ALIGN_BAND,
+                   resync=None, starts=None):
+    """
+    Split both texts into sentences, align them and pack consecutive beads
+    into (source, target) segments of at most budget source tokens and
+    pair_budget source + target tokens, so no segment needs truncating.
+    resync and starts work as in chunking.token_chunk, on source sentences.
+    Files go through the same steps (documents.iter_document_pairs).
+    """
+    source_sentences = list(iter_sentence_units(re.split(r'\n\s*\n', source_text), budget))
+    breaks = resync(source_sentences) if resync is not None else None
+    target_sentences = list(iter_sentence_units(re.split(r'\n\s*\n', target_text), pair_budget - budget))
+    ratio = length_ratio(sum(len(s) for s in source_sentences), sum(len(t) for t in target_sentences))
+    beads = iter_beads(source_sentences, target_sentences, ratio, band)
+    return [("\n".join(src), "\n".join(tgt)) for src, tgt in pack_beads(beads, budget, pair_budget, breaks, starts)]
@@ -0,0 +1,307 @@
+# Resumable batch jobs: many document pairs on one shared pool, checkpointed per segment.
+
+import csv
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import nullcontext
+
+from .config import ADAPTIVE_CONCURRENCY, BATCH_IN_FLIGHT, CANDIDATE_PREFILTER, CHUNK_OVERLAP, CHUNK_TOKENS, RATE_LIMIT
+from .documents import iter_document_pairs
+from .export import export_terms
+from .extraction import is_custom_command, iter_segments
+from .incremental import SegmentMemo
+from .llm import AdaptiveConcurrency, RateLimiter, client_pool
+from .metrics import Recorder
+from .pipeline import (
+    prefilter_segments, read_document, segment_context, segment_extractor, select_terms, sentence_recall,
+)
+from .terms import TermMerger, validate_terms
+
+CHECKPOINT_NAME = "checkpoint.jsonl"
+SUMMARY_NAME = "summary.json"
+
+def load_manifest(path):
+    """
+    Document pairs listed in a manifest: JSON (a list), JSON lines, or one
+    "source[<TAB>target]" pair per line. JSON entries are objects with
+    "source" and optional "target" and "id", or plain source paths.
+    Relative paths are taken from the manifest's directory. Returns dicts
+    with id, source and target (None without a translation); ids default
+    to the source file name and are made unique.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8-sig") as f:
+        text = f.read()
+    
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        entries = json.loads(stripped)
+    elif stripped.startswith("{"):
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        entries = [row for row in csv.reader(text.splitlines(), delimiter="\t")
+                   if row and row[0].strip() and not row[0].startswith("#")]
+    
+    documents, ids = [], set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"source": entry}
+        elif isinstance(entry, list):
+            entry = {"source": entry[0], "target": entry[1] if len(entry) > 1 else None}
+        if not isinstance(entry, dict) or not entry.get("source"):
+            raise ValueError(f"{path}: manifest entry without a source: {entry!r}")
+        source = os.path.join(base, entry["source"].strip())
+        target = os.path.join(base, entry["target"].strip()) if (entry.get("target") or "").strip() else None
+        doc_id = re.sub(r'[^\w.-]', '_', str(entry.get("id") or os.path.splitext(os.path.basename(source))[0]))
+        unique, n = doc_id, 1
+        while unique in ids:
+            n += 1
+            unique = f"{doc_id}-{n}"
+        ids.add(unique)
+        documents.append({"id": unique, "source": source, "target": target})
+    return documents
+
+class Checkpoint:
+    """
+    Append-only JSON lines log of finished segments, one record per
+    (document, segment): its key (hash of the segment text and the run
+    settings) and its terms. Reopening it loads every record, so a restarted
+    job skips the segments already done; a line cut short by a crash is
+    truncated away. Records are flushed as they are written. Segments are
+    looked up by key, so a document that was edited since, or a job run with
+    other settings, only reuses segments that are still the same.
+    Not thread-safe: the batch runner only uses it from the caller's thread.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.results = {}      # key -> terms
+        self.recorded = set()  # (document id, segment, key)
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def _load(self):
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                    self.results[record["key"]] = record["terms"]
+                    self.recorded.add((record["doc"], record["segment"], record["key"]))
+                except (ValueError, KeyError, TypeError):
+                    break
+                good += len(line)
+        if good < os.path.getsize(self.path):
+            os.truncate(self.path, good)
+    
+    def __len__(self):
+        return len(self.recorded)
+    
+    def get(self, key):
+        terms = self.results.get(key)
+        return None if terms is None else [dict(t) for t in terms]
+    
+    def record(self, doc_id, segment, key, terms):
+        if (doc_id, segment, key) in self.recorded:
+            return
+        self.recorded.add((doc_id, segment, key))
+        self.results[key] = [dict(t) for t in terms]
+        self._file.write(json.dumps({"doc": doc_id, "segment": segment, "key": key, "terms": terms},
+                                    ensure_ascii=False) + "\n")
+        self._file.flush()
+    
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+def _document_path(job_dir, doc_id, fmt):
+    return os.path.join(job_dir, "documents", f"{doc_id}.{fmt}")
+
+def run_batch(documents, job_dir, focus="", term_filter="all", max_terms=150, fmt="csv",
+              client=None, api_token="", max_in_flight=BATCH_IN_FLIGHT, rate=RATE_LIMIT, glossary=None,
+              termbase=None, recorder=None, on_document=None, prefilter=CANDIDATE_PREFILTER):
+    """
+    Extract terms from every document pair (dicts from load_manifest) as one
+    job. Segments of all documents go through a single window of
+    max_in_flight concurrent calls and one rate limiter, so throughput
+    depends on the pool size, not on how many documents there are, and a
+    document is only opened once the window reaches it.
+    Each finished segment is appended to job_dir/checkpoint.jsonl; running
+    the same job again resumes from it, calling the model only for segments
+    that are missing or failed. As a document completes, its glossary is
+    written to job_dir/documents/<id>.<fmt> and on_document(entry) is called;
+    at the end all documents are merged (deduped, filtered, uncapped) into
+    job_dir/merged.<fmt>, merged into termbase if given, and a summary is
+    written to job_dir/summary.json and returned.
+    prefilter sends each document's statistical term candidates instead of
+    its segments, as in pipeline.iter_extraction.
+    Otherwise sentences already held by memory.sentence_memory, including
+    those of earlier documents of the job, are not sent again; the
+    summary's 'sentence_memory' reports how many were recalled.
+    """
+    focus = focus.strip() if focus else ""
+    use_custom_mode = is_custom_command(focus) and term_filter == "all"
+    prefilter = prefilter and not use_custom_mode
+    os.makedirs(os.path.join(job_dir, "documents"), exist_ok=True)
+    recorder = recorder or Recorder()
+    start_time = time.time()
+    
+    cache_stats = {"hits": 0, "misses": 0}
+    context = segment_context(use_custom_mode, focus, term_filter, glossary)
+    concurrency = AdaptiveConcurrency(max_in_flight) if ADAPTIVE_CONCURRENCY else None
+    checkpoint = Checkpoint(os.path.join(job_dir, CHECKPOINT_NAME))
+    recall = None if prefilter else sentence_recall(use_custom_mode, term_filter, context, recorder)
+    
+    entries = [{
+        'id': doc['id'],
+        'source': doc['source'],
+        'target': doc['target'],
+        'segments': 0,
+        'reused_segments': 0,
+        'failed_segments': [],
+        'terms': 0,
+        'path': None,
+        'error': None,
+    } for doc in documents]
+    state = {e['id']: {"scanned": False, "done": 0, "results": {}, "unique": None} for e in entries}
+    origins = []   # global segment index -> (entry, segment index in its document, checkpoint key)
+    open_entries = []
+    
+    def pairs():
+        for entry in entries:
+            open_entries.append(entry)
+            count = 0
+            try:
+                _, doc_pairs = iter_document_pairs(entry['source'], entry['target'], CHUNK_TOKENS, CHUNK_OVERLAP)
+                if prefilter:
+                    _, doc_pairs = prefilter_segments(doc_pairs, read_document(entry['source']), recorder)
+                for src, tgt in doc_pairs:
+                    # Keyed on the whole segment, so recall below does not change what a resumed job finds
+                    key = SegmentMemo.make_key(context, src, tgt) if src else None
+                    origins.append((entry, count, key))
+                    count += 1
+                    if recall is not None and key is not None and checkpoint.get(key) is None:
+                        src = recall.take(len(origins) - 1, src, tgt)
+                    yield src, tgt
+            except OSError as e:
+                entry['error'] = str(e)
+            entry['segments'] = count
+            state[entry['id']]["scanned"] = True
+    
+    def cached(src, tgt):
+        # Called right after pairs() yields the segment, so origins[-1] is its origin
+        entry, _, key = origins[-1]
+        terms = checkpoint.get(key) if key is not None else None
+        if terms is None:
+            # A prefiltered segment with no new candidates, or one whose sentences were all recalled
+            return ([], "") if not src else None
+        entry['reused_segments'] += 1
+        return terms, ""
+    
+    def finish(entry):
+        doc = state[entry['id']]
+        merger = TermMerger()
+        for n in sorted(doc["results"]):
+            merger.add(doc["results"][n])
+        doc["results"] = None
+        # Kept with its counts so the job-wide merge weighs targets across documents
+        doc["unique"] = merger
+        unique_terms = merger.terms()
+        _, final_terms = select_terms(unique_terms, use_custom_mode, term_filter, max_terms)
+        entry['terms'] = len(final_terms)
+        if entry['segments'] and len(entry['failed_segments']) < entry['segments']:
+            entry['path'] = export_terms(final_terms, fmt, _document_path(job_dir, entry['id'], fmt))
+        if termbase is not None and unique_terms:
+            # A termbase failure must not stop the job
+            try:
+                with recorder.span("termbase", terms=len(unique_terms)):
+                    termbase.upsert(unique_terms)
+            except sqlite3.Error as e:
+                entry['error'] = f"termbase not updated ({e})"
+        recorder.flush()
+        if on_document:
+            on_document(entry)
+    
+    def finish_completed():
+        for entry in list(open_entries):
+            doc = state[entry['id']]
+            if doc["scanned"] and doc["done"] >= entry['segments']:
+                open_entries.remove(entry)
+                finish(entry)
+    
+    recorder.start_profile()
+    # The shared client for this token stays open until the job ends
+    lease = client_pool.lease(api_token or "") if client is None else nullcontext(client)
+    try:
+        with lease as client:
+            extract_fn = segment_extractor(use_custom_mode, focus, term_filter, client, glossary, cache_stats,
+                                           recorder=recorder, concurrency=concurrency, prefilter=prefilter)
+            if recall is not None:
+                extract_fn = recall.learning(extract_fn)
+            segments = iter_segments(pairs(), extract_fn, max_in_flight, RateLimiter(rate), recorder, cached)
+            try:
+                for i, (src, tgt), (terms, raw), error in segments:
+                    entry, n, key = origins[i]
+                    doc = state[entry['id']]
+                    doc["done"] += 1
+                    if recall is not None:
+                        # Recalled terms count even when the rest of the segment failed
+                        terms = recall.complete(i, terms)
+                    if error is not None:
+                        entry['failed_segments'].append({
+                            'segment': n + 1,
+                            'source_chars': len(src),
+                            'attempts': getattr(error, 'attempts', 1),
+                            'error': str(error),
+                        })
+                    # Segments without text have nothing to record
+                    elif key is not None:
+                        checkpoint.record(entry['id'], n, key, terms)
+                    if terms:
+                        doc["results"][n] = validate_terms(terms)
+                    finish_completed()
+            finally:
+                # Cancels queued segments if the job is interrupted
+                segments.close()
+        finish_completed()
+    finally:
+        checkpoint.close()
+        recorder.stop_profile()
+        recorder.flush()
+    
+    # Merge in manifest order so the result does not depend on completion order
+    merged = TermMerger()
+    for entry in entries:
+        if state[entry['id']]["unique"] is not None:
+            merged.merge(state[entry['id']]["unique"])
+    _, merged_terms = select_terms(merged.terms(), use_custom_mode, term_filter)
+    merged_path = export_terms(merged_terms, fmt, os.path.join(job_dir, f"merged.{fmt}"))
+    
+    usage = recorder.summary().get("llm.call", {})
+    summary = {
+        'job_dir': job_dir,
+        'documents': entries,
+        'segments': sum(e['segments'] for e in entries),
+        'reused_segments': sum(e['reused_segments'] for e in entries),
+        'failed_segments': sum(len(e['failed_segments']) for e in entries),
+        'merged_terms': len(merged_terms),
+        'merged_path': merged_path,
+        'elapsed': time.time() - start_time,
+        'calls': usage.get('count', 0),
+        'retries': usage.get('retries', 0),
+        'coalesced': usage.get('coalesced', 0),
+        'sentence_memory': recall.report() if recall is not None else None,
+        'run_id': recorder.run_id,
+    }
+    with open(os.path.join(job_dir, SUMMARY_NAME), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
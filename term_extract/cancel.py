@@ -0,0 +1,66 @@
+# Cooperative cancellation and time budgets for extraction runs.
+
+import threading
+import time
+
+class RunCancelled(RuntimeError):
+    """Raised inside a segment's call when its run was stopped or ran out of time."""
+
+class CancelToken:
+    """
+    Shared by every segment of one run. cancel() (the Stop button, a closed
+    session) or the end of the budget in seconds stops the run: segments
+    not started are dropped, waits for the rate limiter and backoff end
+    early, no more attempts are made and streamed answers stop being read.
+    A call already waiting for a whole response finishes in the background,
+    and its answer still goes into the response cache.
+    reason is None until then, and "deadline" or cancel()'s reason after.
+    """
+    
+    def __init__(self, budget=None):
+        self.event = threading.Event()
+        self.deadline = time.monotonic() + budget if budget else None
+        self.reason = None
+        self.callbacks = []
+        self.lock = threading.Lock()
+    
+    def cancel(self, reason="cancelled"):
+        with self.lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks, self.callbacks = self.callbacks, []
+        self.event.set()
+        for callback in callbacks:
+            callback()
+    
+    @property
+    def cancelled(self):
+        # The deadline is noticed by whoever looks first
+        if not self.event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self.event.is_set()
+    
+    def remaining(self):
+        """Seconds left in the budget, or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def on_cancel(self, callback):
+        """Call callback() once when the run is cancelled (at once if it already is)."""
+        with self.lock:
+            if self.reason is None:
+                self.callbacks.append(callback)
+                return
+        callback()
+    
+    def check(self):
+        if self.cancelled:
+            raise RunCancelled(f"run {self.reason}")
+    
+    def sleep(self, seconds):
+        """time.sleep that raises RunCancelled as soon as the run is cancelled or its budget ends."""
+        remaining = self.remaining()
+        self.event.wait(seconds if remaining is None else min(seconds, remaining))
+        self.check()
@@ -0,0 +1,156 @@
+# Statistical term candidates: n-gram frequency, C-value and branching entropy over the Chinese source.
+
+import math
+import re
+from collections import Counter
+
+from .config import CANDIDATE_CONTEXT, CANDIDATE_LIMIT, CANDIDATE_MAX_CHARS, CANDIDATE_MIN_ENTROPY, CANDIDATE_MIN_FREQ
+from .glossary import Automaton
+
+_HAN = '[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'
+_HAN_RUN = re.compile(_HAN + '{2,}')
+# Function characters that a term does not start or end with
+_EDGE_STOP = frozenset("的了是在和與与及或等也都就而並并為为於于之其我你他她們们這这那被把將将對对從从向以")
+RUNS_PER_PIECE = 4096
+
+def _pieces(runs):
+    # findall over a few thousand runs at a time keeps the gram lists small
+    for i in range(0, len(runs), RUNS_PER_PIECE):
+        yield "\n".join(runs[i:i + RUNS_PER_PIECE])
+
+def count_ngrams(text, max_chars=CANDIDATE_MAX_CHARS, min_freq=CANDIDATE_MIN_FREQ):
+    """
+    Frequencies of the Han n-grams of text up to max_chars + 1 characters,
+    and for each n-gram the sums of c*log2(c) over the counts c of its
+    one-character extensions to the left and to the right.
+    Counting is level by level and pruned like Apriori: an n-gram is only
+    counted when both of its (n-1)-grams occur min_freq times, so memory
+    follows the repeated spans rather than the length of the text. Returns
+    (frequencies of the n-grams occurring min_freq times, left sums, right sums).
+    """
+    runs = _HAN_RUN.findall(text)
+    counts = Counter()
+    for piece in _pieces(runs):
+        counts.update(piece)
+    counts.pop("\n", None)
+    frequent = {g: c for g, c in counts.items() if c >= min_freq}
+    freq = dict(frequent)
+    left, right = Counter(), Counter()
+    
+    for n in range(2, max_chars + 2):
+        if not frequent:
+            break
+        pattern = re.compile(f'(?=({_HAN}{{{n}}}))')
+        counts = Counter()
+        for piece in _pieces(runs):
+            counts.update([g for g in pattern.findall(piece) if g[:-1] in frequent and g[1:] in frequent])
+        for g, c in counts.items():
+            # Extensions seen once add nothing; neither do the ones pruned away,
+            # which are counted as distinct neighbours by branching_entropy
+            if c > 1:
+                weight = c * math.log2(c)
+                right[g[:-1]] += weight
+                left[g[1:]] += weight
+        frequent = {g: c for g, c in counts.items() if c >= min_freq}
+        freq.update(frequent)
+    return freq, left, right
+
+def branching_entropy(freq, weights):
+    """Entropy in bits of a span's neighbours on one side; neighbours not counted are taken as all different."""
+    return max(0.0, math.log2(freq) - weights / freq)
+
+def rank_candidates(text, max_chars=CANDIDATE_MAX_CHARS, min_freq=CANDIDATE_MIN_FREQ,
+                    min_entropy=CANDIDATE_MIN_ENTROPY, limit=CANDIDATE_LIMIT):
+    """
+    Likely terms of a Chinese document, found without a model: Han spans of
+    2 to max_chars characters that occur at least min_freq times, are
+    followed and preceded by varied characters (branching entropy of at
+    least min_entropy bits on both sides, so "衞生防護中" is dropped for
+    "衞生防護中心") and do not start or end with a function character.
+    They are scored by C-value, which discounts a span by the frequency of
+    the longer candidates containing it, times one plus the weaker entropy.
+    Returns the top limit as dicts with source, frequency, c_value, entropy
+    and score, best first.
+    """
+    freq, left, right = count_ngrams(text, max_chars, min_freq)
+    
+    spans = {}
+    for g, f in freq.items():
+        if not 2 <= len(g) <= max_chars or g[0] in _EDGE_STOP or g[-1] in _EDGE_STOP:
+            continue
+        entropy = min(branching_entropy(f, left[g]), branching_entropy(f, right[g]))
+        if entropy >= min_entropy:
+            spans[g] = entropy
+    
+    # Frequencies of the longer candidates each candidate is nested in
+    nested_count, nested_freq = Counter(), Counter()
+    for g in spans:
+        inner = {g[i:j] for i in range(len(g)) for j in range(i + 2, len(g) + 1)} - {g}
+        for s in inner:
+            if s in spans:
+                nested_count[s] += 1
+                nested_freq[s] += freq[g]
+    
+    candidates = []
+    for g, entropy in spans.items():
+        f = freq[g]
+        c_value = math.log2(len(g)) * (f - nested_freq[g] / nested_count[g] if nested_count[g] else f)
+        if c_value <= 0:
+            continue
+        candidates.append({
+            'source': g,
+            'frequency': f,
+            'c_value': round(c_value, 3),
+            'entropy': round(entropy, 3),
+            'score': round(c_value * (1 + entropy), 3),
+        })
+    candidates.sort(key=lambda c: (-c['score'], c['source']))
+    return candidates[:limit]
+
+def candidate_terms(candidates):
+    """Candidates as term dicts for export (no target; the offline mode's output)."""
+    return [{'source': c['source'], 'target': "", 'category': "candidate",
+             'frequency': c['frequency'], 'score': c['score']} for c in candidates]
+
+class CandidateSet:
+    """
+    A document's ranked candidates, handed out to its segments in order:
+    each candidate goes with the first segment it occurs in, with a short
+    context from there. Not thread-safe; segments() is consumed by the
+    thread that submits segments, in document order.
+    """
+    
+    def __init__(self, candidates, context=CANDIDATE_CONTEXT):
+        self.candidates = candidates
+        self.context = context
+        self.automaton = Automaton([c['source'] for c in candidates])
+        self.sent = set()
+        self.segments_sent = 0
+    
+    def __len__(self):
+        return len(self.candidates)
+    
+    def claim(self, text):
+        """(candidate, context) for the candidates in text not sent with an earlier segment."""
+        found = {}
+        for start, end, index in self.automaton.iter_matches(text):
+            if index not in self.sent and index not in found:
+                found[index] = " ".join(text[max(0, start - self.context):end + self.context].split())
+        self.sent.update(found)
+        return [(self.candidates[index], context) for index, context in found.items()]
+    
+    def segments(self, pairs):
+        """
+        (candidate list, target) in place of each (source, target) segment;
+        the list is "" for a segment with no new candidates, which needs no
+        model call.
+        """
+        for src, tgt in pairs:
+            claimed = self.claim(src)
+            if claimed:
+                self.segments_sent += 1
+            yield format_candidates(claimed), tgt
+
+def format_candidates(claimed):
+    """One "term | …context…" line per candidate, for the prompt."""
+    return "\n".join(f"{c['source']} | …{context}…" for c, context in claimed)
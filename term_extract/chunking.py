@@ -0,0 +1,184 @@
+# Splitting source/target texts into aligned segments.
+
+import math
+import re
+
+from .config import CHUNK_OVERLAP, CHUNK_TOKENS
+from .tokens import count_tokens
+
+# Zero-width split after sentence-ending punctuation, keeping the text intact
+SENTENCE_BREAK = re.compile(r'(?<=[。！？!?])|(?<=\.)(?=\s)')
+
+def iter_paragraphs(lines):
+    """Yield non-empty paragraphs (separated by blank lines) from an iterable of lines."""
+    para = []
+    for line in lines:
+        if line.strip():
+            para.append(line)
+        elif para:
+            yield "".join(para).strip()
+            para = []
+    if para:
+        yield "".join(para).strip()
+
+def iter_chunks(paragraphs, size=1500):
+    """Lazily pack paragraphs into chunks of at most size characters."""
+    current = ""
+    
+    for para in paragraphs:
+        para = para.strip()
+        if not para:
+            continue
+        if len(current) + len(para) + 2 <= size:
+            current += para + "\n\n"
+        else:
+            if current:
+                yield current.strip()
+            current = para + "\n\n" if len(para) <= size else para[:size]
+    
+    if current:
+        yield current.strip()
+
+def smart_chunk(text, size=1500):
+    if not text or len(text) <= size:
+        return [text] if text else []
+    
+    chunks = list(iter_chunks(re.split(r'\n\s*\n', text), size))
+    
+    return chunks if chunks else [text[:size]]
+
+def split_sentences(text):
+    return [s for s in SENTENCE_BREAK.split(text) if s]
+
+def split_to_budget(text, tokens, budget, count=count_tokens):
+    """Yield (piece, tokens): the text itself if it fits, else equal-length pieces that do."""
+    if tokens <= budget:
+        yield text, tokens
+        return
+    parts = math.ceil(tokens / budget)
+    step = math.ceil(len(text) / parts)
+    for k in range(0, len(text), step):
+        piece = text[k:k + step]
+        yield piece, count(piece)
+
+def _iter_units(paragraphs, budget, count):
+    """
+    Yield (text, tokens, joiner) units that each fit the budget. Paragraphs
+    over the budget are split at sentence ends, and sentences still over it
+    are cut into equal pieces, so no text is ever dropped.
+    """
+    for para in paragraphs:
+        para = para.strip()
+        if not para:
+            continue
+        tokens = count(para)
+        if tokens <= budget:
+            yield para, tokens, "\n\n"
+            continue
+        joiner = "\n\n"
+        for sentence in split_sentences(para):
+            for piece, tokens in split_to_budget(sentence, count(sentence), budget, count):
+                yield piece, tokens, joiner
+                joiner = ""
+
+def _pack_units(units, budget, overlap, breaks=None, starts=None):
+    current = []      # (text, tokens, joiner)
+    used = 0
+    
+    for index, unit in enumerate(units):
+        if current and (used + unit[1] > budget or (breaks and index in breaks)):
+            if starts is not None:
+                starts.append(index)
+            yield "".join(joiner + text if i else text for i, (text, _, joiner) in enumerate(current)).strip()
+            carried = []
+            carried_tokens = 0
+            for prev in reversed(current):
+                if carried_tokens + prev[1] > overlap or carried_tokens + prev[1] + unit[1] > budget:
+                    break
+                carried.insert(0, prev)
+                carried_tokens += prev[1]
+            current, used = carried, carried_tokens
+        elif not current and starts is not None:
+            starts.append(index)
+        current.append(unit)
+        used += unit[1]
+    
+    if current:
+        yield "".join(joiner + text if i else text for i, (text, _, joiner) in enumerate(current)).strip()
+
+def iter_token_chunks(paragraphs, budget=CHUNK_TOKENS, overlap=CHUNK_OVERLAP, count=count_tokens):
+    """
+    Lazily pack paragraphs into chunks of about budget tokens. With overlap,
+    up to that many tokens of trailing units are repeated at the start of
+    the next chunk so terms spanning a boundary are seen whole.
+    """
+    return _pack_units(_iter_units(paragraphs, budget, count), budget, overlap)
+
+def token_chunk(text, budget=CHUNK_TOKENS, overlap=CHUNK_OVERLAP, resync=None, starts=None):
+    """
+    Token-budget counterpart of smart_chunk that never truncates.
+    resync(units), given the unit texts, returns the unit indices where a
+    chunk must start, e.g. the boundaries of an earlier chunking of an
+    edited version of the text, so unchanged chunks come out identical.
+    The index of the unit starting each chunk is appended to starts.
+    """
+    if not text or not text.strip():
+        return []
+    if count_tokens(text) <= budget:
+        return [text.strip()]
+    
+    units = _iter_units(re.split(r'\n\s*\n', text), budget, count_tokens)
+    if resync is None:
+        return list(_pack_units(units, budget, overlap, starts=starts))
+    units = list(units)
+    return list(_pack_units(units, budget, overlap, resync([u[0] for u in units]), starts))
+
+def iter_align(source_chunks, target_chunks, source_total, target_total):
+    """
+    Proportional alignment without holding the whole target in memory.
+    source_total is the summed length of the source chunks and target_total
+    the length of the target chunks joined with blank lines; both iterables
+    are consumed once.
+    """
+    target_iter = iter(target_chunks)
+    buf = ""        # the joined target from offset onwards
+    offset = 0
+    started = False
+    pos = 0
+    
+    def fill(upto):
+        nonlocal buf, started
+        while offset + len(buf) < upto:
+            chunk = next(target_iter, None)
+            if chunk is None:
+                return
+            buf += ("\n\n" + chunk) if started else chunk
+            started = True
+    
+    for src in source_chunks:
+        ratio = len(src) / source_total if source_total else 0
+        chunk_len = int(ratio * target_total)
+        end_pos = min(pos + chunk_len, target_total)
+        
+        if end_pos < target_total:
+            fill(end_pos + 200)
+            boundary = buf.rfind('\n', pos - offset, end_pos + 200 - offset)
+            if boundary >= 0 and boundary + offset > pos:
+                end_pos = boundary + offset
+        
+        fill(end_pos)
+        yield src, buf[pos - offset:end_pos - offset].strip()
+        buf = buf[end_pos - offset:]
+        offset = pos = end_pos
+
+def align_chunks(source_chunks, target_chunks):
+    if not target_chunks:
+        return [(s, "") for s in source_chunks]
+    
+    if len(source_chunks) == len(target_chunks):
+        return list(zip(source_chunks, target_chunks))
+    
+    source_total = sum(len(s) for s in source_chunks)
+    target_total = sum(len(t) for t in target_chunks) + 2 * (len(target_chunks) - 1)
+    
+    return list(iter_align(source_chunks, target_chunks, source_total, target_total))
@@ -0,0 +1,244 @@
+# Command-line entry point: term-extract
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import nullcontext
+
+from .cancel import CancelToken
+from .config import (
+    BATCH_IN_FLIGHT, CANDIDATE_PREFILTER, METRICS_TEXTFILE, PROFILE, RATE_LIMIT, RUN_BUDGET, SENTENCE_MEMORY,
+    TRACE_PATH,
+)
+from .export import BINARY_FORMATS, EXPORT_FORMATS, export_terms, write_terms, write_xlsx
+from .terms import FILTER_CHOICES
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="term-extract",
+        description="Extract bilingual term pairs from Chinese source texts and optional English translations.",
+    )
+    parser.add_argument("sources", nargs="*", default=["-"],
+                        help="Source text files; '-' reads stdin (default)")
+    parser.add_argument("-t", "--target", action="append", default=[],
+                        help="Translation file, paired with the sources in order (repeatable)")
+    parser.add_argument("-f", "--focus", default="", help="Focus keywords or a custom command")
+    parser.add_argument("--filter", default="all", choices=FILTER_CHOICES, help="Category filter")
+    parser.add_argument("-n", "--max-terms", type=int, default=150, help="Maximum terms per document")
+    parser.add_argument("-g", "--glossary",
+                        help="Known terms (CSV, TSV, JSON, TBX or a --termbase database); added directly, not re-extracted")
+    parser.add_argument("--termbase",
+                        help="SQLite termbase to merge the results into (created if missing)")
+    parser.add_argument("--token", default=os.environ.get("LLM7_TOKEN", ""),
+                        help="LLM7 API token (default: $LLM7_TOKEN)")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible endpoint (default: $LLM7_BASE_URL or the LLM7 API)")
+    parser.add_argument("--format", default="csv", choices=EXPORT_FORMATS, help="Output format")
+    parser.add_argument("-o", "--output",
+                        help="Output file for one source, or directory for several (default: stdout / current directory)")
+    parser.add_argument("--manifest",
+                        help="Run the document pairs listed in this file (source<TAB>target per line, or JSON) "
+                             "as a resumable batch job in the --output directory (default: term_extract_job)")
+    parser.add_argument("--in-flight", type=int, default=BATCH_IN_FLIGHT,
+                        help="Concurrent segment calls shared by all documents of a batch job")
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT,
+                        help="Segment calls started per second in a batch job; 0 leaves only --in-flight")
+    parser.add_argument("--prefilter", action="store_true", default=CANDIDATE_PREFILTER,
+                        help="Send the model ranked term candidates with short contexts instead of whole segments")
+    parser.add_argument("--budget", type=float, default=RUN_BUDGET,
+                        help="Seconds per document before extraction stops and writes the terms found so far; "
+                             "0 is no limit")
+    parser.add_argument("--memory", action="store_true", default=SENTENCE_MEMORY,
+                        help="Recall and store the terms of each sentence in the sentence memory, a file shared "
+                             "by every run on this machine")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="Send every sentence, without the sentence memory")
+    parser.add_argument("--candidates-only", action="store_true",
+                        help="Only rank term candidates statistically, without calling the model (no targets)")
+    parser.add_argument("--trace", help="Append per-stage and per-call spans to this JSON lines file")
+    parser.add_argument("--metrics-textfile", help="Write Prometheus metrics to this file after each document")
+    parser.add_argument("--profile", choices=("cprofile", "tracemalloc"), help="Profile each document")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the debug log to stderr")
+    return parser
+
+def spool_stdin():
+    """Copy stdin to a temporary file so it is streamed like any other document."""
+    with tempfile.NamedTemporaryFile("wb", suffix=".txt", delete=False) as f:
+        shutil.copyfileobj(sys.stdin.buffer, f)
+    return f.name
+
+def output_path(source, fmt, output, several):
+    if not several:
+        return output
+    stem = "stdin" if source == "-" else os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(output or ".", f"{stem}.{fmt}")
+
+def candidate_result(path, max_terms):
+    """--candidates-only: the top candidates of a document, shaped like a run_file_extraction result."""
+    from .candidates import candidate_terms, rank_candidates
+    from .pipeline import read_document
+    
+    text = read_document(path)
+    return {
+        'terms': candidate_terms(rank_candidates(text, limit=max_terms)),
+        'segments': 1 if text.strip() else 0,
+        'failed_segments': [],
+        'debug_log': "",
+    }
+
+def run_manifest(args, client, glossary, termbase, recorder):
+    from .batch import load_manifest, run_batch
+    
+    try:
+        documents = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"term-extract: manifest: {e}", file=sys.stderr)
+        return 2
+    
+    def report(entry):
+        name = os.path.relpath(entry['source'])
+        if entry['error']:
+            print(f"term-extract: {name}: {entry['error']}", file=sys.stderr)
+        for f in entry['failed_segments']:
+            print(f"term-extract: {name}: segment {f['segment']} failed after {f['attempts']} attempt(s): "
+                  f"{f['error']}", file=sys.stderr)
+        reused = f", {entry['reused_segments']} from checkpoint" if entry['reused_segments'] else ""
+        print(f"{name}: {entry['segments']} segments{reused}, {entry['terms']} terms -> {entry['path']}",
+              file=sys.stderr)
+    
+    summary = run_batch(documents, args.output or "term_extract_job", args.focus, args.filter, args.max_terms,
+                        args.format, client=client, api_token=args.token,
+                        max_in_flight=args.in_flight, rate=args.rate, glossary=glossary,
+                        termbase=termbase, recorder=recorder, on_document=report, prefilter=args.prefilter)
+    print(f"{len(documents)} documents, {summary['segments']} segments ({summary['reused_segments']} from "
+          f"checkpoint, {summary['failed_segments']} failed) in {summary['elapsed']:.1f}s: "
+          f"{summary['merged_terms']} terms -> {summary['merged_path']}", file=sys.stderr)
+    if summary['sentence_memory'] is not None:
+        recalled = summary['sentence_memory']
+        print(f"Sentence memory: {recalled['recalled']} of {recalled['sentences']} sentences recalled "
+              f"({recalled['hit_rate']:.0%}), {recalled['tokens_saved']} source tokens not sent", file=sys.stderr)
+    # Failed segments are retried when the job is run again
+    failed = any(e['error'] or e['failed_segments'] or not e['segments'] for e in summary['documents'])
+    return 1 if failed else 0
+
+def run_sources(args, client, glossary, termbase, several):
+    from .metrics import Recorder
+    from .pipeline import run_file_extraction
+    
+    failed = 0
+    for i, source in enumerate(args.sources):
+        target = args.target[i] if i < len(args.target) else None
+        spooled = []
+        try:
+            source_path, target_path = source, target
+            if source == "-":
+                source_path = spool_stdin()
+                spooled.append(source_path)
+            if target == "-":
+                target_path = spool_stdin()
+                spooled.append(target_path)
+            if args.candidates_only:
+                result = candidate_result(source_path, args.max_terms)
+            else:
+                result = run_file_extraction(source_path, target_path, args.focus, args.filter, args.max_terms,
+                                             client=client, api_token=args.token,
+                                             glossary=glossary, termbase=termbase,
+                                             recorder=Recorder(trace_path=args.trace or TRACE_PATH,
+                                                               textfile=args.metrics_textfile or METRICS_TEXTFILE,
+                                                               profile=args.profile or PROFILE),
+                                             prefilter=args.prefilter,
+                                             cancel=CancelToken(args.budget) if args.budget else None)
+        except OSError as e:
+            print(f"term-extract: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        finally:
+            for path in spooled:
+                os.remove(path)
+        
+        if not result['segments']:
+            print(f"term-extract: {source}: empty source text", file=sys.stderr)
+            failed += 1
+            continue
+        
+        if args.verbose:
+            print(result['debug_log'], file=sys.stderr)
+        
+        # Partial results are still written, but the exit status reports the loss
+        for f in result['failed_segments']:
+            print(f"term-extract: {source}: segment {f['segment']} failed after {f['attempts']} attempt(s): "
+                  f"{f['error']}", file=sys.stderr)
+        if result.get('partial'):
+            print(f"term-extract: {source}: stopped ({result['partial']}) after {result['segments_done']} of "
+                  f"{result['segments']} segments; the terms are partial", file=sys.stderr)
+        if result['failed_segments'] or result.get('partial'):
+            failed += 1
+            if len(result['failed_segments']) == result['segments']:
+                continue
+        
+        path = output_path(source, args.format, args.output, several)
+        if path:
+            export_terms(result['terms'], args.format, path)
+            print(f"{source}: {len(result['terms'])} terms -> {path}", file=sys.stderr)
+        elif args.format in BINARY_FORMATS:
+            sys.stdout.flush()
+            write_xlsx(result['terms'], sys.stdout.buffer)
+        else:
+            write_terms(result['terms'], args.format, sys.stdout)
+            sys.stdout.write("\n")
+    
+    return 1 if failed else 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    
+    if args.manifest and args.candidates_only:
+        print("term-extract: --candidates-only does not run batch jobs", file=sys.stderr)
+        return 2
+    if args.manifest and (args.target or args.sources != ["-"]):
+        print("term-extract: --manifest replaces source and --target files", file=sys.stderr)
+        return 2
+    if len(args.target) > len(args.sources):
+        print("term-extract: more --target files than sources", file=sys.stderr)
+        return 2
+    if (args.sources + args.target).count("-") > 1:
+        print("term-extract: stdin (-) can only be read once, for one source or --target", file=sys.stderr)
+        return 2
+    
+    # Imported here so --help stays fast
+    from .glossary import get_glossary
+    from .metrics import Recorder
+    from .termbase import TermBase
+    from . import memory
+    
+    if not args.memory:
+        memory.sentence_memory = None
+    elif memory.sentence_memory is None:
+        memory.sentence_memory = memory.SentenceMemory()
+    several = len(args.sources) > 1
+    if several and args.output:
+        os.makedirs(args.output, exist_ok=True)
+    
+    try:
+        glossary = get_glossary(args.glossary)
+    except (OSError, ValueError) as e:
+        print(f"term-extract: glossary: {e}", file=sys.stderr)
+        return 2
+    
+    termbase = TermBase(args.termbase) if args.termbase else None
+    if args.candidates_only:
+        # Ranking candidates needs no client, nor the openai package
+        lease = nullcontext()
+    else:
+        from .llm import client_pool
+        # Leased for the whole command, so the pool cannot close it while it is in use
+        lease = client_pool.lease(args.token, args.base_url)
+    with lease as client:
+        if args.manifest:
+            return run_manifest(args, client, glossary, termbase,
+                                Recorder(trace_path=args.trace or TRACE_PATH,
+                                         textfile=args.metrics_textfile or METRICS_TEXTFILE,
+                                         profile=args.profile or PROFILE))
+        return run_sources(args, client, glossary, termbase, several)
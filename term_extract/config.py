@@ -0,0 +1,72 @@
+# Shared settings for the extraction pipeline.
+
+import os
+import tempfile
+
+API_BASE_URL = os.environ.get("LLM7_BASE_URL", "https://api.llm7.io/v1")  # any OpenAI-compatible endpoint
+MODEL = "gpt-4.1-nano-2025-04-14"
+
+MAX_CHARS = 20000
+CHUNK_SIZE = 1500     # characters, for smart_chunk
+CHUNK_TOKENS = 1500   # token budget per segment
+CHUNK_OVERLAP = 0     # tokens of trailing context repeated at the start of the next segment
+SEGMENT_TOKENS = 3000 # source + target tokens sent per segment
+ALIGN_BAND = 12       # sentences either side of the diagonal and of the best path searched by the aligner
+ALIGN_WINDOW = 2000   # source sentences aligned at once; longer documents are aligned window by window
+TOKENIZER_ENCODING = "o200k_base"  # tiktoken encoding of the GPT-4.1 family
+MAX_IN_FLIGHT = 4     # concurrent segment calls per extraction
+BATCH_IN_FLIGHT = 8   # concurrent segment calls shared by all documents of a batch job
+SCHEDULER_IN_FLIGHT = 16        # segment calls running at once across all UI sessions
+TOKEN_IN_FLIGHT = 8   # of those, per API token
+ANON_IN_FLIGHT = 4    # of those, shared by every session without a token
+TOKEN_WEIGHT = 2      # fair share of a session with its own token; anonymous sessions get 1
+QUEUE_LIMIT = 200     # segments queued or running before new UI runs are turned away
+UI_CONCURRENCY = 32   # extraction requests Gradio runs at once; their segments are scheduled fairly
+UI_QUEUE_SIZE = 100   # requests waiting in Gradio's queue beyond those
+RATE_LIMIT = 2.0      # segment calls started per second
+RATE_BURST = 2        # calls allowed back-to-back before throttling
+ADAPTIVE_CONCURRENCY = True    # AIMD between 1 and MAX_IN_FLIGHT, driven by 429s and latency
+LATENCY_TARGET = 30.0 # seconds; slower calls count as overload
+CALL_TIMEOUT = 60     # seconds per attempt
+CALL_DEADLINE = 180   # seconds per call, retries included
+RUN_BUDGET = 0        # seconds per extraction before it stops and returns the terms found so far; 0 is no limit
+STREAM_RESPONSES = False        # stream completions and parse terms as they arrive
+STREAM_TERM_LIMIT = 0 # stop reading a streamed segment after this many terms; 0 reads it all
+COALESCE_CALLS = True # identical prompts in flight at once with one token share one call, across sessions
+RETRY_ATTEMPTS = 4    # attempts per call, the first included
+RETRY_BASE_DELAY = 1.0          # seconds; doubled on each retry, with full jitter
+RETRY_MAX_DELAY = 30.0
+BREAKER_THRESHOLD = 5 # consecutive failed calls that open the circuit
+BREAKER_COOLDOWN = 30 # seconds before a trial call is let through
+POOL_CONNECTIONS = 32 # connections per pooled client, shared by every thread using it
+POOL_KEEPALIVE = 16   # idle connections kept open for reuse
+POOL_KEEPALIVE_EXPIRY = 60      # seconds an idle connection stays open
+HTTP2 = False         # multiplex calls over one connection; needs the h2 package
+CLIENT_IDLE_TTL = 900 # seconds before a pooled client nobody uses is closed
+KNOWN_TERMS_IN_PROMPT = 100     # glossary matches listed as "skip" in each prompt
+PROMPT_TEMPLATES = 256          # prompt templates (mode, focus/command, filter) kept built
+DROP_UNVERIFIED_TARGETS = False # drop model terms whose target is not in the aligned target text
+MEMO_MAX_SEGMENTS = 2000        # per-session segment results kept for incremental re-runs
+CANDIDATE_PREFILTER = False     # send the model ranked n-gram candidates with short contexts instead of whole segments
+CANDIDATE_MAX_CHARS = 8         # longest candidate span, in characters
+CANDIDATE_MIN_FREQ = 2          # occurrences in the document for a span to be a candidate
+CANDIDATE_MIN_ENTROPY = 0.5     # bits; a span with less variety on either side is a fragment of a longer one
+CANDIDATE_LIMIT = 500           # top-ranked candidates per document
+CANDIDATE_CONTEXT = 12          # characters of context either side of a candidate in the prompt
+EXTRACT_ALL_CATEGORIES = False  # ask the model for every category and filter locally, so any filter reuses one run
+
+CACHE_PATH = os.path.join(tempfile.gettempdir(), "term_extractor_cache.sqlite3")  # "" disables
+CACHE_MAX_ENTRIES = 20000
+CACHE_TTL = None      # seconds; None keeps entries until evicted
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "term_extractor_exports")  # one subdirectory per UI session
+TERMBASE_PATH = os.path.join(tempfile.gettempdir(), "term_extractor_termbase.sqlite3")  # "" disables
+SENTENCE_MEMORY = False         # recall terms per sentence from earlier runs; one file shared by every session and user
+SENTENCE_MEMORY_PATH = os.path.join(tempfile.gettempdir(), "term_extractor_sentences.sqlite3")
+SENTENCE_MEMORY_MAX = 200000     # sentences kept; least recently used are evicted beyond this
+
+TRACE_PATH = ""       # JSON lines file that receives every span; "" disables
+METRICS_TEXTFILE = "" # Prometheus textfile rewritten after each run; "" disables
+METRICS_PORT = 0      # serve Prometheus metrics at :PORT/metrics from the UI; 0 disables
+PROFILE = ""          # "cprofile" or "tracemalloc" to profile every run
+PROFILE_DIR = os.path.join(tempfile.gettempdir(), "term_extractor_profiles")
@@ -0,0 +1,81 @@
+# Reading large documents from disk as a lazy stream of aligned segments.
+
+import codecs
+import io
+from itertools import islice
+
+from .alignment import iter_beads, iter_sentence_units, length_ratio, pack_beads
+from .chunking import iter_paragraphs, iter_token_chunks
+from .config import CHUNK_OVERLAP, CHUNK_TOKENS, SEGMENT_TOKENS
+
+READ_BUFFER = 1 << 20
+# Tried in order on a sample; big5 first since gb18030 accepts almost any bytes
+FALLBACK_ENCODINGS = ("utf-8", "big5", "gb18030")
+
+def detect_encoding(path, sample_size=65536):
+    with open(path, "rb") as f:
+        head = f.read(sample_size)
+    
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            head.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # The sample may end in the middle of a multi-byte character
+            if len(head) == sample_size and e.start >= len(head) - 4:
+                return encoding
+    return "utf-8"
+
+def open_document(path):
+    return io.open(path, encoding=detect_encoding(path), errors="replace", buffering=READ_BUFFER)
+
+def iter_document_chunks(path, budget=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    with open_document(path) as f:
+        yield from iter_token_chunks(iter_paragraphs(f), budget, overlap)
+
+def iter_document_sentences(path, budget=CHUNK_TOKENS):
+    with open_document(path) as f:
+        yield from iter_sentence_units(iter_paragraphs(f), budget)
+
+def scan_document(path, budget=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    """One streaming pass: returns (chunk count, summed chunk length)."""
+    count = total = 0
+    for chunk in iter_document_chunks(path, budget, overlap):
+        count += 1
+        total += len(chunk)
+    return count, total
+
+def iter_document_pairs(source_path, target_path=None, budget=CHUNK_TOKENS, overlap=CHUNK_OVERLAP,
+                        pair_budget=SEGMENT_TOKENS):
+    """
+    Returns (segment count, lazy iterator of (source, target) segments) for a
+    pair of files, so memory does not grow with document size. A source
+    alone is cut into chunks as chunking.token_chunk cuts text. With a
+    target, the sentences of both files are aligned as
+    alignment.align_segments aligns pasted text: one streaming pass plans
+    the segments (how many sentences of each file go into each), and the
+    iterator reads the files again to cut them.
+    """
+    if target_path:
+        source_chars = sum(len(s) for s in iter_document_sentences(source_path, budget))
+        target_chars = sum(len(t) for t in iter_document_sentences(target_path, pair_budget - budget))
+        if target_chars:
+            beads = iter_beads(iter_document_sentences(source_path, budget),
+                               iter_document_sentences(target_path, pair_budget - budget),
+                               length_ratio(source_chars, target_chars))
+            plan = [(len(src), len(tgt)) for src, tgt in pack_beads(beads, budget, pair_budget)]
+            return len(plan), _cut_documents(source_path, target_path, plan, budget, pair_budget)
+    
+    source_count, _ = scan_document(source_path, budget, overlap)
+    return source_count, ((s, "") for s in iter_document_chunks(source_path, budget, overlap))
+
+def _cut_documents(source_path, target_path, plan, budget, pair_budget):
+    sources = iter_document_sentences(source_path, budget)
+    targets = iter_document_sentences(target_path, pair_budget - budget)
+    for source_count, target_count in plan:
+        yield "\n".join(islice(sources, source_count)), "\n".join(islice(targets, target_count))
@@ -0,0 +1,173 @@
+# Writing term lists in the supported download formats.
+#
+# Every writer takes any iterable of terms and writes one term at a time,
+# so exports never hold a second copy of the glossary in memory.
+
+import io
+import json
+import os
+import re
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+from .config import EXPORT_DIR
+
+EXPORT_FORMATS = ("csv", "json", "tsv", "tbx", "xlsx")
+BINARY_FORMATS = ("xlsx",)
+CSV_HEADER = ("Source", "Target", "Category")
+XLSX_MAX_ROWS = 1048576
+
+# Characters XML 1.0 does not allow, even escaped
+XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+TSV_UNSAFE = re.compile(r'[\t\r\n]+')
+
+def _xml_text(text):
+    return escape(XML_INVALID.sub('', text))
+
+def format_csv(terms):
+    f = io.StringIO()
+    write_terms(terms, "csv", f)
+    return f.getvalue()
+
+def _csv_field(value):
+    return '"' + value.replace('"', '""') + '"'
+
+def _write_csv(terms, f):
+    f.write(",".join(CSV_HEADER))
+    for t in terms:
+        f.write(f'\n{_csv_field(t["source"])},{_csv_field(t["target"])},{_csv_field(t.get("category", "general"))}')
+
+def _write_json(terms, f):
+    # Same layout as json.dump({"terms": terms}, indent=2), one term at a time
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    f.write('{\n  "terms": [')
+    first = True
+    for t in terms:
+        if t and not any(isinstance(v, (dict, list)) for v in t.values()):
+            # Flat terms: encode each scalar with the C encoder, much faster than indent=2
+            item = "{\n" + ",\n".join(
+                f"      {dumps(k)}: {dumps(v)}" for k, v in t.items()
+            ) + "\n    }"
+        else:
+            item = json.dumps(t, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+        f.write(("\n    " if first else ",\n    ") + item)
+        first = False
+    f.write(']\n}' if first else '\n  ]\n}')
+
+def _write_tsv(terms, f):
+    for t in terms:
+        f.write(f"{TSV_UNSAFE.sub(' ', t['source'])}\t{TSV_UNSAFE.sub(' ', t['target'])}\n")
+
+def _write_tbx(terms, f):
+    f.write('<?xml version="1.0"?>\n<martif type="TBX"><text><body>\n')
+    for i, t in enumerate(terms):
+        f.write(f'<termEntry id="t{i+1}"><langSet xml:lang="zh"><tig><term>{_xml_text(t["source"])}</term></tig></langSet>'
+                f'<langSet xml:lang="en"><tig><term>{_xml_text(t["target"])}</term></tig></langSet></termEntry>\n')
+    f.write('</body></text></martif>')
+
+def write_terms(terms, fmt, f):
+    """Write terms to an open text stream in the given format."""
+    if fmt == "csv":
+        _write_csv(terms, f)
+    elif fmt == "json":
+        _write_json(terms, f)
+    elif fmt == "tsv":
+        _write_tsv(terms, f)
+    elif fmt == "tbx":
+        _write_tbx(terms, f)
+    elif fmt in BINARY_FORMATS:
+        raise ValueError(f"{fmt} is a binary format; use write_xlsx or export_terms")
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Terms" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+def _xlsx_row(n, values):
+    cells = "".join(
+        f'<c r="{col}{n}" t="inlineStr"><is><t xml:space="preserve">{_xml_text(v)}</t></is></c>'
+        for col, v in zip("ABC", values)
+    )
+    return f'<row r="{n}">{cells}</row>'
+
+def write_xlsx(terms, f):
+    """
+    Write terms as a single-sheet XLSX workbook to a binary stream. The sheet
+    is streamed into the zip with inline strings, so no shared-string table
+    or workbook model is built in memory.
+    """
+    if hasattr(terms, "__len__") and len(terms) >= XLSX_MAX_ROWS:
+        raise ValueError(f"XLSX holds at most {XLSX_MAX_ROWS - 1} terms; use CSV for larger glossaries")
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in XLSX_PARTS.items():
+            zf.writestr(name, content)
+        with zf.open("xl/worksheets/sheet1.xml", "w") as raw:
+            sheet = io.TextIOWrapper(raw, encoding="utf-8", write_through=False)
+            sheet.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xlsx_row(1, CSV_HEADER))
+            for n, t in enumerate(terms, 2):
+                if n > XLSX_MAX_ROWS:
+                    raise ValueError(f"XLSX holds at most {XLSX_MAX_ROWS - 1} terms; use CSV for larger glossaries")
+                sheet.write(_xlsx_row(n, (t["source"], t["target"], t.get("category", "general"))))
+            sheet.write('</sheetData></worksheet>')
+            sheet.flush()
+            sheet.detach()
+
+def export_terms(terms, fmt, path):
+    if fmt in BINARY_FORMATS:
+        with open(path, "wb") as f:
+            write_xlsx(terms, f)
+        return path
+    # BOM so Excel opens the CSV as UTF-8
+    with open(path, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8",
+              buffering=1024 * 1024) as f:
+        write_terms(terms, fmt, f)
+    return path
+
+def session_export_path(session_id, fmt):
+    """
+    Download path private to one UI session, so concurrent users never
+    overwrite each other's files. Without a session id a fresh directory
+    is used.
+    """
+    session_id = re.sub(r'[^A-Za-z0-9_-]', '', session_id or "")
+    if session_id:
+        directory = os.path.join(EXPORT_DIR, session_id)
+        os.makedirs(directory, exist_ok=True)
+    else:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        directory = tempfile.mkdtemp(dir=EXPORT_DIR)
+    return os.path.join(directory, f"terms.{fmt}")
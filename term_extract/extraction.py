@@ -0,0 +1,289 @@
+# Per-segment extraction calls and concurrent segment execution.
+
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from .cancel import RunCancelled
+from .config import COALESCE_CALLS, MAX_IN_FLIGHT, MODEL, STREAM_RESPONSES, STREAM_TERM_LIMIT
+from . import llm
+from .llm import RateLimiter, ResponseCache, chat_completion
+from .parsing import TermStreamParser, complete_answer, parse_terms
+from .prompts import candidate_template, custom_template, standard_template
+from .scheduler import SegmentCancelled
+
+def _parse(content, recorder):
+    if recorder is None:
+        return parse_terms(content)
+    with recorder.span("parse") as attrs:
+        terms = parse_terms(content)
+        attrs["terms"] = len(terms)
+    return terms
+
+def _complete(client, system_prompt, prompt, stats=None, recorder=None, concurrency=None, cancel=None):
+    """
+    Call the model and parse the terms of its answer. With COALESCE_CALLS,
+    a prompt identical to one already in flight to the same endpoint with
+    the same token (from any session or batch job) waits for that call and
+    gets a copy of its terms; the wait is recorded as a coalesced
+    "llm.call" span. If that call's own run is cancelled, the waiting
+    callers make the call themselves; a caller whose run is cancelled
+    stops waiting.
+    """
+    if not COALESCE_CALLS:
+        return _call_and_parse(client, system_prompt, prompt, stats, recorder, concurrency, cancel)
+    key = ResponseCache.make_key(MODEL, [system_prompt, prompt], stream_term_limit=STREAM_TERM_LIMIT,
+                                 client=llm.client_key(client))
+    start = time.perf_counter()
+    while True:
+        try:
+            (terms, content), shared = llm.in_flight_calls.do(
+                key, lambda: _call_and_parse(client, system_prompt, prompt, stats, recorder, concurrency, cancel),
+                cancel)
+            break
+        except RunCancelled:
+            if cancel is not None and cancel.cancelled:
+                raise
+            # Another run's call, cancelled under us
+    if not shared:
+        return terms, content
+    if recorder is not None:
+        recorder.add("llm.call", time.perf_counter() - start, coalesced=True)
+    return [dict(t) for t in terms], content
+
+def _call_and_parse(client, system_prompt, prompt, stats=None, recorder=None, concurrency=None, cancel=None):
+    """
+    The model call behind _complete. With STREAM_RESPONSES
+    the answer is parsed while it streams in: the time to its first term is
+    recorded as a "first_term" span, and reading stops once
+    STREAM_TERM_LIMIT terms have arrived.
+    """
+    if not STREAM_RESPONSES:
+        content = chat_completion(client, system_prompt, prompt, stats, recorder=recorder, concurrency=concurrency,
+                                  cancel=cancel, cacheable=complete_answer)
+        return _parse(content, recorder), content
+    
+    start = time.perf_counter()
+    state = {"attempt": 0, "parser": None}
+    
+    def on_delta(text, attempt):
+        if attempt != state["attempt"]:
+            # A retried call streams its answer again from the start
+            state["attempt"], state["parser"] = attempt, TermStreamParser()
+        parser = state["parser"]
+        had_terms = bool(parser.terms)
+        parser.feed(text)
+        if recorder is not None and parser.terms and not had_terms:
+            recorder.add("first_term", time.perf_counter() - start, attempt=attempt)
+        return bool(STREAM_TERM_LIMIT) and len(parser.terms) >= STREAM_TERM_LIMIT
+    
+    content = chat_completion(client, system_prompt, prompt, stats, recorder=recorder, concurrency=concurrency,
+                              on_delta=on_delta, cancel=cancel, cacheable=complete_answer)
+    if state["parser"] is None:
+        # Answered from the response cache (or streamed nothing)
+        return _parse(content, recorder), content
+    terms = state["parser"].close()
+    return (terms[:STREAM_TERM_LIMIT] if STREAM_TERM_LIMIT else terms), content
+
+def is_custom_command(focus_text):
+    """
+    Detect if the focus field contains a custom command/prompt.
+    Returns True if user wants to use custom extraction logic.
+    """
+    if not focus_text or not focus_text.strip():
+        return False
+    
+    focus_lower = focus_text.lower().strip()
+    
+    # Command indicators - words that suggest a custom instruction
+    command_indicators = [
+        # English command words
+        'extract', 'find', 'get', 'list', 'identify', 'locate', 'search',
+        'only', 'just', 'specifically', 'exclusively',
+        'please', 'i want', 'i need', 'give me', 'show me',
+        'focus on', 'look for', 'pull out', 'pick out',
+        'include', 'exclude', 'ignore', 'skip',
+        'all', 'every', 'any', 'must', 'should',
+        # Chinese command words
+        '提取', '找', '找出', '列出', '識別', '搜尋', '搜索',
+        '只要', '僅', '專門', '特別',
+        '請', '我要', '我需要', '給我', '顯示',
+        '專注', '尋找', '挑出',
+        '包含', '排除', '忽略', '跳過',
+        '所有', '每個', '任何', '必須', '應該',
+        # Pattern indicators
+        'term', 'terms', 'word', 'words', 'phrase', 'phrases',
+        'name', 'names', 'entity', 'entities',
+        '術語', '詞', '詞彙', '名稱', '實體',
+    ]
+    
+    # Check for command indicators
+    for indicator in command_indicators:
+        if indicator in focus_lower:
+            return True
+    
+    # Check for sentence-like structure (has verb-like patterns)
+    # If it's longer than typical keywords and has spaces, likely a command
+    if len(focus_text.strip()) > 20 and ' ' in focus_text:
+        return True
+    
+    # Check for punctuation that suggests a sentence/command
+    if any(p in focus_text for p in ['。', '，', '.', ',', '!', '！', '?', '？']):
+        return True
+    
+    return False
+
+def _render(template, source, target, known_terms, recorder):
+    """The user prompt; with a Recorder, a "prompt" span records its tokens, counted before sending."""
+    if recorder is None:
+        return template.render(source, target, known_terms)[0]
+    with recorder.span("prompt", prefix_tokens=template.prefix_tokens) as attrs:
+        prompt, attrs["prompt_tokens"] = template.render(source, target, known_terms)
+    return prompt
+
+def extract_chunk_custom(source, target, custom_prompt, client, stats=None, recorder=None, concurrency=None,
+                         cancel=None):
+    """
+    Extract terms using custom user prompt - follows user instructions directly!
+    Raises llm.LLMCallError when the model call fails for good.
+    """
+    template = custom_template(custom_prompt, bool(target))
+    prompt = _render(template, source, target, None, recorder)
+    return _complete(client, template.system, prompt, stats, recorder=recorder, concurrency=concurrency,
+                     cancel=cancel)
+
+def extract_chunk(source, target, focus, term_filter, client, stats=None, known_terms=None, recorder=None,
+                  concurrency=None, cancel=None):
+    """
+    Standard extraction with predefined logic.
+    Raises llm.LLMCallError when the model call fails for good.
+    """
+    template = standard_template(focus, term_filter, bool(target))
+    prompt = _render(template, source, target, known_terms, recorder)
+    return _complete(client, template.system, prompt, stats, recorder=recorder, concurrency=concurrency,
+                     cancel=cancel)
+
+def extract_candidates(candidates, target, focus, client, stats=None, known_terms=None, recorder=None,
+                       concurrency=None, cancel=None):
+    """
+    Prefilter mode: the segment is a list of statistical candidates with
+    short contexts (candidates.format_candidates) rather than its text, and
+    the model only keeps and translates the real terms among them.
+    Raises llm.LLMCallError when the model call fails for good.
+    """
+    template = candidate_template(focus, bool(target))
+    prompt = _render(template, candidates, target, known_terms, recorder)
+    return _complete(client, template.system, prompt, stats, recorder=recorder, concurrency=concurrency,
+                     cancel=cancel)
+
+def iter_segments(aligned_pairs, extract_fn, max_in_flight=MAX_IN_FLIGHT, limiter=None, recorder=None,
+                  cached=None, lane=None, cancel=None):
+    """
+    Run extract_fn(src, tgt) over all segments with at most max_in_flight
+    calls at once, yielding (index, (src, tgt), (terms, raw), error) as each
+    segment finishes. error is None, or the exception that failed the
+    segment, whose result is then ([], str(error)).
+    aligned_pairs may be a lazy iterator; only a small window of segments is
+    pulled from it ahead of the workers. Closing the generator early cancels
+    segments that have not started. With a Recorder, each segment's time
+    waiting for a worker and for the rate limiter is recorded.
+    cached(src, tgt) may return a stored (terms, raw) for a segment; such
+    segments are yielded without a worker, rate limiting or a model call.
+    lane is a scheduler.Lane: each call then also waits for a fair share of
+    the slots shared with other sessions.
+    cancel is a cancel.CancelToken, which extract_fn should also pass to
+    its calls. Once it is cancelled (or its budget ends) the generator stops
+    at once: no more segments are started, queued ones are dropped, and
+    segments still in flight are left to finish in the background unseen.
+    """
+    if limiter is None:
+        limiter = RateLimiter()
+    
+    def task(i, src, tgt, submitted):
+        if cancel is not None:
+            cancel.check()
+        slot = lane.slot() if lane is not None else nullcontext()
+        if recorder is None:
+            limiter.acquire(cancel)
+            with slot:
+                return extract_fn(src, tgt)
+        started = time.perf_counter()
+        recorder.add("queue_wait", started - submitted, segment=i)
+        limiter.acquire(cancel)
+        limited = time.perf_counter()
+        recorder.add("rate_limit_wait", limited - started, segment=i)
+        with slot:
+            if lane is not None:
+                recorder.add("schedule_wait", time.perf_counter() - limited, segment=i)
+            with recorder.span("segment", segment=i, source_chars=len(src), target_chars=len(tgt)):
+                return extract_fn(src, tgt)
+    
+    pairs = enumerate(aligned_pairs)
+    pool = ThreadPoolExecutor(max_workers=max(1, max_in_flight))
+    futures = {}
+    ready = deque()  # cached segments, in the window like submitted ones
+    stopped = Future()  # done once cancel is cancelled, so wait() wakes up for it
+    if cancel is not None:
+        cancel.on_cancel(lambda: stopped.set_result(None))
+        if lane is not None:
+            # Releases segments waiting for a scheduler slot
+            cancel.on_cancel(lane.close)
+    
+    def submit_next():
+        if cancel is not None and cancel.cancelled:
+            return False
+        for i, (src, tgt) in pairs:
+            result = cached(src, tgt) if cached is not None else None
+            if result is not None:
+                ready.append((i, (src, tgt), result, None))
+            else:
+                futures[pool.submit(task, i, src, tgt, time.perf_counter())] = (i, src, tgt)
+            return True
+        return False
+    
+    try:
+        for _ in range(2 * max(1, max_in_flight)):
+            if not submit_next():
+                break
+        while futures or ready:
+            if cancel is not None and cancel.cancelled:
+                return
+            if ready:
+                item = ready.popleft()
+                submit_next()
+                yield item
+                continue
+            timeout = cancel.remaining() if cancel is not None else None
+            finished, _ = wait([*futures, stopped], timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future is stopped:
+                    continue
+                i, src, tgt = futures.pop(future)
+                error = None
+                try:
+                    result = future.result()
+                except (RunCancelled, SegmentCancelled):
+                    # Not a failure: the run is over, and the loop ends above
+                    continue
+                except Exception as e:
+                    error = e
+                    result = ([], str(e))
+                submit_next()
+                yield i, (src, tgt), result, error
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+def run_segments(aligned_pairs, extract_fn, max_in_flight=MAX_IN_FLIGHT, limiter=None, on_done=None):
+    """
+    Run all segments concurrently and return their results in segment order.
+    on_done(done, index) is called from the caller's thread as each one finishes.
+    """
+    results = [None] * len(aligned_pairs)
+    for done, (i, _, result, _) in enumerate(iter_segments(aligned_pairs, extract_fn, max_in_flight, limiter), 1):
+        results[i] = result
+        if on_done:
+            on_done(done, i)
+    return results
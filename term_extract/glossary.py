@@ -0,0 +1,177 @@
+# Known-term glossaries: loading termbases and matching them with an Aho-Corasick automaton.
+
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+from collections import deque
+from functools import lru_cache
+
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+MIN_TERM_LENGTH = 2
+
+class Automaton:
+    """
+    Aho-Corasick automaton over a list of keys. Matching is linear in the
+    length of the text plus the number of matches, however many keys there are.
+    Keys and text are compared lowercased; empty keys never match.
+    """
+    
+    def __init__(self, keys):
+        self.keys = [k.lower() for k in keys]
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        
+        for index, key in enumerate(self.keys):
+            if not key:
+                continue
+            state = 0
+            for ch in key:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = nxt
+            self.out[state] += (index,)
+        
+        # Breadth-first, so every failure link points at an already finished state
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                if state:
+                    f = self.fail[state]
+                    while f and ch not in self.goto[f]:
+                        f = self.fail[f]
+                    self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] += self.out[self.fail[nxt]]
+    
+    def iter_matches(self, text):
+        """Yield (start, end, key index) for every occurrence of every key."""
+        goto, fail, out, keys = self.goto, self.fail, self.out, self.keys
+        state = 0
+        for i, ch in enumerate(text.lower()):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in out[state]:
+                yield i + 1 - len(keys[index]), i + 1, index
+    
+    def found(self, text):
+        """Indices of the keys that occur in text."""
+        return {index for _, _, index in self.iter_matches(text)}
+
+class Glossary:
+    """A termbase indexed by source term for scanning segments before extraction."""
+    
+    def __init__(self, terms):
+        by_source = {}
+        for t in terms:
+            src = t['source'].strip()
+            if len(src) >= MIN_TERM_LENGTH and t.get('target', '').strip():
+                by_source.setdefault(src.lower(), {
+                    'source': src,
+                    'target': t['target'].strip(),
+                    'category': t.get('category') or 'general',
+                })
+        self.terms = list(by_source.values())
+        self.automaton = Automaton([t['source'] for t in self.terms])
+        # Identifies the glossary's content, e.g. in keys of results that depend on it
+        self.fingerprint = hashlib.sha256(
+            "\n".join(f"{t['source']}\t{t['target']}\t{t['category']}" for t in self.terms).encode("utf-8")
+        ).hexdigest()
+    
+    def __len__(self):
+        return len(self.terms)
+    
+    def match(self, text):
+        """Known terms occurring in text, in order of first occurrence."""
+        seen = {}
+        for _, _, index in self.automaton.iter_matches(text):
+            seen.setdefault(index, self.terms[index])
+        return list(seen.values())
+
+def verify_targets(terms, target_text):
+    """
+    Split terms into those whose target occurs in target_text and those
+    whose target does not, scanning target_text once.
+    """
+    if not target_text or not terms:
+        return list(terms), []
+    found = Automaton([t['target'] for t in terms]).found(target_text)
+    verified = [t for i, t in enumerate(terms) if i in found]
+    unverified = [t for i, t in enumerate(terms) if i not in found]
+    return verified, unverified
+
+def _read_delimited(path, delimiter):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f, delimiter=delimiter))
+    if rows and rows[0] and rows[0][0].strip().lower() == "source":
+        rows = rows[1:]
+    return [{'source': r[0], 'target': r[1], 'category': r[2] if len(r) > 2 else 'general'}
+            for r in rows if len(r) >= 2]
+
+def _read_tbx(path):
+    terms = []
+    for _, elem in ET.iterparse(path):
+        if elem.tag.rsplit('}', 1)[-1] != "termEntry":
+            continue
+        langs = {}
+        for lang_set in elem.iter():
+            if lang_set.tag.rsplit('}', 1)[-1] != "langSet":
+                continue
+            term = next((e.text for e in lang_set.iter() if e.tag.rsplit('}', 1)[-1] == "term" and e.text), None)
+            if term:
+                langs.setdefault(lang_set.get(XML_LANG, lang_set.get("lang", "")).lower()[:2], term)
+        if langs.get("zh") and langs.get("en"):
+            terms.append({'source': langs["zh"], 'target': langs["en"], 'category': 'general'})
+        elem.clear()
+    return terms
+
+def load_glossary(path):
+    """
+    Read a termbase exported as CSV, TSV, JSON or TBX, or a TermBase
+    database, into term dicts.
+    Malformed files raise ValueError.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        return _read_glossary(path, ext)
+    except (ET.ParseError, csv.Error, sqlite3.DatabaseError) as e:
+        raise ValueError(f"{os.path.basename(path)}: {e}") from e
+
+def _read_glossary(path, ext):
+    if ext == ".tbx" or ext == ".xml":
+        return _read_tbx(path)
+    if ext in (".sqlite3", ".sqlite", ".db"):
+        from .termbase import TermBase
+        base = TermBase(path)
+        try:
+            return list(base.iter_terms())
+        finally:
+            base.close()
+    if ext == ".json":
+        with open(path, encoding="utf-8-sig") as f:
+            data = json.load(f)
+        items = data.get("terms", []) if isinstance(data, dict) else data
+        return [t for t in items if isinstance(t, dict) and t.get('source') and t.get('target')]
+    if ext in (".tsv", ".txt"):
+        return _read_delimited(path, "\t")
+    return _read_delimited(path, ",")
+
+@lru_cache(maxsize=8)
+def _cached_glossary(path, mtime):
+    return Glossary(load_glossary(path))
+
+def get_glossary(path):
+    """Glossary for a termbase file, reused until the file changes."""
+    if not path:
+        return None
+    return _cached_glossary(path, os.path.getmtime(path))
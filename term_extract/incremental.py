@@ -0,0 +1,75 @@
+# Session memory of per-segment results, so re-runs only extract edited segments.
+
+import hashlib
+import json
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+from .config import MEMO_MAX_SEGMENTS
+
+RAW_PREVIEW_CHARS = 600
+
+class SegmentMemo:
+    """
+    Results of one session's segments, keyed on a hash of the (source,
+    target) pair and the run context (mode, focus, filter, glossary, model).
+    A re-run looks every segment up first and only calls the model for new
+    or changed ones; merge and dedupe are then redone over all of them.
+    It also keeps the last run's units (sentences or paragraphs) and the
+    indices that started its segments, so resync can carry those boundaries
+    over to an edited text and unchanged segments come out identical.
+    Least recently used results are dropped beyond max_segments.
+    Not thread-safe: the pipeline only uses it from the caller's thread.
+    """
+    
+    def __init__(self, max_segments=MEMO_MAX_SEGMENTS):
+        self.max_segments = max_segments
+        self.results = OrderedDict()    # key -> (terms, raw)
+        self.units = []
+        self.starts = []
+    
+    def __len__(self):
+        return len(self.results)
+    
+    @staticmethod
+    def make_key(context, source, target):
+        payload = json.dumps([context, source, target], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, context, source, target):
+        """A copy of the stored (terms, raw) for this segment, or None."""
+        key = self.make_key(context, source, target)
+        result = self.results.get(key)
+        if result is None:
+            return None
+        self.results.move_to_end(key)
+        terms, raw = result
+        return [dict(t) for t in terms], raw
+    
+    def put(self, context, source, target, terms, raw):
+        key = self.make_key(context, source, target)
+        # Only the start of the raw response is shown again (debug log preview)
+        self.results[key] = ([dict(t) for t in terms], raw[:RAW_PREVIEW_CHARS])
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_segments:
+            self.results.popitem(last=False)
+    
+    def resync(self, units):
+        """
+        Indices in units where the previous run's segments started, found by
+        diffing units against the previous run's units. Remembers units for
+        the next run; the pipeline stores the new starts after chunking.
+        """
+        old, old_starts = self.units, set(self.starts)
+        self.units = list(units)
+        breaks = set()
+        if old and old_starts:
+            matcher = SequenceMatcher(None, old, self.units, autojunk=False)
+            for a, b, size in matcher.get_matching_blocks():
+                breaks.update(b + k for k in range(size) if a + k in old_starts)
+        return breaks
+    
+    def clear(self):
+        self.results.clear()
+        self.units = []
+        self.starts = []
@@ -0,0 +1,669 @@
+# Model access: client construction, rate limiting, retries and the response cache.
+
+import hashlib
+import importlib.util
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+from .cancel import RunCancelled
+from .config import (
+    API_BASE_URL, BREAKER_COOLDOWN, BREAKER_THRESHOLD, CACHE_MAX_ENTRIES, CACHE_PATH, CACHE_TTL, CALL_DEADLINE,
+    CALL_TIMEOUT, CLIENT_IDLE_TTL, HTTP2, LATENCY_TARGET, MAX_IN_FLIGHT, MODEL, POOL_CONNECTIONS, POOL_KEEPALIVE,
+    POOL_KEEPALIVE_EXPIRY, RATE_BURST, RATE_LIMIT, RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+)
+
+# Statuses worth another attempt; other 4xx errors fail the same way every time
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+BREAKER_POLL = 0.25   # seconds between checks while another call is the breaker's trial
+FOLLOWER_POLL = 0.25  # seconds between cancel checks while waiting for another caller's identical call
+
+def new_client(token="", base_url=None):
+    """
+    A fresh OpenAI client with its own connection pool; base_url overrides
+    API_BASE_URL (e.g. a local mock server). The client's own retries are
+    off: chat_completion retries with the deadline, backoff and circuit
+    breaker below. Prefer get_client, which shares clients.
+    """
+    import httpx
+    import openai
+    
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=POOL_CONNECTIONS,
+            max_keepalive_connections=POOL_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        ),
+        http2=HTTP2 and importlib.util.find_spec("h2") is not None,
+        timeout=CALL_TIMEOUT,
+        follow_redirects=True,
+    )
+    return openai.OpenAI(
+        base_url=base_url or API_BASE_URL,
+        api_key=token if token.strip() else "unused",
+        max_retries=0,
+        timeout=CALL_TIMEOUT,
+        http_client=http_client,
+    )
+
+class ClientPool:
+    """
+    Process-wide OpenAI clients, one per (token, endpoint). Each client keeps
+    its keep-alive connections, so every Gradio worker thread calling with
+    the same token reuses warm connections instead of opening new ones.
+    lease() keeps a client open while a run uses it; clients nobody has
+    leased for idle_ttl seconds are closed on the next lookup. A client
+    handed out by get() has no lease to end, so it is never evicted and
+    stays open until close(). Tokens are only kept inside the clients, not
+    as registry keys.
+    """
+    
+    def __init__(self, idle_ttl=CLIENT_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self.clients = {}   # key -> {'client', 'leases', 'pinned', 'last_used'}
+        self.created = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def _key(token, base_url):
+        return hashlib.sha256(f"{base_url or API_BASE_URL}\0{token.strip()}".encode("utf-8")).hexdigest()
+    
+    def _entry(self, token, base_url, lease=False, pin=False):
+        now = time.monotonic()
+        key = self._key(token, base_url)
+        with self.lock:
+            self._evict_idle(now, keep=key)
+            entry = self.clients.get(key)
+            if entry is None:
+                entry = {'client': new_client(token, base_url), 'leases': 0, 'pinned': False, 'last_used': now}
+                self.clients[key] = entry
+                self.created += 1
+            entry['last_used'] = now
+            if lease:
+                entry['leases'] += 1
+            if pin:
+                entry['pinned'] = True
+            return entry
+    
+    def _evict_idle(self, now, keep=None):
+        if not self.idle_ttl:
+            return
+        for key, entry in list(self.clients.items()):
+            if key == keep or entry['leases'] or entry['pinned']:
+                continue
+            if now - entry['last_used'] > self.idle_ttl:
+                del self.clients[key]
+                entry['client'].close()
+                self.evicted += 1
+    
+    def get(self, token="", base_url=None):
+        """The shared client for token, never evicted; prefer lease() for a client used for one run."""
+        return self._entry(token, base_url, pin=True)['client']
+    
+    @contextmanager
+    def lease(self, token="", base_url=None):
+        """The shared client for token, kept open (never evicted) until the block exits."""
+        entry = self._entry(token, base_url, lease=True)
+        try:
+            yield entry['client']
+        finally:
+            with self.lock:
+                entry['leases'] -= 1
+                entry['last_used'] = time.monotonic()
+    
+    def size(self):
+        with self.lock:
+            return len(self.clients)
+    
+    def close(self):
+        with self.lock:
+            for entry in self.clients.values():
+                entry['client'].close()
+            self.clients.clear()
+
+client_pool = ClientPool()
+
+def get_client(token="", base_url=None):
+    """Shared pooled client for token and endpoint (see ClientPool)."""
+    return client_pool.get(token, base_url)
+
+class RateLimiter:
+    """Token bucket shared by the worker threads of one extraction."""
+    
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, cancel=None):
+        """Wait for a call slot; with a cancel.CancelToken the wait ends early with RunCancelled."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if cancel is not None:
+                cancel.sleep(wait)
+            else:
+                time.sleep(wait)
+
+class LLMCallError(RuntimeError):
+    """A model call that failed for good: not retryable, out of attempts or past its deadline."""
+    
+    def __init__(self, message, attempts=0):
+        super().__init__(message)
+        self.attempts = attempts
+
+class CircuitOpenError(LLMCallError):
+    """Raised without calling the endpoint while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Fails calls fast after threshold consecutive failures, so a provider
+    outage costs one error per segment instead of a full retry schedule.
+    After cooldown seconds one trial call is let through; its success
+    closes the circuit again, its failure restarts the cooldown. A trial
+    call that ends without either (cancelled, say) must abandon() the
+    trial, or no call would be let through again.
+    """
+    
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None
+        self.trial = None     # thread id of the trial call in flight
+        self.lock = threading.Lock()
+    
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened >= self.cooldown else "open"
+    
+    def allow(self):
+        """Whether a call may go ahead; once the cooldown is over, the first caller becomes the trial call."""
+        with self.lock:
+            if self.opened is None:
+                return True
+            if self.trial is not None or time.monotonic() - self.opened < self.cooldown:
+                return False
+            self.trial = threading.get_ident()
+            return True
+    
+    def retry_in(self):
+        """Seconds until allow() may let a call through; a short poll while a trial call is in flight."""
+        with self.lock:
+            if self.opened is None:
+                return 0.0
+            left = self.cooldown - (time.monotonic() - self.opened)
+            return max(left, BREAKER_POLL if self.trial is not None else 0.0)
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = None
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            trial = self.trial == threading.get_ident()
+            if trial or (self.threshold and self.failures >= self.threshold):
+                self.opened = time.monotonic()
+            if trial:
+                self.trial = None
+    
+    def abandon(self):
+        """Give back the trial this thread's call holds, if any, when the call ends without an outcome."""
+        with self.lock:
+            if self.trial == threading.get_ident():
+                self.trial = None
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on model calls in flight, shared by the workers of one
+    extraction. Each call under latency_target raises the limit by
+    1/limit (about one slot per round of calls); a 429 or a slower call
+    halves it, at most once per latency_target so a burst of 429s from
+    the same round counts once. The limit stays between min_limit and
+    max_limit.
+    """
+    
+    def __init__(self, max_limit=MAX_IN_FLIGHT, min_limit=1, latency_target=LATENCY_TARGET):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.latency_target = latency_target
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.decreased = float("-inf")
+        self.cond = threading.Condition()
+    
+    def acquire(self, timeout=None):
+        """Take a call slot; False if none frees up within timeout seconds."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+    
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+    
+    def on_success(self, latency):
+        if self.latency_target and latency > self.latency_target:
+            self.on_overload()
+            return
+        with self.cond:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+    
+    def on_overload(self):
+        with self.cond:
+            now = time.monotonic()
+            if now - self.decreased < (self.latency_target or 1.0):
+                return
+            self.decreased = now
+            self.limit = max(self.min_limit, self.limit / 2)
+
+class ResponseCache:
+    """
+    On-disk LLM response cache keyed on the full request.
+    Least recently used entries are evicted beyond max_entries.
+    """
+    
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.conn = None
+        self.lock = threading.Lock()
+    
+    def _connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        return self.conn
+    
+    @staticmethod
+    def make_key(model, messages, **params):
+        payload = json.dumps([model, messages, params], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key, stats=None):
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            row = conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            outcome = "misses" if row is None else "hits"
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            if stats is not None:
+                stats[outcome] += 1
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+    
+    def put(self, key, content):
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+    
+    def size(self):
+        with self.lock:
+            return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+response_cache = ResponseCache() if CACHE_PATH else None
+
+class SingleFlight:
+    """
+    Coalesces identical calls that are in flight at the same time, across
+    threads and sessions: the first caller for a key runs the call, later
+    ones wait for its outcome (result or exception) instead of calling
+    again. Nothing is kept once the call finishes; the response cache
+    answers repeats after that. A waiting caller with a cancel token stops
+    waiting when its own run is cancelled; the call goes on for the others.
+    """
+    
+    def __init__(self):
+        self.calls = {}   # key -> Future of the call in flight
+        self.lock = threading.Lock()
+        self.led = 0
+        self.shared = 0
+    
+    def do(self, key, fn, cancel=None):
+        """(fn()'s result, shared); shared is True when another caller's call produced it."""
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+                self.led += 1
+            else:
+                self.shared += 1
+        if not leader:
+            if cancel is None:
+                return future.result(), True
+            while True:
+                try:
+                    return future.result(timeout=FOLLOWER_POLL), True
+                except FutureTimeout:
+                    cancel.check()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self.lock:
+                del self.calls[key]
+        return result, False
+    
+    def in_flight(self):
+        with self.lock:
+            return len(self.calls)
+
+in_flight_calls = SingleFlight()
+
+def _usage(resp):
+    """Token counts from resp.usage, when the endpoint reports them."""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+def _status(e):
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    return status
+
+def is_retryable(e):
+    """Transient failures: throttling, server errors, timeouts, dropped connections and garbled bodies."""
+    status = _status(e)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # openai's APITimeoutError and APIConnectionError carry no status; a stream
+    # that breaks off midway raises httpx's read errors directly
+    return (isinstance(e, (TimeoutError, ConnectionError, json.JSONDecodeError))
+            or type(e).__name__ in ("APITimeoutError", "APIConnectionError", "ReadTimeout", "ReadError",
+                                    "RemoteProtocolError"))
+
+def retry_after(e):
+    """Seconds the server asked us to wait (Retry-After or retry-after-ms), or None."""
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Exponential backoff with full jitter before retry number attempt (1 for the first retry)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+_breakers = {}   # ClientPool key of endpoint and token -> CircuitBreaker
+_breakers_lock = threading.Lock()
+
+def client_key(client):
+    """A hash of client's endpoint and token, for state kept per endpoint and token."""
+    return ClientPool._key(str(getattr(client, "api_key", "") or ""), str(getattr(client, "base_url", "") or ""))
+
+def breaker_for(client):
+    """
+    The circuit breaker of client's endpoint and token, so an endpoint that
+    is down or a token that is refused does not stop calls with the others.
+    """
+    key = client_key(client)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker()
+        return breaker
+
+def _request(client, messages, temperature, max_tokens, timeout, on_delta=None, attempt=1, cancel=None):
+    """
+    One API call. Returns (content, span attributes, complete). With
+    on_delta the response is streamed and on_delta(text, attempt) sees each
+    piece as it arrives; a true return stops reading (the server stops
+    generating when the connection closes) and complete is then False.
+    complete is also False for a response cut off at max_tokens
+    (finish_reason "length"). A streamed response also stops with RunCancelled when cancel is cancelled.
+    """
+    if on_delta is None:
+        resp = client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+        )
+        choice = resp.choices[0]
+        attrs = dict(_usage(resp), finish_reason=choice.finish_reason)
+        return choice.message.content.strip(), attrs, choice.finish_reason != "length"
+    
+    start = time.perf_counter()
+    stream = client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        stream=True,
+    )
+    parts, attrs, complete = [], {"stream": True}, True
+    try:
+        for chunk in stream:
+            attrs.update(_usage(chunk))  # endpoints that report usage put it on the last chunk
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if chunk.choices and chunk.choices[0].finish_reason:
+                attrs["finish_reason"] = chunk.choices[0].finish_reason
+            if cancel is not None:
+                cancel.check()
+            if not delta:
+                continue
+            if not parts:
+                attrs["first_delta"] = round(time.perf_counter() - start, 4)
+            parts.append(delta)
+            if on_delta(delta, attempt):
+                complete = False
+                break
+            # The client's timeout applies per read; bound the whole stream too
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"stream still open after {timeout:.0f}s")
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    attrs["stopped_early"] = not complete
+    complete = complete and attrs.get("finish_reason") != "length"
+    return "".join(parts).strip(), attrs, complete
+
+def chat_completion(client, system_prompt, prompt, stats=None, temperature=0.1, max_tokens=2500, recorder=None,
+                    concurrency=None, on_delta=None, cancel=None, cacheable=None):
+    """
+    Call the model, serving repeated requests from the response cache.
+    Transient failures are retried up to RETRY_ATTEMPTS times with backoff
+    (or the server's Retry-After) within CALL_DEADLINE seconds; anything
+    else raises LLMCallError. Calls go through the circuit breaker of the
+    client's endpoint and token (breaker_for), waiting within CALL_DEADLINE
+    for it to let a call through, and, when given, hold a slot of an
+    AdaptiveConcurrency limit, which they feed with their latency and 429s.
+    429s are left to the backoff and that limit; they are not failures to
+    the breaker.
+    With on_delta the response is streamed through on_delta(text, attempt),
+    which can stop it early by returning True; a retry starts a new attempt
+    number, and a response stopped early is not cached.
+    Nor is a response cut off at max_tokens, or one that cacheable(content),
+    when given, rejects (one that did not parse, say).
+    With a metrics Recorder, each attempt is recorded as an "llm.call" span
+    with its network time, attempt number, token usage and whether the
+    cache answered.
+    cancel is the run's cancel.CancelToken: once it is cancelled no attempt
+    is started, backoff ends and streaming stops, all with RunCancelled.
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+    
+    start = time.perf_counter()
+    key = None
+    if response_cache is not None:
+        key = ResponseCache.make_key(MODEL, messages, temperature=temperature, max_tokens=max_tokens)
+        content = response_cache.get(key, stats)
+        if content is not None:
+            if recorder is not None:
+                recorder.add("llm.call", time.perf_counter() - start, cached=True)
+            return content
+    
+    breaker = breaker_for(client)
+    deadline = time.monotonic() + CALL_DEADLINE
+    attempt = 0
+    while True:
+        attempt += 1
+        if cancel is not None:
+            cancel.check()
+        
+        wait_for = deadline - time.monotonic()
+        if cancel is not None and cancel.remaining() is not None:
+            wait_for = min(wait_for, cancel.remaining())
+        if concurrency is not None and not concurrency.acquire(wait_for):
+            if cancel is not None:
+                cancel.check()
+            raise LLMCallError(f"deadline of {CALL_DEADLINE}s reached waiting for a call slot", attempts=attempt - 1)
+        # Asked only with a slot in hand, so a trial call never waits for one
+        if not breaker.allow():
+            if concurrency is not None:
+                concurrency.release()
+            wait = breaker.retry_in()
+            if time.monotonic() + wait >= deadline:
+                if recorder is not None:
+                    recorder.add("llm.call", 0.0, attempt=attempt, error="CircuitOpen")
+                raise CircuitOpenError(f"circuit breaker open after repeated failures; no call let through "
+                                       f"within the deadline of {CALL_DEADLINE}s", attempts=attempt - 1)
+            if recorder is not None:
+                recorder.add("breaker_wait", wait)
+            if cancel is not None:
+                cancel.sleep(wait)
+            else:
+                time.sleep(wait)
+            attempt -= 1
+            continue
+        
+        start = time.perf_counter()
+        delay = None
+        settled = False   # whether the breaker has been told how this attempt went
+        try:
+            try:
+                content, attrs, complete = _request(
+                    client, messages, temperature, max_tokens,
+                    max(0.1, min(CALL_TIMEOUT, deadline - time.monotonic())),
+                    on_delta, attempt, cancel,
+                )
+            finally:
+                # Free the slot before any backoff sleep
+                if concurrency is not None:
+                    concurrency.release()
+            latency = time.perf_counter() - start
+            breaker.record_success()
+            settled = True
+        except RunCancelled:
+            if recorder is not None:
+                recorder.add("llm.call", time.perf_counter() - start, attempt=attempt, error="RunCancelled")
+            raise
+        except Exception as e:
+            if recorder is not None:
+                recorder.add("llm.call", time.perf_counter() - start, attempt=attempt, error=type(e).__name__)
+            if not is_retryable(e):
+                breaker.record_success()  # the endpoint answered; the request itself was wrong
+                settled = True
+                raise LLMCallError(f"{type(e).__name__}: {e}", attempts=attempt) from e
+            if _status(e) == 429:
+                # Throttling says slow down, not that the endpoint is down
+                if concurrency is not None:
+                    concurrency.on_overload()
+            else:
+                breaker.record_failure()
+                settled = True
+            if attempt >= RETRY_ATTEMPTS:
+                raise LLMCallError(f"{type(e).__name__} after {attempt} attempts: {e}", attempts=attempt) from e
+            delay = retry_after(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            if time.monotonic() + delay >= deadline:
+                raise LLMCallError(f"{type(e).__name__}; deadline of {CALL_DEADLINE}s reached after "
+                                   f"{attempt} attempts: {e}", attempts=attempt) from e
+        finally:
+            # A trial call that was cancelled, throttled or interrupted gives the trial back
+            if not settled:
+                breaker.abandon()
+        
+        if delay is not None:
+            if cancel is not None:
+                cancel.sleep(delay)
+            else:
+                time.sleep(delay)
+            continue
+        if concurrency is not None:
+            concurrency.on_success(latency)
+        if recorder is not None:
+            recorder.add("llm.call", latency, cached=False, attempt=attempt, **attrs)
+        break
+    
+    if key is not None and complete and (cacheable is None or cacheable(content)):
+        response_cache.put(key, content)
+    return content
@@ -0,0 +1,262 @@
+# Sentence memory: the terms found in each source sentence, reused across segments and documents.
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from .chunking import split_sentences
+from .config import SENTENCE_MEMORY, SENTENCE_MEMORY_MAX, SENTENCE_MEMORY_PATH, STREAM_RESPONSES, STREAM_TERM_LIMIT
+from .glossary import Automaton, verify_targets
+from .normalize import term_key
+from .parsing import TermStreamParser
+from .tokens import count_tokens
+
+LOOKUP_BATCH = 500    # keys per SELECT, below SQLite's limit on bound parameters
+
+def split_lines(text):
+    """split_sentences, with line breaks ending sentences too; the pieces join back into text."""
+    return [line for sentence in split_sentences(text) for line in sentence.splitlines(keepends=True)]
+
+def sentence_key(sentence):
+    """term_key of a whole sentence, without filling term_key's cache with sentences."""
+    return term_key.__wrapped__(sentence)
+
+class SentenceMemory:
+    """
+    On-disk index of source sentences and the terms extracted from them,
+    shared by every run, session and document. A sentence is keyed on a
+    hash of its term_key (so width, script and spacing variants share an
+    entry) and the run context (mode, focus, filter, glossary, model).
+    Only sentences with terms are stored: one in which nothing was found
+    may just have been left out of the answer, so it is sent again. Least
+    recently used sentences are evicted beyond max_entries.
+    """
+    
+    def __init__(self, path=SENTENCE_MEMORY_PATH, max_entries=SENTENCE_MEMORY_MAX):
+        self.path = path
+        self.max_entries = max_entries
+        self.conn = None
+        self.lock = threading.Lock()
+    
+    def _connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sentences ("
+                "key TEXT PRIMARY KEY, terms TEXT NOT NULL, accessed REAL NOT NULL) WITHOUT ROWID"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS sentences_accessed ON sentences (accessed)")
+        return self.conn
+    
+    @staticmethod
+    def make_key(context, sentence):
+        payload = json.dumps([context, sentence_key(sentence)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def lookup(self, keys):
+        """{key: stored terms} for the keys that are stored."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            for i in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[i:i + LOOKUP_BATCH]
+                marks = ", ".join("?" * len(batch))
+                rows = conn.execute(f"SELECT key, terms FROM sentences WHERE key IN ({marks})", batch).fetchall()
+                found.update((key, json.loads(terms)) for key, terms in rows)
+                if rows:
+                    hits = [key for key, _ in rows]
+                    conn.execute(f"UPDATE sentences SET accessed = ? WHERE key IN ({', '.join('?' * len(hits))})",
+                                 [now, *hits])
+        return found
+    
+    def store(self, entries):
+        """Store (key, terms) pairs in a single transaction, replacing what the keys held."""
+        now = time.time()
+        rows = [(key, json.dumps(terms, ensure_ascii=False), now) for key, terms in entries]
+        if not rows:
+            return
+        with self.lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO sentences (key, terms, accessed) VALUES (?, ?, ?)", rows)
+                conn.execute(
+                    "DELETE FROM sentences WHERE key IN ("
+                    "SELECT key FROM sentences ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def size(self):
+        with self.lock:
+            return self._connect().execute("SELECT COUNT(*) FROM sentences").fetchone()[0]
+    
+    def recall(self, context, recorder=None, learn=None, term_cap=None):
+        """
+        A SentenceRecall for one run with this context. learn=False only
+        reads the memory; by default segments are stored unless streamed
+        segments are cut short (STREAM_TERM_LIMIT), which would store
+        sentences without all their terms. term_cap is the number of terms
+        per segment the prompt asks for; an answer with that many may have
+        left some out and is not stored.
+        """
+        if learn is None:
+            learn = not (STREAM_RESPONSES and STREAM_TERM_LIMIT)
+        return SentenceRecall(self, context, recorder, learn, term_cap)
+
+class SentenceRecall:
+    """
+    One run's use of a SentenceMemory. take() (or segments(), for every
+    segment) takes a segment's sentences that the memory holds out of its
+    source text and keeps their stored terms, and complete() adds them to
+    the segment's result. A
+    segment left with no source text needs no call. With a translation, a
+    stored sentence is only taken out if all its targets occur in the
+    segment's target text, which is sent whole. The extract_fn returned
+    by learning() stores the model's terms under the sentences it was
+    sent, each term with every sentence its source occurs in, as soon as
+    the call returns, so segments submitted after it can recall them. It
+    only learns from answers that are complete JSON arrays with fewer than
+    term_cap terms, and a sentence stored without terms is sent again.
+    Sentences, recalled sentences, source tokens not sent and segments
+    skipped are counted for the run's report. A store that cannot be read
+    or written is skipped, not fatal: error then holds the message.
+    take() and complete() are used from the thread that submits segments;
+    learning()'s function from the workers.
+    """
+    
+    def __init__(self, memory, context, recorder=None, learn=True, term_cap=None):
+        self.memory = memory
+        self.context = list(context)
+        self.recorder = recorder
+        self.learn = learn
+        self.term_cap = term_cap
+        self.pending = {}      # segment index -> recalled terms
+        self.sentences = 0
+        self.recalled = 0
+        self.tokens_saved = 0
+        self.segments_skipped = 0
+        self.stored = 0
+        self.error = None
+        self.lock = threading.Lock()
+    
+    def _keys(self, pieces, tgt):
+        context = self.context + [bool(tgt)]
+        return {p: self.memory.make_key(context, p) for p in pieces if p.strip()}
+    
+    def take_out(self, src, tgt):
+        """(src without the sentences the memory covers, their stored terms)."""
+        pieces = split_lines(src)
+        keys = self._keys(pieces, tgt)
+        try:
+            found = self.memory.lookup(keys.values()) if keys else {}
+        except sqlite3.Error as e:
+            self.error = str(e)
+            found = {}
+        kept, recalled = [], []
+        for piece in pieces:
+            key = keys.get(piece)
+            terms = found.get(key)
+            if key is not None:
+                self.sentences += 1
+            if terms and tgt and verify_targets(terms, tgt)[1]:
+                terms = None
+            if not terms:
+                kept.append(piece)
+                continue
+            recalled.extend(terms)
+            self.recalled += 1
+            self.tokens_saved += count_tokens(piece)
+        return "".join(kept).strip(), recalled
+    
+    def take(self, index, src, tgt):
+        """The source of segment index with covered sentences taken out; complete(index) adds their terms."""
+        if self.recorder is None:
+            src_left, recalled = self.take_out(src, tgt)
+        else:
+            with self.recorder.span("recall", segment=index, source_chars=len(src)) as attrs:
+                src_left, recalled = self.take_out(src, tgt)
+                attrs["recalled"] = len(recalled)
+        if src and not src_left:
+            self.segments_skipped += 1
+        self.pending[index] = recalled
+        return src_left
+    
+    def segments(self, pairs):
+        """(source with covered sentences taken out, target) in place of each (source, target) segment."""
+        for index, (src, tgt) in enumerate(pairs):
+            yield self.take(index, src, tgt), tgt
+    
+    def complete(self, index, terms):
+        """The segment's terms with its recalled ones first (also for a segment whose call failed)."""
+        return [dict(t) for t in self.pending.pop(index, [])] + list(terms)
+    
+    def store(self, src, tgt, terms):
+        """Store each sentence of a segment's (remaining) source in which terms were found, with those terms."""
+        keys = self._keys(split_lines(src), tgt)
+        fields = [{'source': t['source'], 'target': t['target'], 'category': t.get('category') or 'general'}
+                  for t in terms if isinstance(t.get('source'), str) and isinstance(t.get('target'), str)]
+        automaton = Automaton([term_key(t['source']) for t in fields])
+        entries = []
+        for sentence, key in keys.items():
+            found = sorted(automaton.found(sentence_key(sentence)))
+            if found:
+                entries.append((key, [fields[i] for i in found]))
+        try:
+            self.memory.store(entries)
+        except sqlite3.Error as e:
+            with self.lock:
+                self.error = str(e)
+            return
+        with self.lock:
+            self.stored += len(entries)
+    
+    def whole_answer(self, raw):
+        """Whether a model answer parsed as a complete array below term_cap, so it can be learned from."""
+        parser = TermStreamParser()
+        parser.feed(raw or "")
+        answered = parser.close()
+        return parser.complete and (self.term_cap is None or len(answered) < self.term_cap)
+    
+    def learning(self, extract_fn):
+        """extract_fn(src, tgt) that also stores its segment's terms when its call gives a whole answer."""
+        if not self.learn:
+            return extract_fn
+        
+        def learn_fn(src, tgt):
+            terms, raw = extract_fn(src, tgt)
+            if src and self.whole_answer(raw):
+                self.store(src, tgt, terms)
+            return terms, raw
+        
+        return learn_fn
+    
+    def report(self):
+        return {
+            'sentences': self.sentences,
+            'recalled': self.recalled,
+            'hit_rate': self.recalled / self.sentences if self.sentences else 0.0,
+            'tokens_saved': self.tokens_saved,
+            'segments_skipped': self.segments_skipped,
+            'stored': self.stored,
+            'error': self.error,
+        }
+    
+    def describe(self):
+        """One line for the debug log and the CLI."""
+        report = self.report()
+        line = (f"{report['recalled']} of {report['sentences']} sentences recalled ({report['hit_rate']:.0%}), "
+                f"{report['tokens_saved']} source tokens not sent, {report['segments_skipped']} segments "
+                f"without a call, {report['stored']} sentences stored")
+        return line if self.error is None else f"{line} (store failed: {self.error})"
+
+sentence_memory = SentenceMemory() if SENTENCE_MEMORY and SENTENCE_MEMORY_PATH else None
@@ -0,0 +1,237 @@
+# Structured instrumentation: per-run spans, process-wide Prometheus metrics and optional profiling.
+
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import METRICS_TEXTFILE, PROFILE, PROFILE_DIR, TRACE_PATH
+
+# Span attributes summed into the per-run summary and the token counters
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "prefix_tokens")
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Registry:
+    """Process-wide counters and span-duration histograms in Prometheus text format."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # span -> [bucket counts..., sum, count]
+    
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+    
+    def observe(self, record):
+        span = record["span"]
+        seconds = record["seconds"]
+        with self.lock:
+            h = self.histograms.setdefault(span, [0] * (len(SECONDS_BUCKETS) + 2))
+            for i, bound in enumerate(SECONDS_BUCKETS):
+                if seconds <= bound:
+                    h[i] += 1
+            h[-2] += seconds
+            h[-1] += 1
+        if span == "llm.call":
+            error = record.get("error")
+            outcome = ("circuit_open" if error == "CircuitOpen" else "error" if error
+                       else "coalesced" if record.get("coalesced")
+                       else "cache_hit" if record.get("cached") else "ok")
+            self.inc("term_extract_llm_calls_total", outcome=outcome)
+            if record.get("attempt", 1) > 1 and error != "CircuitOpen":
+                self.inc("term_extract_llm_retries_total")
+            if record.get("stopped_early"):
+                self.inc("term_extract_llm_stopped_early_total")
+            for field in TOKEN_FIELDS:
+                if record.get(field):
+                    self.inc("term_extract_llm_tokens_total", record[field], kind=field[:-len("_tokens")])
+    
+    def render(self):
+        lines = []
+        with self.lock:
+            lines.append("# TYPE term_extract_span_seconds histogram")
+            for span, h in sorted(self.histograms.items()):
+                # observe() already counts each sample in every bucket it fits, so counts are cumulative
+                for i, bound in enumerate(SECONDS_BUCKETS):
+                    lines.append(f'term_extract_span_seconds_bucket{{span="{span}",le="{bound:g}"}} {h[i]}')
+                lines.append(f'term_extract_span_seconds_bucket{{span="{span}",le="+Inf"}} {h[-1]}')
+                lines.append(f'term_extract_span_seconds_sum{{span="{span}"}} {h[-2]:.6f}')
+                lines.append(f'term_extract_span_seconds_count{{span="{span}"}} {h[-1]}')
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+    
+    def write_textfile(self, path):
+        """Atomically replace path, for the node_exporter textfile collector."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+registry = Registry()
+_trace_lock = threading.Lock()
+
+class Recorder:
+    """
+    Spans of one extraction run. Each span is a flat dict with the run id,
+    span name, wall-clock start, duration in seconds and any attributes
+    (tokens, segment index, cache hit...). Safe to use from worker threads.
+    flush() appends new spans to the JSON lines trace and feeds the
+    process-wide registry.
+    """
+    
+    def __init__(self, run_id=None, trace_path=TRACE_PATH, textfile=METRICS_TEXTFILE, profile=PROFILE):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.trace_path = trace_path
+        self.textfile = textfile
+        self.profile = profile
+        self.spans = []
+        self.lock = threading.Lock()
+        self._flushed = 0
+        self._profiler = None
+    
+    def add(self, name, seconds, start=None, **attrs):
+        record = {
+            "run": self.run_id,
+            "span": name,
+            "start": round(start if start is not None else time.time() - seconds, 6),
+            "seconds": round(seconds, 6),
+        }
+        record.update(attrs)
+        with self.lock:
+            self.spans.append(record)
+        return record
+    
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time a block; the yielded dict can be filled with attributes inside it."""
+        start_wall = time.time()
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            self.add(name, time.perf_counter() - start, start_wall, **attrs)
+    
+    def timed_iter(self, name, iterable):
+        """Yield from iterable, recording the time spent producing items as one span."""
+        start_wall = time.time()
+        spent = 0.0
+        items = 0
+        it = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    spent += time.perf_counter() - start
+                    return
+                spent += time.perf_counter() - start
+                items += 1
+                yield item
+        finally:
+            self.add(name, spent, start_wall, items=items)
+    
+    def summary(self):
+        """Per-span totals: count, seconds, summed token fields, retried attempts and coalesced calls."""
+        totals = {}
+        with self.lock:
+            spans = list(self.spans)
+        for record in spans:
+            t = totals.setdefault(record["span"], {"count": 0, "seconds": 0.0})
+            t["count"] += 1
+            t["seconds"] += record["seconds"]
+            for field in TOKEN_FIELDS:
+                if record.get(field):
+                    t[field] = t.get(field, 0) + record[field]
+            if record.get("attempt", 1) > 1 and record.get("error") != "CircuitOpen":
+                t["retries"] = t.get("retries", 0) + 1
+            if record.get("coalesced"):
+                t["coalesced"] = t.get("coalesced", 0) + 1
+        for t in totals.values():
+            t["seconds"] = round(t["seconds"], 4)
+        return totals
+    
+    def format_summary(self):
+        lines = []
+        for name, t in sorted(self.summary().items(), key=lambda kv: -kv[1]["seconds"]):
+            tokens = " ".join(f"{f[:-len('_tokens')]}={t[f]}" for f in TOKEN_FIELDS if f in t)
+            lines.append(f"  {name:<16}{t['count']:>6} spans {t['seconds']:>9.3f}s  {tokens}".rstrip())
+        return "\n".join(lines)
+    
+    def flush(self):
+        """Publish spans recorded since the last flush."""
+        with self.lock:
+            new = self.spans[self._flushed:]
+            self._flushed = len(self.spans)
+        for record in new:
+            registry.observe(record)
+        if self.trace_path and new:
+            with _trace_lock, open(self.trace_path, "a", encoding="utf-8") as f:
+                for record in new:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        if self.textfile:
+            registry.write_textfile(self.textfile)
+    
+    def start_profile(self):
+        """Start cProfile (calling thread only) or tracemalloc, as configured."""
+        if self.profile == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "tracemalloc" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._profiler = "tracemalloc"
+    
+    def stop_profile(self):
+        if self._profiler is None:
+            return
+        if self._profiler == "tracemalloc":
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            top = [str(stat) for stat in snapshot.statistics("lineno")[:15]]
+            self.add("tracemalloc", 0.0, peak_bytes=peak, top=top)
+        else:
+            self._profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{self.run_id}.prof")
+            self._profiler.dump_stats(path)
+            self.add("cprofile", 0.0, path=path)
+        self._profiler = None
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve registry.render() at /metrics from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+        
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+    
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,92 @@
+# Normalized keys for matching terms: width, case, spacing, punctuation and script variants.
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Common Traditional characters and their Simplified forms, used when OpenCC
+# is not installed. Pairs, read two characters at a time.
+_T2S_PAIRS = (
+    "衞卫衛卫國国圖图書书語语說说話话讀读寫写學学習习體体醫医藥药療疗護护處处務务會会員员區区"
+    "縣县島岛機机關关係系統统計计劃划畫画時时間间東东車车軍军農农業业產产廠厂電电網网絡络頁页"
+    "視视頻频錄录開开門门問问題题點点應应對对變变發发現现實实驗验證证據据營营養养飲饮節节氣气"
+    "溫温風风雲云災灾難难環环層层級级團团隊队組组織织聯联協协議议經经濟济貿贸銀银錢钱幣币價价"
+    "貨货運运輸输線线鐵铁橋桥樓楼場场館馆園园藝艺術术劇剧樂乐聲声響响歷历傳传觀观覽览遊游戲戏"
+    "動动賽赛獎奖勵励獲获選选舉举長长將将師师專专標标準准質质數数庫库檔档資资訊讯號号碼码類类"
+    "項项進进遠远邊边緣缘蟲虫殺杀劑剂熱热鄉乡鎮镇辦办廳厅總总測测報报導导設设備备維维條条規规"
+    "則则權权責责廣广灣湾臺台紀纪歲岁萬万億亿與与為为這这個个們们來来後后過过還还從从讓让給给"
+    "請请謝谢愛爱見见馬马魚鱼鳥鸟龍龙華华漢汉葉叶頭头臉脸腦脑膽胆腸肠癥症瘧疟檢检診诊斷断鬥斗"
+    "爭争戰战歐欧亞亚蘇苏紐纽約约倫伦義义韓韩漁渔陽阳陰阴雙双嚴严稅税費费貸贷債债險险買买賣卖"
+    "複复復复髮发麵面裏里裡里範范鬆松衝冲醜丑顏颜狀状況况態态慣惯圍围構构築筑鹽盐礦矿廢废棄弃"
+    "淨净潔洁蝦虾蠔蚝雞鸡鴨鸭豬猪牠它腳脚齒齿聽听認认識识誤误論论談谈調调訪访錯错輕轻貴贵帶带"
+    "徑径"
+)
+_T2S = dict(zip(_T2S_PAIRS[0::2], _T2S_PAIRS[1::2]))
+
+# Dashes, quotes, brackets and dots that vary between sources of the same term
+_PUNCTUATION = {
+    **{c: "-" for c in "‐‑‒–—―−﹘﹣"},
+    **{c: "·" for c in "·‧•・∙･"},
+    **{c: "" for c in "'\"‘’‚‛“”„‟「」『』〈〉《》"},
+    "、": ",",
+}
+_SIMPLIFIED = str.maketrans(_T2S)
+_FOLD = str.maketrans({**_PUNCTUATION, **_T2S})
+_FOLD_PUNCTUATION = str.maketrans(_PUNCTUATION)
+# translate() is the slow step, so it only runs on text with something to fold
+_HAS_FOLD = re.compile("[" + re.escape("".join(_PUNCTUATION) + "".join(_T2S)) + "]")
+_HAS_PUNCTUATION = re.compile("[" + re.escape("".join(_PUNCTUATION)) + "]")
+
+def _is_cjk(ch):
+    return "\u2e80" <= ch <= "\u9fff" or "\uf900" <= ch <= "\ufaff"
+
+_converter = None     # False once OpenCC is known to be unavailable
+
+def _get_converter():
+    global _converter
+    if _converter is None:
+        try:
+            import opencc
+            _converter = opencc.OpenCC("t2s")
+        except Exception:  # not installed, or the config can't be loaded
+            _converter = False
+    return _converter
+
+def to_simplified(text):
+    """Traditional Chinese to Simplified: OpenCC when installed, otherwise the common characters only."""
+    converter = _get_converter()
+    if converter:
+        return converter.convert(text)
+    return text.translate(_SIMPLIFIED)
+
+@lru_cache(maxsize=1 << 16)
+def term_key(text):
+    """
+    Key under which variants of a term match: NFKC (full-width to
+    half-width), case-folded, one kind of dash, dot and comma, no quotes,
+    no spaces next to CJK characters, single spaces elsewhere, and
+    Simplified characters. A term that is already its own key is returned
+    as is, so an index holding both shares one string.
+    """
+    original = text
+    if text.isascii():
+        if "'" in text or '"' in text:
+            text = text.replace("'", "").replace('"', "")
+        text = " ".join(text.lower().split())
+        return original if text == original else text
+    text = unicodedata.normalize("NFKC", text).casefold()
+    converter = _converter if _converter is not None else _get_converter()
+    if converter:
+        if _HAS_PUNCTUATION.search(text):
+            text = text.translate(_FOLD_PUNCTUATION)
+        text = converter.convert(text)
+    elif _HAS_FOLD.search(text):
+        text = text.translate(_FOLD)
+    # NFKC has made other spaces " "; tabs and newlines are not printable
+    if " " in text or not text.isprintable():
+        words = text.split()
+        text = words[0] if words else ""
+        for word in words[1:]:
+            # Spaces next to a CJK character carry no meaning ("衞生 署" is "衞生署")
+            text += word if _is_cjk(text[-1]) or _is_cjk(word[0]) else " " + word
+    return original if text == original else text
@@ -0,0 +1,128 @@
+# Parsing model output into term dicts, whole or as it streams in.
+
+import json
+import re
+
+INSTRUCTION_WORDS = ['extract', 'priority', 'category', 'include', 'skip', 'rules']
+
+# Characters that can change the parser's state; everything else is skipped in bulk
+_STRUCTURAL = re.compile(r'[\[\]{}"\\]')
+
+def clean_term(item):
+    """The term dict for one decoded JSON value, or None if it is not a usable term."""
+    if not isinstance(item, dict) or not item.get('source'):
+        return None
+    src = str(item.get('source', '')).strip()
+    tgt = str(item.get('target', item.get('translation', ''))).strip()
+    cat = str(item.get('category', 'general')).strip().lower()
+    
+    if src == tgt and re.match(r'^[A-Za-z\s]+$', src):
+        return None
+    if any(x in src.lower() for x in INSTRUCTION_WORDS):
+        return None
+    if len(src) < 2:
+        return None
+    return {'source': src, 'target': tgt, 'category': cat}
+
+class TermStreamParser:
+    """
+    Incremental parser for a JSON array of term objects that arrives in
+    pieces. feed() scans only the new text and returns the terms whose
+    objects closed in it, so parsing costs one pass over the response
+    however it is split. Prose or a code fence before the array is skipped,
+    objects outside an array and inside a wrapper ({"terms": [...]}) are
+    taken too, an object that is not valid JSON is dropped on its own, and
+    an unfinished object at a truncated end is discarded by close().
+    complete is True once the outermost array has closed, so a response cut
+    short or never giving an array can be told from one that listed
+    everything it meant to.
+    """
+    
+    def __init__(self):
+        self.terms = []
+        self._text = ""     # unscanned tail plus the open term object, if any
+        self._stack = []    # open brackets
+        self._in_string = False
+        self._escape = False
+        self._start = None  # offset in _text of the open term object
+        self._depth = 0     # len(_stack) outside that object
+        self.complete = False
+    
+    def feed(self, text):
+        """Scan the next piece of the response; returns the terms it completed."""
+        found = []
+        pos = len(self._text)
+        self._text += text
+        if self._escape and text:
+            self._escape = False
+            pos += 1
+        skip = -1
+        for match in _STRUCTURAL.finditer(self._text, pos):
+            i = match.start()
+            if i == skip:
+                continue
+            ch = match.group()
+            if self._in_string:
+                if ch == '\\':
+                    skip = i + 1
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if not self._stack:
+                if ch == '{':
+                    self._start, self._depth = i, 0
+                if ch in '[{':
+                    self._stack.append(ch)
+                continue  # quotes and closers in prose before the array
+            if ch == '"':
+                self._in_string = True
+            elif ch in '[{':
+                if ch == '{' and self._stack[-1] == '[':
+                    # A term object; one already open was only a wrapper around it
+                    self._start, self._depth = i, len(self._stack)
+                self._stack.append(ch)
+            elif ch in ']}':
+                if self._stack[-1] == ('[' if ch == ']' else '{'):
+                    self._stack.pop()
+                    if ch == ']' and '[' not in self._stack:
+                        self.complete = True
+                if ch == '}' and self._start is not None and len(self._stack) == self._depth:
+                    term = self._decode(self._text[self._start:i + 1])
+                    self._start = None
+                    if term is not None:
+                        found.append(term)
+        self._escape = skip == len(self._text)
+        
+        # Keep only the open term object; everything before it has been used
+        if self._start is None:
+            self._text = ""
+        elif self._start:
+            self._text = self._text[self._start:]
+            self._start = 0
+        self.terms.extend(found)
+        return found
+    
+    @staticmethod
+    def _decode(text):
+        try:
+            return clean_term(json.loads(text))
+        except ValueError:
+            return None
+    
+    def close(self):
+        """All terms found; an object left open by a truncated response is dropped."""
+        self._text = ""
+        self._start = None
+        return self.terms
+
+def parse_terms(content):
+    """Terms in a complete model response (see TermStreamParser)."""
+    parser = TermStreamParser()
+    parser.feed(content)
+    return parser.close()
+
+def complete_answer(content):
+    """Whether a model response holds a whole JSON array of terms, not one cut short or missing."""
+    parser = TermStreamParser()
+    parser.feed(content or "")
+    return parser.complete
@@ -0,0 +1,560 @@
+# End-to-end extraction: chunk, align, extract per segment, clean and filter.
+
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+
+from .alignment import align_segments
+from .cancel import CancelToken
+from .candidates import CandidateSet, rank_candidates
+from .chunking import token_chunk
+from .config import (
+    ADAPTIVE_CONCURRENCY, CANDIDATE_PREFILTER, CHUNK_OVERLAP, CHUNK_TOKENS, DROP_UNVERIFIED_TARGETS,
+    EXTRACT_ALL_CATEGORIES, MAX_CHARS, MAX_IN_FLIGHT, MODEL, RATE_LIMIT, RUN_BUDGET, SEGMENT_TOKENS,
+)
+from .documents import iter_document_pairs, open_document
+from .extraction import (
+    extract_candidates, extract_chunk, extract_chunk_custom, is_custom_command, iter_segments,
+)
+from .glossary import verify_targets
+from .llm import AdaptiveConcurrency, client_pool
+from .metrics import Recorder
+from .normalize import term_key
+from .prompts import term_count
+from . import llm, memory
+from .terms import TermMerger, TermView, apply_filter, validate_terms
+
+def _no_progress(fraction, desc=""):
+    pass
+
+def select_terms(unique_terms, use_custom_mode, term_filter, max_terms=None):
+    """(all terms passing the filter, the first max_terms of them), sorted by category."""
+    # Skip category filtering in custom mode - respect user's instruction
+    if use_custom_mode:
+        filtered_terms = unique_terms
+        filtered_terms.sort(key=lambda t: (t.get('category', 'zzz'), t['source']))
+    else:
+        filtered_terms = apply_filter(unique_terms, term_filter)
+    return filtered_terms, filtered_terms[:max_terms]
+
+def segment_context(use_custom_mode, focus, term_filter, glossary=None):
+    """Everything besides the segment text that shapes a segment's result (memo and checkpoint keys)."""
+    return ["CUSTOM COMMAND" if use_custom_mode else "STANDARD", focus, term_filter, MODEL, DROP_UNVERIFIED_TARGETS,
+            glossary.fingerprint if glossary is not None and not use_custom_mode else None]
+
+def sentence_recall(use_custom_mode, term_filter, context, recorder):
+    """
+    The run's memory.SentenceRecall, or None without a sentence memory. A
+    custom command can limit the terms of each answer in ways the memory
+    cannot tell, so custom runs only read it.
+    """
+    if memory.sentence_memory is None:
+        return None
+    if use_custom_mode:
+        return memory.sentence_memory.recall(context, recorder, learn=False)
+    return memory.sentence_memory.recall(context, recorder, term_cap=term_count(term_filter)[0])
+
+def read_document(path):
+    """A document's whole text, for the candidate statistics of prefilter mode."""
+    with open_document(path) as f:
+        return f.read()
+
+def prefilter_segments(aligned_pairs, text, recorder):
+    """
+    Rank the candidates of text and put each segment's new ones, with their
+    contexts, in place of its source text (candidates.CandidateSet). Returns
+    (the CandidateSet, the new segments).
+    """
+    with recorder.span("candidates", source_chars=len(text)) as attrs:
+        candidates = CandidateSet(rank_candidates(text))
+        attrs["candidates"] = len(candidates)
+    return candidates, candidates.segments(aligned_pairs)
+
+def segment_extractor(use_custom_mode, focus, term_filter, client, glossary=None, cache_stats=None,
+                      glossary_stats=None, recorder=None, concurrency=None, prefilter=False, cancel=None):
+    """
+    extract_fn(src, tgt) for iter_segments: the custom or standard prompt,
+    with known glossary terms added as-is and targets checked against the
+    segment's translation. Counts go into cache_stats and glossary_stats.
+    With prefilter, src is a candidate list from prefilter_segments and is
+    sent with the candidate prompt instead. cancel is the run's
+    cancel.CancelToken, passed on to every call.
+    """
+    glossary_stats = glossary_stats if glossary_stats is not None else {"known": 0, "unverified": 0}
+    stats_lock = threading.Lock()
+    
+    def extract_fn(src, tgt):
+        # Use custom extraction if in custom mode
+        if use_custom_mode:
+            return extract_chunk_custom(src, tgt, focus, client, cache_stats, recorder, concurrency, cancel)
+        
+        # Known glossary terms are taken as-is; the model only looks for the rest
+        known = glossary.match(src) if glossary is not None else []
+        if prefilter:
+            terms, raw = extract_candidates(src, tgt, focus, client, cache_stats, known, recorder, concurrency,
+                                            cancel)
+        else:
+            terms, raw = extract_chunk(src, tgt, focus, term_filter, client, cache_stats, known, recorder,
+                                       concurrency, cancel)
+        if known:
+            # Variants of a known term (width, script, spacing) are the same term
+            known_sources = {term_key(t['source']) for t in known}
+            terms = [t for t in terms if term_key(t['source']) not in known_sources]
+        
+        unverified = []
+        if tgt:
+            verified, unverified = verify_targets(terms, tgt)
+            if DROP_UNVERIFIED_TARGETS:
+                terms = verified
+        with stats_lock:
+            glossary_stats["known"] += len(known)
+            glossary_stats["unverified"] += len(unverified)
+        return [dict(t) for t in known] + terms, raw
+    
+    return extract_fn
+
+def run_extraction(source_text, target_text="", focus="", term_filter="all", max_terms=150,
+                   client=None, api_token="", progress=None, limiter=None, glossary=None, termbase=None,
+                   recorder=None, memo=None, scheduler=None, session=None, prefilter=CANDIDATE_PREFILTER,
+                   extract_all=EXTRACT_ALL_CATEGORIES, cancel=None):
+    """
+    Extract terms from a source text and optional translation.
+    Returns a dict with the final terms, the intermediate counts and the debug log.
+    """
+    for result in iter_extraction(source_text, target_text, focus, term_filter, max_terms,
+                                  client=client, api_token=api_token, progress=progress, limiter=limiter,
+                                  glossary=glossary, termbase=termbase, recorder=recorder, memo=memo,
+                                  scheduler=scheduler, session=session, prefilter=prefilter,
+                                  extract_all=extract_all, cancel=cancel):
+        pass
+    return result
+
+def run_file_extraction(source_path, target_path=None, focus="", term_filter="all", max_terms=150,
+                        client=None, api_token="", progress=None, limiter=None, glossary=None, termbase=None,
+                        recorder=None, memo=None, scheduler=None, session=None, prefilter=CANDIDATE_PREFILTER,
+                        extract_all=EXTRACT_ALL_CATEGORIES, cancel=None):
+    """Like run_extraction, but streams the documents from disk with no length cap."""
+    for result in iter_file_extraction(source_path, target_path, focus, term_filter, max_terms,
+                                       client=client, api_token=api_token, progress=progress, limiter=limiter,
+                                       glossary=glossary, termbase=termbase, recorder=recorder, memo=memo,
+                                       scheduler=scheduler, session=session, prefilter=prefilter,
+                                       extract_all=extract_all, cancel=cancel):
+        pass
+    return result
+
+def iter_extraction(source_text, target_text="", focus="", term_filter="all", max_terms=150,
+                    client=None, api_token="", progress=None, limiter=None, glossary=None, termbase=None,
+                    recorder=None, memo=None, scheduler=None, session=None, prefilter=CANDIDATE_PREFILTER,
+                    extract_all=EXTRACT_ALL_CATEGORIES, cancel=None):
+    """
+    Streaming version of run_extraction. Yields a partial result after each
+    segment finishes (validated, deduped and filtered so far) and then the
+    final result, which has 'done' set. Closing the generator early cancels
+    the segments that have not started. limiter overrides the default
+    per-run RateLimiter. glossary is a Glossary of known terms: matches are
+    added directly and the model is asked to skip them. All deduped terms
+    are upserted into termbase, a TermBase, when the run completes.
+    recorder is a metrics.Recorder receiving the run's spans; one is created
+    (with the configured trace/metrics outputs) when not given.
+    memo is the session's incremental.SegmentMemo: segments it already holds
+    are not sent to the model again, and the text is re-chunked around the
+    previous run's segment boundaries so an edit only changes its segments.
+    scheduler is a scheduler.FairScheduler shared with other sessions: the
+    run's segments then wait for their fair share of its slots, with session
+    (the UI session id) as the unit of fairness, and a run it has no room
+    for raises scheduler.QueueFullError before any segment is sent.
+    prefilter ranks statistical term candidates over the whole source first
+    and sends the model only each segment's new candidates with short
+    contexts (see prefilter_segments); segments without new candidates make
+    no call. Custom commands always get the full text.
+    The final result's 'view' is a terms.TermView of all deduped terms, for
+    re-filtering, re-capping and re-sorting without another run.
+    extract_all asks the model for every category whatever term_filter is,
+    which is then applied locally, so the view covers every filter and
+    memo and cache entries are shared by runs with different filters.
+    Source sentences that memory.sentence_memory already holds for the same
+    settings, from any earlier segment or document, are taken out of the
+    segments the memo does not hold before their prompts are built, and
+    their stored terms added directly (memory.SentenceRecall); the final result's 'sentence_memory'
+    reports how many were recalled and the source tokens not sent.
+    Prefilter runs do not use it.
+    cancel is a cancel.CancelToken for stopping the run from elsewhere (the
+    UI's Stop button) or giving it a time budget; without one, RUN_BUDGET
+    applies. A run stopped either way ends with the terms of the segments
+    finished so far, and the final result's 'partial' is then the token's
+    reason ("deadline", or what cancel() was given) instead of None.
+    """
+    progress = progress or _no_progress
+    progress(0.05, desc="📝 Preparing...")
+    
+    source_text = source_text.strip()
+    target_text = target_text.strip() if target_text else ""
+    notes = []
+    if len(source_text) > MAX_CHARS or len(target_text) > MAX_CHARS:
+        notes.append(f"Input truncated to {MAX_CHARS} chars; use file input for longer documents")
+    source_text = source_text[:MAX_CHARS]
+    target_text = target_text[:MAX_CHARS]
+    
+    recorder = recorder or Recorder()
+    resync = memo.resync if memo is not None else None
+    starts = []
+    if target_text:
+        with recorder.span("alignment", source_chars=len(source_text), target_chars=len(target_text)):
+            aligned_pairs = align_segments(source_text, target_text, CHUNK_TOKENS, SEGMENT_TOKENS,
+                                           resync=resync, starts=starts)
+    else:
+        with recorder.span("chunking", source_chars=len(source_text)):
+            aligned_pairs = [(s, "") for s in token_chunk(source_text, CHUNK_TOKENS, CHUNK_OVERLAP,
+                                                          resync=resync, starts=starts)]
+    if memo is not None:
+        memo.starts = starts
+    
+    yield from _iter_segment_results(aligned_pairs, len(aligned_pairs), focus, term_filter, max_terms,
+                                     client, api_token, progress, limiter, notes, glossary, termbase, recorder,
+                                     memo, scheduler, session, (lambda: source_text) if prefilter else None,
+                                     extract_all, cancel)
+
+def iter_file_extraction(source_path, target_path=None, focus="", term_filter="all", max_terms=150,
+                         client=None, api_token="", progress=None, limiter=None, glossary=None, termbase=None,
+                         recorder=None, memo=None, scheduler=None, session=None, prefilter=CANDIDATE_PREFILTER,
+                         extract_all=EXTRACT_ALL_CATEGORIES, cancel=None):
+    """
+    Streaming extraction over documents on disk. Segments are read lazily,
+    so memory stays flat however large the files are. With a memo, unchanged
+    segments are reused as in iter_extraction (without re-chunking hints).
+    With prefilter, the source is read whole once for its candidate statistics.
+    """
+    progress = progress or _no_progress
+    progress(0.05, desc="📂 Reading documents...")
+    
+    recorder = recorder or Recorder()
+    with recorder.span("scan"):
+        segment_count, aligned_pairs = iter_document_pairs(source_path, target_path, CHUNK_TOKENS, CHUNK_OVERLAP)
+    # Chunking and alignment happen lazily as the workers pull segments
+    aligned_pairs = recorder.timed_iter("chunking", aligned_pairs)
+    
+    yield from _iter_segment_results(aligned_pairs, segment_count, focus, term_filter, max_terms,
+                                     client, api_token, progress, limiter, [], glossary, termbase, recorder, memo,
+                                     scheduler, session, (lambda: read_document(source_path)) if prefilter else None,
+                                     extract_all, cancel)
+
+def _iter_segment_results(aligned_pairs, segment_count, focus, term_filter, max_terms,
+                          client, api_token, progress, limiter, notes, glossary, termbase, recorder, memo,
+                          scheduler=None, session=None, document_text=None, extract_all=False, cancel=None):
+    if cancel is None and RUN_BUDGET:
+        cancel = CancelToken(RUN_BUDGET)
+    lane = scheduler.open(session, api_token, segment_count) if scheduler is not None else None
+    recorder.start_profile()
+    # The shared client for this token stays open until the run ends
+    lease = client_pool.lease(api_token or "") if client is None else nullcontext(client)
+    try:
+        with lease as client:
+            yield from _segment_results(aligned_pairs, segment_count, focus, term_filter, max_terms,
+                                        client, api_token, progress, limiter, notes, glossary, termbase, recorder,
+                                        memo, lane, document_text, extract_all, cancel)
+    finally:
+        # Also runs when the caller stops early, so cancelled runs are traced too
+        if lane is not None:
+            lane.close()
+        recorder.stop_profile()
+        recorder.flush()
+
+def _segment_results(aligned_pairs, segment_count, focus, term_filter, max_terms,
+                     client, api_token, progress, limiter, notes, glossary, termbase, recorder, memo, lane=None,
+                     document_text=None, extract_all=False, cancel=None):
+    api_token = api_token or ""
+    focus = focus.strip() if focus else ""
+    
+    # Detect if using custom command mode
+    use_custom_mode = is_custom_command(focus) and term_filter == "all"
+    # The filter the model is asked for; term_filter itself is applied locally
+    extract_filter = "all" if extract_all and not use_custom_mode else term_filter
+    
+    if use_custom_mode:
+        progress(0.1, desc="🎯 Custom command detected! Following your instructions...")
+    
+    progress(0.1, desc=f"🔄 Processing {segment_count} segment(s)...")
+    
+    debug_logs = []
+    start_time = time.time()
+    
+    mode_label = "CUSTOM COMMAND" if use_custom_mode else "STANDARD"
+    debug_logs.append(f"Mode: {mode_label}\n")
+    if use_custom_mode:
+        debug_logs.append(f"User Command: {focus}\n")
+    
+    # document_text returns the whole source for prefilter mode, None otherwise
+    candidates = None
+    if document_text is not None and not use_custom_mode:
+        progress(0.1, desc="📊 Ranking term candidates...")
+        candidates, aligned_pairs = prefilter_segments(aligned_pairs, document_text(), recorder)
+    
+    cache_stats = {"hits": 0, "misses": 0}
+    glossary_stats = {"known": 0, "unverified": 0}
+    concurrency = AdaptiveConcurrency(MAX_IN_FLIGHT) if ADAPTIVE_CONCURRENCY else None
+    extract_fn = segment_extractor(use_custom_mode, focus, extract_filter, client, glossary, cache_stats,
+                                   glossary_stats, recorder, concurrency, prefilter=candidates is not None,
+                                   cancel=cancel)
+    memo_context = segment_context(use_custom_mode, focus, extract_filter, glossary)
+    memo_stats = {"reused": 0}
+    
+    recall = None
+    if candidates is None:
+        recall = sentence_recall(use_custom_mode, extract_filter, memo_context, recorder)
+    if recall is not None:
+        extract_fn = recall.learning(extract_fn)
+    
+    originals = {}   # segment index -> its (src, tgt) before recall, until it is done
+    reused = {}      # segment index -> its result from the memo
+    
+    def memo_first(pairs):
+        # The memo holds whole segments, so it is asked before recall takes sentences out
+        for index, (src, tgt) in enumerate(pairs):
+            originals[index] = (src, tgt)
+            result = memo.get(memo_context, src, tgt) if memo is not None and src else None
+            if result is not None:
+                memo_stats["reused"] += 1
+                reused[index] = result
+            elif recall is not None:
+                src = recall.take(index, src, tgt)
+            yield src, tgt
+    
+    def cached(src, tgt):
+        # Called right after memo_first yields the segment, so it is the last one in originals
+        result = reused.pop(next(reversed(originals)), None)
+        if result is None and not src:
+            # A prefiltered segment with no new candidates, or one whose sentences were all recalled
+            return [], ""
+        return result
+    
+    seen = TermMerger()       # live view, in completion order
+    ordered = TermMerger()    # final merge, in segment order
+    pending = {}
+    failed = []      # segments whose call failed for good, in segment order
+    next_index = 0
+    counts = {"raw": 0, "valid": 0}
+    
+    def merge(index):
+        src_len, tgt_len, terms, valid, preview, error = pending.pop(index)
+        # A failed segment can still have terms recalled from the sentence memory
+        counts["raw"] += len(terms)
+        counts["valid"] += len(valid)
+        ordered.add(valid)
+        if error is not None:
+            failed.append({
+                'segment': index + 1,
+                'source_chars': src_len,
+                'attempts': getattr(error, 'attempts', 1),
+                'error': str(error),
+            })
+            debug_logs.append(f"""
+=== Segment {index + 1} === FAILED
+Source: {src_len} chars | Target: {tgt_len} chars
+Error: {error}
+""")
+            return
+        debug_logs.append(f"""
+=== Segment {index + 1} ===
+Source: {src_len} chars | Target: {tgt_len} chars
+Raw terms: {len(terms)}
+Response preview: {preview}...
+""")
+
+    if lane is not None:
+        # Lets the UI show the expected wait before the first segment is back
+        yield {
+            'terms': [],
+            'custom_mode': use_custom_mode,
+            'segments': segment_count,
+            'segments_done': 0,
+            'raw_count': 0,
+            'filtered_count': 0,
+            'elapsed': 0.0,
+            'failed_segments': [],
+            'estimated_wait': lane.estimate(),
+            'debug_log': "",
+            'done': False,
+        }
+    
+    segments = iter_segments(memo_first(aligned_pairs), extract_fn, limiter=limiter, recorder=recorder,
+                             cached=cached, lane=lane, cancel=cancel)
+    for done, (i, (src, tgt), (terms, raw), error) in enumerate(segments, 1):
+        progress(0.1 + 0.7 * (done / max(segment_count, 1)),
+                desc=f"🤖 Segment {done}/{segment_count} done...")
+        
+        if recall is not None:
+            terms = recall.complete(i, terms)
+        src, tgt = originals.pop(i)
+        if memo is not None and error is None and src:
+            memo.put(memo_context, src, tgt, terms, raw)
+        
+        with recorder.span("validate", segment=i, terms=len(terms)):
+            valid = validate_terms(terms)
+        with recorder.span("dedupe", segment=i, terms=len(valid)):
+            seen.add(valid)
+        pending[i] = (len(src), len(tgt), terms, valid, raw[:600], error)
+        
+        # Merge in segment order so the result does not depend on completion order
+        while next_index in pending:
+            merge(next_index)
+            next_index += 1
+        
+        with recorder.span("filter", terms=len(seen)):
+            filtered_terms, final_terms = select_terms(seen.terms(), use_custom_mode, term_filter, max_terms)
+        yield {
+            'terms': final_terms,
+            'custom_mode': use_custom_mode,
+            'segments': segment_count,
+            'segments_done': done,
+            'raw_count': len(seen),
+            'filtered_count': len(filtered_terms),
+            'elapsed': time.time() - start_time,
+            'failed_segments': list(failed),
+            'estimated_wait': lane.estimate() if lane is not None else None,
+            'debug_log': "",
+            'done': False,
+        }
+    
+    # A stopped run leaves gaps; the segments after them are merged in order too
+    segments_done = len(pending) + next_index
+    partial = cancel.reason if cancel is not None and segments_done < segment_count else None
+    for index in sorted(pending):
+        merge(index)
+    
+    progress(0.85, desc="🔍 Cleaning results...")
+    
+    view = TermView(ordered, extract_filter, focus if use_custom_mode else None)
+    unique_terms = view.terms
+    raw_count = len(unique_terms)
+    
+    if termbase is not None:
+        # A termbase failure must not cost the user this run's results
+        try:
+            with recorder.span("termbase", terms=raw_count):
+                termbase.upsert(unique_terms)
+            termbase_summary = f"{raw_count} terms merged into {termbase.path} ({termbase.size()} stored)"
+        except sqlite3.Error as e:
+            termbase_summary = f"not updated ({e})"
+    else:
+        termbase_summary = "disabled"
+    
+    with recorder.span("filter", terms=raw_count):
+        # In custom mode term_filter is "all", so the view keeps every term as select_terms does
+        filtered_terms, final_terms = view.query(term_filter, max_terms)
+    filtered_count = len(filtered_terms)
+    
+    elapsed = time.time() - start_time
+    
+    if llm.response_cache is not None:
+        cache_summary = (f"{cache_stats['hits']} hits / {cache_stats['misses']} misses this run "
+                         f"(total {llm.response_cache.hits} / {llm.response_cache.misses})")
+    else:
+        cache_summary = "disabled"
+    
+    if glossary is not None:
+        glossary_summary = f"{len(glossary)} entries, {glossary_stats['known']} matches in segments"
+    else:
+        glossary_summary = "none"
+    unverified_action = "dropped" if DROP_UNVERIFIED_TARGETS else "kept"
+    
+    if memo is not None:
+        memo_summary = f"{memo_stats['reused']} of {segment_count} segments reused ({len(memo)} held)"
+    else:
+        memo_summary = "off"
+    
+    if recall is not None:
+        memory_summary = recall.describe()
+    elif candidates is not None:
+        memory_summary = "off (prefilter)"
+    else:
+        memory_summary = "disabled"
+    
+    if concurrency is not None:
+        concurrency_summary = f"adaptive, up to {MAX_IN_FLIGHT} in flight (ended at {int(concurrency.limit)})"
+    else:
+        concurrency_summary = f"{MAX_IN_FLIGHT} in flight"
+    
+    if candidates is not None:
+        prefilter_summary = (f"{len(candidates)} candidates ranked, {len(candidates.sent)} sent in "
+                             f"{candidates.segments_sent} of {segment_count} segments")
+    else:
+        prefilter_summary = "off"
+    
+    if lane is not None:
+        waits = recorder.summary().get("schedule_wait", {})
+        scheduler_summary = (f"fair share, {waits.get('seconds', 0):.1f}s waiting for slots over "
+                             f"{waits.get('count', 0)} calls")
+    else:
+        scheduler_summary = "off"
+    
+    if partial is not None:
+        notes.append(f"Stopped ({partial}) after {segments_done} of {segment_count} segments; the terms are partial")
+    notes_text = "".join(f"Note: {note}\n" for note in notes)
+    summary = recorder.summary()
+    usage = summary.get("llm.call", {})
+    prompts = summary.get("prompt", {})
+    tokens = {
+        'counted': prompts.get('prompt_tokens', 0),
+        'prefix': prompts.get('prefix_tokens', 0),
+        'prompt': usage.get('prompt_tokens', 0),
+        'cached': usage.get('cached_tokens', 0),
+        'uncached': usage.get('prompt_tokens', 0) - usage.get('cached_tokens', 0),
+        'completion': usage.get('completion_tokens', 0),
+    }
+    
+    debug_log = f"""=== EXTRACTION SUMMARY ===
+Mode: {mode_label}
+Token: {'Provided' if api_token.strip() else 'Anonymous'}
+Focus/Command: {focus if focus else 'None'}
+Filter: {term_filter}{"" if extract_filter == term_filter else f" (extracted: {extract_filter})"}
+Segments: {segment_count} (budget {CHUNK_TOKENS} tokens, overlap {CHUNK_OVERLAP})
+Concurrency: {concurrency_summary}, {RATE_LIMIT:g} calls/s
+Retries: {usage.get('retries', 0)}
+Scheduler: {scheduler_summary}
+Coalesced: {usage.get('coalesced', 0)} calls answered by an identical call already in flight
+Failed segments: {len(failed)}{"" if not failed else " (" + ", ".join(str(f['segment']) for f in failed) + ")"}
+Cache: {cache_summary}
+Incremental: {memo_summary}
+Sentence memory: {memory_summary}
+Prefilter: {prefilter_summary}
+Glossary: {glossary_summary}
+Targets not found in target text: {glossary_stats['unverified']} ({unverified_action})
+Termbase: {termbase_summary}
+Time: {elapsed:.1f}s
+Prompts: {prompts.get('count', 0)} built, {tokens['counted']} tokens counted before sending ({tokens['prefix']} in the fixed instruction prefix)
+Tokens: {tokens['prompt']} prompt ({tokens['cached']} cached, {tokens['uncached']} uncached) / {tokens['completion']} completion
+Run ID: {recorder.run_id}
+{notes_text}
+Raw extracted: {counts['raw']}
+After validation: {counts['valid']}
+After dedupe: {raw_count}
+After filter: {filtered_count}
+Final: {len(final_terms)}
+
+Stages (count, total seconds; segment/llm.call overlap across workers):
+{recorder.format_summary()}
+
+{"".join(debug_logs)}
+"""
+
+    yield {
+        'terms': final_terms,
+        'custom_mode': use_custom_mode,
+        'segments': segment_count,
+        'segments_done': segments_done,
+        'partial': partial,
+        'raw_count': raw_count,
+        'filtered_count': filtered_count,
+        'elapsed': elapsed,
+        'failed_segments': failed,
+        'reused_segments': memo_stats['reused'],
+        'sentence_memory': recall.report() if recall is not None else None,
+        'view': view,
+        'debug_log': debug_log,
+        'run_id': recorder.run_id,
+        'tokens': tokens,
+        'metrics': summary,
+        'recorder': recorder,
+        'done': True,
+    }
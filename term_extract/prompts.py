@@ -0,0 +1,188 @@
+# Prompt templates: a fixed instruction prefix per run, then each segment's known terms and texts.
+
+from functools import lru_cache
+
+from .chunking import split_sentences
+from .config import KNOWN_TERMS_IN_PROMPT, PROMPT_TEMPLATES, SEGMENT_TOKENS
+from .tokens import count_tokens
+
+STANDARD_SYSTEM = "You extract terminology from texts. Output only valid JSON arrays. Never include instruction text in your output."
+CUSTOM_SYSTEM = "You are a precise terminology extractor. Follow user instructions exactly. Output only valid JSON arrays."
+
+def get_focus_instruction(focus):
+    """Get predefined focus instruction for simple keywords."""
+    if not focus or not focus.strip():
+        return ""
+    
+    focus_lower = focus.lower().strip()
+    
+    focus_map = {
+        "social media": "Pay special attention to social media platforms, Facebook pages, Instagram accounts, YouTube channels, websites.",
+        "medical": "Pay special attention to diseases, symptoms, medical procedures, health terms.",
+        "organization": "Pay special attention to government departments, agencies, official bodies.",
+        "place": "Pay special attention to locations, districts, trails, parks, countries.",
+        "technical": "Pay special attention to equipment, devices, machinery, technical procedures.",
+        "chemical": "Pay special attention to chemical compounds, pesticides, larvicides, active ingredients.",
+        "date": "Pay special attention to dates, times, years, months, days, periods."
+    }
+    
+    for key, instruction in focus_map.items():
+        if key in focus_lower:
+            return instruction
+    
+    return f"Pay special attention to terms related to: {focus}"
+
+def known_terms_instruction(known_terms):
+    """Prompt line asking the model to skip terms already matched from the glossary."""
+    if not known_terms:
+        return ""
+    listed = ", ".join(t['source'] for t in known_terms[:KNOWN_TERMS_IN_PROMPT])
+    return f"Skip these terms, they are already in the glossary: {listed}"
+
+def fit_tokens(text, room):
+    """As much of text as fits in room tokens, cut only at sentence ends."""
+    if count_tokens(text) <= room:
+        return text
+    kept = []
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if tokens > room:
+            break
+        kept.append(sentence)
+        room -= tokens
+    return "".join(kept).strip()
+
+def fit_target(source, target, budget=SEGMENT_TOKENS):
+    """
+    Keep as much of the target as fits next to the source in budget tokens,
+    cutting only at sentence ends. Aligned segments normally fit whole.
+    """
+    return fit_tokens(target, budget - count_tokens(source))
+
+class PromptTemplate:
+    """
+    One run's prompt. The system prompt and the instructions come first and
+    are the same for every segment, so endpoints that cache prompt prefixes
+    can reuse them; the segment's known-terms line and texts follow in
+    tagged blocks. Built once per mode, focus and filter (the *_template
+    functions below), with the fixed part's tokens counted then.
+    """
+    
+    def __init__(self, system, instructions, source_tag, target_tag=None):
+        self.system = system
+        self.instructions = instructions
+        self.source_tag = source_tag
+        self.target_tag = target_tag
+        self.prefix_tokens = count_tokens(system) + count_tokens(instructions)
+        # The layout holds the instructions, and the tags and separators around the texts
+        self.fixed_tokens = count_tokens(system) + count_tokens(self._layout("", "", ""))
+    
+    def _layout(self, skip, source, target):
+        parts = [self.instructions, ""]
+        if skip:
+            parts += [skip, ""]
+        parts.append(f"<{self.source_tag}>\n{source}\n</{self.source_tag}>")
+        if self.target_tag is not None:
+            parts += ["", f"<{self.target_tag}>\n{target}\n</{self.target_tag}>"]
+        return "\n".join(parts)
+    
+    def render(self, source, target="", known_terms=None, budget=SEGMENT_TOKENS):
+        """
+        (user prompt, prompt tokens with the system prompt's). The target
+        gets what the known-terms line and the source leave of budget,
+        cut at sentence ends.
+        """
+        skip = known_terms_instruction(known_terms)
+        tokens = count_tokens(skip) + count_tokens(source)
+        if self.target_tag is not None:
+            target = fit_tokens(target, budget - tokens)
+            tokens += count_tokens(target)
+        return self._layout(skip, source, target), self.fixed_tokens + tokens
+
+def term_count(term_filter):
+    """(fewest, most) terms the standard prompt asks for per segment."""
+    return (40, 60) if term_filter == "all" else (25, 40)
+
+@lru_cache(maxsize=PROMPT_TEMPLATES)
+def standard_template(focus, term_filter, bilingual):
+    """Standard extraction, for a focus keyword and filter; bilingual when a translation is sent."""
+    focus_instruction = get_focus_instruction(focus) or "Extract all types of terminology"
+    term_target = "{}-{}".format(*term_count(term_filter))
+    if bilingual:
+        instructions = f"""You are a bilingual terminology extractor. Extract Chinese-English term pairs from the parallel texts at the end of this message.
+
+Instructions:
+- Extract {term_target} terminology pairs
+- Match Chinese terms with their English translations from the texts
+- Include: proper nouns, technical terms, organizations, places, dates/times, chemicals, medical terms
+- {focus_instruction}
+- Use categories: medical, organization, place, social, technical, chemical, date, general
+
+Output ONLY a JSON array like this:
+[{{"source":"中文術語","target":"English term","category":"type"}}]"""
+        return PromptTemplate(STANDARD_SYSTEM, instructions, "source_chinese", "target_english")
+    
+    instructions = f"""You are a bilingual terminology extractor. Extract key Chinese terms with English translations from the text at the end of this message.
+
+Instructions:
+- Extract {term_target} terms with accurate English translations
+- Include: proper nouns, technical terms, organizations, places, dates/times, chemicals, medical terms
+- {focus_instruction}
+- Use categories: medical, organization, place, social, technical, chemical, date, general
+
+Output ONLY a JSON array like this:
+[{{"source":"中文術語","target":"English term","category":"type"}}]"""
+    return PromptTemplate(STANDARD_SYSTEM, instructions, "chinese_text")
+
+@lru_cache(maxsize=PROMPT_TEMPLATES)
+def custom_template(command, bilingual):
+    """Custom command mode: the user's instruction is followed directly."""
+    if bilingual:
+        instructions = f"""You are a bilingual terminology extractor. Follow the user's specific instructions.
+
+USER INSTRUCTION: {command}
+
+Based on the user's instruction above, extract the requested terms from the texts at the end of this message.
+Output ONLY a JSON array in this format:
+[{{"source":"來源術語","target":"target term","category":"type"}}]
+
+Important:
+- Follow the user's instruction precisely
+- If user asks for specific types of terms, only extract those
+- Match source terms with their translations from the target text
+- Use appropriate categories: medical, organization, place, social, technical, chemical, date, name, general"""
+        return PromptTemplate(CUSTOM_SYSTEM, instructions, "source_text", "target_text")
+    
+    instructions = f"""You are a bilingual terminology extractor. Follow the user's specific instructions.
+
+USER INSTRUCTION: {command}
+
+Based on the user's instruction above, extract the requested terms from the text at the end of this message.
+Output ONLY a JSON array in this format:
+[{{"source":"來源術語","target":"English translation","category":"type"}}]
+
+Important:
+- Follow the user's instruction precisely
+- If user asks for specific types of terms, only extract those
+- Provide accurate translations for extracted terms
+- Use appropriate categories: medical, organization, place, social, technical, chemical, date, name, general"""
+    return PromptTemplate(CUSTOM_SYSTEM, instructions, "text")
+
+@lru_cache(maxsize=PROMPT_TEMPLATES)
+def candidate_template(focus, bilingual):
+    """Prefilter mode: the segment is a list of statistical candidates with contexts."""
+    focus_instruction = get_focus_instruction(focus) or "Keep all types of terminology"
+    translation = ("Give each kept candidate its English translation from the English text" if bilingual
+                   else "Give each kept candidate an accurate English translation")
+    instructions = f"""You are a bilingual terminology extractor. The Chinese candidate terms at the end of this message were found by frequency statistics in a document, each with a short context from it.
+
+Instructions:
+- Keep only candidates that are terminology: proper nouns, technical terms, organizations, places, dates/times, chemicals, medical terms
+- {translation}
+- If the context shows a candidate is cut short or runs on, output the correct full term
+- {focus_instruction}
+- Use categories: medical, organization, place, social, technical, chemical, date, general
+
+Output ONLY a JSON array like this:
+[{{"source":"中文術語","target":"English term","category":"type"}}]"""
+    return PromptTemplate(STANDARD_SYSTEM, instructions, "candidates", "target_english" if bilingual else None)
@@ -0,0 +1,215 @@
+# Fair scheduling of segment calls across UI sessions and API tokens.
+
+import hashlib
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .config import (
+    ANON_IN_FLIGHT, MAX_IN_FLIGHT, QUEUE_LIMIT, SCHEDULER_IN_FLIGHT, TOKEN_IN_FLIGHT, TOKEN_WEIGHT,
+)
+
+class QueueFullError(RuntimeError):
+    """Too many segments are queued to take another run; wait is the estimated seconds until there is room."""
+    
+    def __init__(self, message, wait):
+        super().__init__(message)
+        self.wait = wait
+
+class SegmentCancelled(RuntimeError):
+    """A segment still waiting for a slot when its run was closed."""
+
+class Lane:
+    """
+    One run's handle on the scheduler. Wrap each segment call in slot();
+    close() when the run ends, which also releases segments still waiting.
+    """
+    
+    def __init__(self, scheduler, flow, segments, max_in_flight):
+        self.scheduler = scheduler
+        self.flow = flow
+        self.remaining = segments
+        self.max_in_flight = max_in_flight
+        self.closed = False
+    
+    @contextmanager
+    def slot(self):
+        self.scheduler._acquire(self)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.scheduler._release(self, time.perf_counter() - start)
+    
+    def estimate(self):
+        """Rough seconds until this run's remaining segments are done."""
+        return self.scheduler.estimate(self)
+    
+    def close(self):
+        self.scheduler._close(self)
+
+class FairScheduler:
+    """
+    Start-time fair queuing of segment calls. Each UI session is a flow
+    whose virtual time advances by 1/weight per segment it is granted; a
+    free slot goes to the waiting flow with the lowest virtual time, so a
+    session with two segments is served between the segments of one with
+    fourteen instead of after them. A flow that was idle restarts at the
+    lowest active virtual time and cannot bank credit. Sessions with their
+    own token weigh token_weight, anonymous ones 1.
+    At most max_in_flight calls run at once, at most token_in_flight per API
+    token and anon_in_flight for all anonymous sessions together. open()
+    turns a run away with QueueFullError while more than queue_limit
+    segments are queued or running (a run is always let in when idle).
+    """
+    
+    def __init__(self, max_in_flight=SCHEDULER_IN_FLIGHT, token_in_flight=TOKEN_IN_FLIGHT,
+                 anon_in_flight=ANON_IN_FLIGHT, token_weight=TOKEN_WEIGHT, queue_limit=QUEUE_LIMIT):
+        self.max_in_flight = max_in_flight
+        self.token_in_flight = token_in_flight
+        self.anon_in_flight = anon_in_flight
+        self.token_weight = token_weight
+        self.queue_limit = queue_limit
+        self.cond = threading.Condition()
+        self.flows = {}         # session -> flow dict
+        self.groups = {}        # token group -> calls running
+        self.running = 0
+        self.backlog = 0        # segments of open runs not finished yet
+        self.clock = 0.0        # virtual time of the last grant
+        self.service = 5.0      # moving average of seconds a segment holds its slot
+        self.tickets = itertools.count()
+        self.granted = 0
+        self.rejected = 0
+    
+    @staticmethod
+    def _group(token):
+        if not token:
+            return "anonymous"
+        return "token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:12]
+    
+    def _cap(self, group):
+        return self.anon_in_flight if group == "anonymous" else self.token_in_flight
+    
+    def open(self, session, token, segments, max_in_flight=MAX_IN_FLIGHT):
+        """A Lane for a run of segments; session None gives the run a flow of its own."""
+        with self.cond:
+            if self.backlog and self.backlog + segments > self.queue_limit:
+                self.rejected += 1
+                wait = self.service * self.backlog / self.max_in_flight
+                raise QueueFullError(f"{self.backlog} segments are queued; try again in about {wait:.0f}s", wait)
+            key = session if session is not None else object()
+            flow = self.flows.get(key)
+            if flow is None:
+                group = self._group(token)
+                flow = self.flows[key] = {
+                    "key": key,
+                    "group": group,
+                    "weight": 1 if group == "anonymous" else self.token_weight,
+                    "virtual": self._floor(),
+                    "waiting": deque(),
+                    "running": 0,
+                    "lanes": 0,
+                }
+            flow["lanes"] += 1
+            self.backlog += segments
+        return Lane(self, flow, segments, max_in_flight)
+    
+    def _floor(self):
+        active = [f["virtual"] for f in self.flows.values() if f["waiting"] or f["running"]]
+        return min(active) if active else self.clock
+    
+    def _pick(self):
+        if self.running >= self.max_in_flight:
+            return None
+        best = None
+        for flow in self.flows.values():
+            if not flow["waiting"] or self.groups.get(flow["group"], 0) >= self._cap(flow["group"]):
+                continue
+            if best is None or (flow["virtual"], flow["waiting"][0]) < (best["virtual"], best["waiting"][0]):
+                best = flow
+        return best
+    
+    def _acquire(self, lane):
+        flow = lane.flow
+        with self.cond:
+            ticket = next(self.tickets)
+            if not flow["waiting"] and not flow["running"]:
+                # An idle flow starts level with the others instead of ahead of them
+                flow["virtual"] = max(flow["virtual"], self._floor())
+            flow["waiting"].append(ticket)
+            try:
+                while self._pick() is not flow or flow["waiting"][0] != ticket:
+                    if lane.closed:
+                        raise SegmentCancelled("run closed while the segment was queued")
+                    self.cond.wait()
+            except BaseException:
+                flow["waiting"].remove(ticket)
+                self.cond.notify_all()
+                raise
+            flow["waiting"].popleft()
+            flow["running"] += 1
+            self.groups[flow["group"]] = self.groups.get(flow["group"], 0) + 1
+            self.running += 1
+            self.granted += 1
+            self.clock = flow["virtual"]
+            flow["virtual"] += 1 / flow["weight"]
+            self.cond.notify_all()
+    
+    def _release(self, lane, seconds):
+        flow = lane.flow
+        with self.cond:
+            flow["running"] -= 1
+            self.groups[flow["group"]] -= 1
+            self.running -= 1
+            if lane.remaining > 0:
+                lane.remaining -= 1
+                self.backlog -= 1
+            self.service = 0.8 * self.service + 0.2 * seconds
+            if not flow["lanes"] and not flow["waiting"] and not flow["running"]:
+                self.flows.pop(flow["key"], None)
+            self.cond.notify_all()
+    
+    def _close(self, lane):
+        flow = lane.flow
+        with self.cond:
+            if lane.closed:
+                return
+            lane.closed = True
+            # Segments answered without a call (memo hits) or never started
+            self.backlog -= lane.remaining
+            lane.remaining = 0
+            flow["lanes"] -= 1
+            if not flow["lanes"] and not flow["waiting"] and not flow["running"]:
+                self.flows.pop(flow["key"], None)
+            self.cond.notify_all()
+    
+    def estimate(self, lane):
+        """
+        Rough seconds until lane's remaining segments are done: its weighted
+        share of the slots (capped by its token's and its run's limits) at
+        the recent time per segment.
+        """
+        with self.cond:
+            if lane.remaining <= 0:
+                return 0.0
+            active = [f for f in self.flows.values() if f["lanes"] or f["waiting"] or f["running"]]
+            total_weight = sum(f["weight"] for f in active) or lane.flow["weight"]
+            slots = min(self.max_in_flight * lane.flow["weight"] / total_weight,
+                        self._cap(lane.flow["group"]), lane.max_in_flight)
+            return self.service * lane.remaining / max(slots, 0.1)
+    
+    def snapshot(self):
+        with self.cond:
+            return {
+                "running": self.running,
+                "waiting": sum(len(f["waiting"]) for f in self.flows.values()),
+                "sessions": len(self.flows),
+                "backlog": self.backlog,
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "service": round(self.service, 3),
+            }
+
+scheduler = FairScheduler()
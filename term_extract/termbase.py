@@ -0,0 +1,210 @@
+# Persistent SQLite termbase that accumulates extracted terms across runs.
+
+import sqlite3
+import threading
+import time
+
+from .config import TERMBASE_PATH
+from .normalize import term_key
+from .terms import filter_categories
+
+COLUMNS = "source, target, category, first_seen, last_seen, frequency"
+PREFIX_END = "\U0010ffff"
+SCHEMA_VERSION = 1    # 1: keys are normalize.term_key, targets are voted on
+
+UPSERT_TARGETS = (
+    "INSERT INTO targets (key, target_key, target, category, votes, first_seen) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (key, target_key) DO UPDATE SET "
+    "votes = votes + excluded.votes, first_seen = min(first_seen, excluded.first_seen)"
+)
+UPSERT_TERMS = (
+    "INSERT INTO terms (key, source, target, target_key, category, first_seen, last_seen, frequency) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET "
+    "frequency = frequency + excluded.frequency, "
+    "first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen)"
+)
+# Most votes, then the longer target, then the first seen (TermMerger's order); a vote
+# for the target an entry already shows cannot change it
+ELECT_TARGET = (
+    "UPDATE terms SET (target, target_key, category) = ("
+    "SELECT target, target_key, category FROM targets WHERE targets.key = terms.key "
+    "ORDER BY votes DESC, length(target) DESC, first_seen LIMIT 1) "
+    "WHERE key = ? AND target_key != ?"
+)
+
+def _row_to_term(row):
+    source, target, category, first_seen, last_seen, frequency = row
+    return {
+        'source': source,
+        'target': target,
+        'category': category,
+        'first_seen': first_seen,
+        'last_seen': last_seen,
+        'frequency': frequency,
+    }
+
+class TermBase:
+    """
+    Terms keyed on the normalize.term_key of their source, so width, case,
+    spacing, punctuation and script variants share an entry; the first
+    spelling stored is kept. Upserting a term that is already stored bumps
+    its frequency and last_seen, and adds a vote for its target: the entry
+    shows the target stored most often, then the longer one, as TermMerger
+    does within a run. Lookups by source, prefix and category are index
+    range scans. A termbase written with the earlier keys is re-keyed when
+    it is first opened.
+    """
+    
+    def __init__(self, path=TERMBASE_PATH):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()
+    
+    def _connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA cache_size=-65536")  # 64 MB, keeps index pages hot during bulk upserts
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._upgrade()
+        return self.conn
+    
+    def _create(self):
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS terms ("
+            "key TEXT PRIMARY KEY, source TEXT NOT NULL, target TEXT NOT NULL, target_key TEXT NOT NULL, "
+            "category TEXT NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL, "
+            "frequency INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS terms_category ON terms (category, source)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS targets ("
+            "key TEXT NOT NULL, target_key TEXT NOT NULL, target TEXT NOT NULL, category TEXT NOT NULL, "
+            "votes INTEGER NOT NULL, first_seen REAL NOT NULL, PRIMARY KEY (key, target_key)) WITHOUT ROWID"
+        )
+    
+    def _upgrade(self):
+        """
+        Create the tables, moving terms stored under the earlier keys (NFKC,
+        lowercased; one target each) to term_key, each target with its count.
+        """
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = []
+            # Another connection may have upgraded it since _connect looked
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'terms'").fetchone():
+                    rows = conn.execute(f"SELECT {COLUMNS} FROM terms ORDER BY first_seen").fetchall()
+                    conn.execute("DROP TABLE terms")
+                self._create()
+                self._write([(term_key(source), term_key(target), source, target, category, first_seen, last_seen,
+                              frequency) for source, target, category, first_seen, last_seen, frequency in rows])
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def _write(self, rows):
+        """
+        Add (key, target key, source, target, category, first seen, last
+        seen, count) rows inside the caller's transaction. An entry's target
+        is elected again only when a vote went to another target.
+        """
+        # Key order turns random B-tree inserts into mostly sequential ones; the sort is
+        # stable, so the first spelling of a new source is the one stored
+        rows.sort(key=lambda r: r[0])
+        self.conn.executemany(UPSERT_TARGETS, [(key, target_key, target, category, count, first_seen)
+                                               for key, target_key, _, target, category, first_seen, _, count in rows])
+        self.conn.executemany(UPSERT_TERMS, [(key, source, target, target_key, category, first_seen, last_seen, count)
+                                             for key, target_key, source, target, category, first_seen, last_seen, count
+                                             in rows])
+        self.conn.executemany(ELECT_TARGET, dict.fromkeys((r[0], r[1]) for r in rows))
+    
+    def upsert(self, terms, now=None):
+        """Merge terms into the store in a single transaction. Returns the number written."""
+        now = time.time() if now is None else now
+        rows = []
+        for t in terms:
+            source, target = t['source'].strip(), t['target'].strip()
+            if source and target:
+                rows.append((term_key(source), term_key(target), source, target, t.get('category') or 'general',
+                             now, now, 1))
+        with self.lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                self._write(rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+    
+    def get(self, source):
+        """The stored term for a source term, or None."""
+        with self.lock:
+            row = self._connect().execute(
+                f"SELECT {COLUMNS} FROM terms WHERE key = ?", (term_key(source),)
+            ).fetchone()
+        return _row_to_term(row) if row else None
+    
+    def lookup_prefix(self, prefix, limit=50):
+        """Terms whose normalized source starts with prefix, in key order."""
+        key = term_key(prefix)
+        with self.lock:
+            rows = self._connect().execute(
+                f"SELECT {COLUMNS} FROM terms WHERE key >= ? AND key < ? ORDER BY key LIMIT ?",
+                (key, key + PREFIX_END, limit),
+            ).fetchall()
+        return [_row_to_term(r) for r in rows]
+    
+    def select(self, term_filter="all", limit=None, min_frequency=1):
+        """
+        apply_filter as a query: terms in the filter's categories, sorted by
+        category then source. Uniqueness is the primary key, so the result is
+        already deduped.
+        """
+        categories = filter_categories(term_filter)
+        sql = f"SELECT {COLUMNS} FROM terms WHERE frequency >= ?"
+        params = [min_frequency]
+        if categories is not None:
+            sql += f" AND category IN ({', '.join('?' * len(categories))})"
+            params.extend(categories)
+        sql += " ORDER BY category, source"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [_row_to_term(r) for r in rows]
+    
+    def iter_terms(self, batch_size=10000):
+        """Stream every stored term in key order, batch_size rows per query."""
+        last = ""
+        while True:
+            with self.lock:
+                rows = self._connect().execute(
+                    f"SELECT key, {COLUMNS} FROM terms WHERE key > ? ORDER BY key LIMIT ?",
+                    (last, batch_size),
+                ).fetchall()
+            for row in rows:
+                yield _row_to_term(row[1:])
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+    
+    def size(self):
+        with self.lock:
+            return self._connect().execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+    
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+termbase = TermBase() if TERMBASE_PATH else None
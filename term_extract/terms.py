@@ -0,0 +1,210 @@
+# Cleaning, merging and filtering extracted terms.
+
+import re
+import sys
+
+from .normalize import term_key
+
+FILTER_CHOICES = ["all", "social", "medical", "organizations", "places", "dates", "technical", "general"]
+SORT_CHOICES = ["category", "frequency", "source", "document"]
+
+class MergedTerm:
+    """
+    One deduped term. votes is None while every occurrence had the same
+    target; then it maps each target's key to [count, length, -first seen,
+    target, category], and the term shows the highest.
+    """
+    __slots__ = ("source", "target", "category", "count", "votes")
+    
+    def __init__(self, source, target, category, count):
+        self.source = source
+        self.target = target
+        self.category = category
+        self.count = count
+        self.votes = None
+    
+    def as_dict(self):
+        return {'source': self.source, 'target': self.target, 'category': self.category}
+
+class TermMerger:
+    """
+    Dedupe index for any number of terms. Sources match on their
+    normalize.term_key (width, case, spacing, punctuation and Traditional/
+    Simplified variants); the first spelling seen is kept. When a source
+    comes with different targets, the one seen most often across segments
+    wins, then the longer one, so one odd translation does not replace a
+    consistent one. Entries are MergedTerm records with interned categories
+    rather than dicts.
+    """
+    
+    def __init__(self):
+        self.entries = {}     # source key -> MergedTerm, in first-seen order
+        self.added = 0
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def add_term(self, source, target, category="general", count=1):
+        self.added += count
+        key = term_key(source)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = MergedTerm(source, target, sys.intern(category), count)
+        else:
+            self._vote(entry, target, category, count)
+    
+    def _vote(self, entry, target, category, count):
+        votes = entry.votes
+        if votes is None:
+            if target == entry.target:
+                entry.count += count
+                return
+            target_key = term_key(target)
+            current_key = term_key(entry.target)
+            if target_key == current_key:
+                entry.count += count
+                return
+            votes = entry.votes = {current_key: [entry.count, len(entry.target), 0, entry.target, entry.category]}
+        else:
+            target_key = term_key(target)
+        entry.count += count
+        vote = votes.get(target_key)
+        if vote is None:
+            votes[target_key] = [count, len(target), -len(votes), target, sys.intern(category)]
+        else:
+            vote[0] += count
+        best = max(votes.values())
+        entry.target, entry.category = best[3], best[4]
+    
+    def add(self, terms):
+        """Fold term dicts in; returns self."""
+        # add_term inlined for the common cases: this loop runs once per raw term
+        entries = self.entries
+        added = 0
+        for t in terms:
+            added += 1
+            target = t['target']
+            key = term_key(t['source'])
+            entry = entries.get(key)
+            if entry is None:
+                entries[key] = MergedTerm(t['source'], target, sys.intern(t.get('category', 'general')), 1)
+            elif entry.votes is None and target == entry.target:
+                entry.count += 1
+            else:
+                self._vote(entry, target, t.get('category', 'general'), 1)
+        self.added += added
+        return self
+    
+    def merge(self, other):
+        """Fold in another merger's terms with their counts (e.g. per-document results)."""
+        for entry in other.entries.values():
+            if entry.votes is None:
+                self.add_term(entry.source, entry.target, entry.category, entry.count)
+                continue
+            for count, _, _, target, category in sorted(entry.votes.values(), key=lambda v: -v[2]):
+                self.add_term(entry.source, target, category, count)
+        return self
+    
+    def terms(self):
+        """The merged terms as dicts, in first-seen order."""
+        return [entry.as_dict() for entry in self.entries.values()]
+
+def dedupe(terms):
+    return TermMerger().add(terms).terms()
+
+# Compiled once: validate_terms runs over every raw term
+_LATIN_DIGITS = re.compile(r'[A-Za-z0-9\s\-]+')
+_INSTRUCTION = re.compile(r'extract|priority|category|include|skip|rules|instructions')
+_LONG_LATIN = re.compile(r'[A-Za-z\s]{10,}')
+
+def validate_terms(terms):
+    """Drop terms without a source or target, echoed English and leaked prompt text."""
+    valid = []
+    for t in terms:
+        src = t['source'].strip()
+        tgt = t['target'].strip()
+        if not src or not tgt:
+            continue
+        lower = src.lower()
+        # Echoed English is only kept when short or an acronym
+        if lower == tgt.lower() and len(src) > 6 and src.upper() != src and _LATIN_DIGITS.fullmatch(src):
+            continue
+        if _INSTRUCTION.search(lower) or _LONG_LATIN.fullmatch(src):
+            continue
+        valid.append(t)
+    return valid
+
+FILTER_CATEGORIES = {
+    "names": ["name", "organization", "place", "social", "website"],
+    "social": ["social", "website"],
+    "medical": ["medical", "chemical"],
+    "technical": ["technical", "equipment"],
+    "organizations": ["organization"],
+    "places": ["place", "location"],
+    "dates": ["date", "time"],
+    "general": ["general"]
+}
+
+def filter_categories(term_filter):
+    """Categories kept by a filter choice, or None for "all"."""
+    if term_filter == "all":
+        return None
+    return FILTER_CATEGORIES.get(term_filter, [term_filter])
+
+def apply_filter(terms, term_filter):
+    if term_filter == "all":
+        terms.sort(key=lambda t: (t.get('category', 'zzz'), t['source']))
+        return terms
+    
+    allowed = filter_categories(term_filter)
+    filtered = [t for t in terms if t.get('category', 'general') in allowed]
+    filtered.sort(key=lambda t: (t.get('category', 'zzz'), t['source']))
+    
+    return filtered
+
+class TermView:
+    """
+    A run's full validated, deduped terms, indexed by category, so another
+    filter, cap or sort order is a local query instead of a new extraction.
+    Built from the run's TermMerger, whose counts (segments a term came back
+    from) give the "frequency" order; "document" is first-seen order.
+    extracted_filter is the filter the model was asked for: only views
+    within it are complete (covers), so a run extracted with "all" serves
+    every filter. command is the custom command of a custom-mode run, which
+    may have limited what the model returned whatever the filter; such a
+    view only covers that filter with that command.
+    """
+    
+    def __init__(self, merger, extracted_filter="all", command=None):
+        self.terms = merger.terms()
+        self.counts = [entry.count for entry in merger.entries.values()]
+        self.extracted_filter = extracted_filter
+        self.command = command
+        self.by_category = {}  # category -> indexes into terms, in first-seen order
+        for i, t in enumerate(self.terms):
+            self.by_category.setdefault(t.get('category', 'general'), []).append(i)
+    
+    def __len__(self):
+        return len(self.terms)
+    
+    def covers(self, term_filter, command=None):
+        if self.command is not None:
+            return term_filter == self.extracted_filter and (command or "").strip() == self.command
+        return self.extracted_filter == "all" or term_filter == self.extracted_filter
+    
+    def query(self, term_filter="all", max_terms=None, sort="category"):
+        """(all terms passing the filter, the first max_terms of them) in the given SORT_CHOICES order."""
+        allowed = filter_categories(term_filter)
+        if allowed is None:
+            indexes = range(len(self.terms))
+        else:
+            indexes = sorted(i for category in set(allowed) for i in self.by_category.get(category, ()))
+        terms, counts = self.terms, self.counts
+        if sort == "frequency":
+            indexes = sorted(indexes, key=lambda i: (-counts[i], terms[i]['category'], terms[i]['source']))
+        elif sort == "source":
+            indexes = sorted(indexes, key=lambda i: terms[i]['source'])
+        elif sort != "document":
+            indexes = sorted(indexes, key=lambda i: (terms[i]['category'], terms[i]['source']))
+        filtered = [terms[i] for i in indexes]
+        return filtered, filtered[:max_terms]
@@ -0,0 +1,29 @@
+# Token counting: tiktoken when installed, otherwise a fast character-based estimate.
+
+from .config import TOKENIZER_ENCODING
+
+_encoding = None      # False once tiktoken is known to be unavailable
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception:  # not installed, or the encoding can't be loaded offline
+            _encoding = False
+    return _encoding
+
+def estimate_tokens(text):
+    # CJK characters take 3 bytes in UTF-8 and about one token each;
+    # everything else averages about four characters per token
+    wide = (len(text.encode("utf-8")) - len(text)) // 2
+    return wide + (len(text) - wide + 3) // 4
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
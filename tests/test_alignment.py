@@ -0,0 +1,84 @@
+# Tests for sentence alignment: beads cover both texts in order, and files align as pasted text does.
+
+import random
+
+import pytest
+
+from term_extract.alignment import BEADS, align_segments, align_sentences, iter_beads, length_ratio, pack_beads
+from term_extract.documents import iter_document_pairs
+
+PAIRS = [
+    ("衞生署衞生防護中心今日呼籲市民提高警覺，預防登革熱。",
+     "The Centre for Health Protection of the Department of Health today urged the public to stay alert against dengue fever."),
+    ("漁農自然護理署在郊野公園進行滅蚊工作，使用殺幼蟲劑。",
+     "The Agriculture, Fisheries and Conservation Department carried out mosquito control in country parks using larvicides."),
+    ("二零二四年七月，香港錄得多宗本地登革熱個案。",
+     "In July 2024, Hong Kong recorded several local cases of dengue fever."),
+    ("你有沒有注意到？", "Have you noticed?"),
+    ("截至今日共錄得12宗個案，其中3宗為本地個案。", "So far 12 cases have been recorded, 3 of which are local."),
+]
+
+def parallel(count, seed, drop=0.05):
+    """Source and target sentences, some of each left untranslated, and the 1-1 beads between them."""
+    rng = random.Random(seed)
+    source, target, gold = [], [], set()
+    for _ in range(count):
+        zh, en = rng.choice(PAIRS)
+        r = rng.random()
+        if r < drop:
+            source.append(zh)
+        elif r < 2 * drop:
+            target.append(en)
+        else:
+            source.append(zh)
+            target.append(en)
+            gold.add(((len(source) - 1,), (len(target) - 1,)))
+    return source, target, gold
+
+def assert_covers(beads, n, m):
+    shapes = {(di, dj) for di, dj, _ in BEADS}
+    source = [i for src, _ in beads for i in src]
+    target = [j for _, tgt in beads for j in tgt]
+    assert source == list(range(n)) and target == list(range(m))
+    assert all((len(src), len(tgt)) in shapes for src, tgt in beads)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_beads_cover_both_lists_in_order(seed):
+    rng = random.Random(seed)
+    source = ["字" * rng.randint(1, 60) + "。" for _ in range(rng.randint(0, 80))]
+    target = ["word " * rng.randint(1, 40) for _ in range(rng.randint(0, 80))]
+    assert_covers(align_sentences(source, target, band=rng.randint(1, 12)), len(source), len(target))
+
+@pytest.mark.parametrize("seed", range(3))
+def test_band_finds_the_alignment_of_the_whole_table(seed):
+    # Untranslated sentences move the alignment up to 16 sentences off the diagonal, beyond ALIGN_BAND
+    source, target, gold = parallel(600, seed)
+    beads = align_sentences(source, target)
+    assert beads == align_sentences(source, target, band=80)
+    assert len(set(beads) & gold) / len(gold) > 0.75
+
+def test_windows_cover_the_texts_and_agree_with_one_window():
+    source, target, _ = parallel(600, seed=2)
+    ratio = length_ratio(sum(map(len, source)), sum(map(len, target)))
+    windowed = list(iter_beads(source, target, ratio, window=150))
+    assert [s for src, _ in windowed for s in src] == source
+    assert [t for _, tgt in windowed for t in tgt] == target
+    whole = [([source[i] for i in src], [target[j] for j in tgt]) for src, tgt in align_sentences(source, target)]
+    same = sum(1 for bead in windowed if bead in whole)
+    assert same / len(whole) > 0.95
+
+def test_trailing_target_sentences_join_the_last_segment():
+    beads = [(["甲。"], ["A."]), (["乙。"], ["B."]), ([], ["C."])]
+    assert list(pack_beads(beads, budget=2, pair_budget=4)) == [(["甲。"], ["A."]), (["乙。"], ["B.", "C."])]
+
+def test_files_align_as_pasted_text(tmp_path):
+    source, target, _ = parallel(400, seed=3)
+    source_text = "\n\n".join("".join(source[i:i + 4]) for i in range(0, len(source), 4))
+    target_text = "\n\n".join(" ".join(target[i:i + 5]) for i in range(0, len(target), 5))
+    source_path, target_path = tmp_path / "zh.txt", tmp_path / "en.txt"
+    source_path.write_text(source_text, encoding="utf-8")
+    target_path.write_text(target_text, encoding="utf-8")
+    count, pairs = iter_document_pairs(str(source_path), str(target_path))
+    pairs = list(pairs)
+    assert len(pairs) == count
+    assert pairs == align_segments(source_text, target_text)
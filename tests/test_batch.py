@@ -0,0 +1,98 @@
+# Tests for batch jobs: the checkpoint, and resuming a job after some of its segments failed.
+
+import csv
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from term_extract import batch, llm, memory
+from term_extract.batch import Checkpoint, run_batch
+from term_extract.memory import SentenceMemory
+
+TERMS = [
+    {'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'},
+    {'source': '衛生署', 'target': 'Department of Health', 'category': 'organization'},
+    {'source': '伊蚊', 'target': 'Aedes mosquito', 'category': 'medical'},
+]
+
+class TermsClient:
+    """Answers with the TERMS whose source occurs in the prompt; prompts containing failing fail for good."""
+    
+    def __init__(self, failing=None):
+        self.failing = failing
+        self.calls = 0
+        self.base_url = "http://batch.invalid/v1"
+        self.api_key = "key"
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]['content']
+        if self.failing and self.failing in prompt:
+            raise ValueError("malformed request")
+        content = json.dumps([t for t in TERMS if t['source'] in prompt], ensure_ascii=False)
+        choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")
+        return SimpleNamespace(choices=[choice], usage=None)
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", None)
+    monkeypatch.setattr(memory, "sentence_memory", None)
+    monkeypatch.setattr(batch, "CHUNK_TOKENS", 40)
+
+@pytest.fixture
+def documents(tmp_path):
+    docs = []
+    for n in range(2):
+        path = tmp_path / f"doc{n}.txt"
+        path.write_text("\n\n".join(f"文件{n}第{i}段。登革熱個案增加。衛生署提醒市民清除伊蚊滋生地。" for i in range(5)),
+                        encoding="utf-8")
+        docs.append({'id': f"doc{n}", 'source': str(path), 'target': None})
+    return docs
+
+def sources(merged_path):
+    with open(merged_path, encoding="utf-8", newline="") as f:
+        return sorted(row[0] for row in list(csv.reader(f))[1:])
+
+def test_resumed_job_only_calls_failed_segments(tmp_path, documents):
+    job = str(tmp_path / "job")
+    failing = TermsClient(failing="文件1第2段")
+    first = run_batch(documents, job, client=failing, rate=0)
+    assert first['failed_segments'] == 1 and first['segments'] > 4
+    
+    client = TermsClient()
+    second = run_batch(documents, job, client=client, rate=0)
+    assert client.calls == 1
+    assert second['failed_segments'] == 0
+    assert second['reused_segments'] == second['segments'] - 1
+    
+    fresh = run_batch(documents, str(tmp_path / "fresh"), client=TermsClient(), rate=0)
+    assert sources(second['merged_path']) == sources(fresh['merged_path']) == sorted(t['source'] for t in TERMS)
+
+def test_job_with_sentence_memory_resumes_from_its_checkpoint(tmp_path, documents, monkeypatch):
+    monkeypatch.setattr(memory, "sentence_memory", SentenceMemory(str(tmp_path / "sentences.sqlite3")))
+    job = str(tmp_path / "job")
+    # One call at a time, so later segments recall what earlier ones stored
+    first = run_batch(documents, job, client=TermsClient(), max_in_flight=1, rate=0)
+    assert first['sentence_memory']['recalled']
+    client = TermsClient()
+    second = run_batch(documents, job, client=client, rate=0)
+    assert client.calls == 0 and second['reused_segments'] == second['segments']
+
+def test_checkpoint_drops_a_line_cut_short(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.record("doc", 0, "key0", [TERMS[0]])
+    checkpoint.record("doc", 0, "key0", [TERMS[1]])   # already recorded
+    checkpoint.record("doc", 1, "key1", [TERMS[1]])
+    checkpoint.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"doc": "doc", "segment": 2, "ke')
+    
+    reopened = Checkpoint(path)
+    assert len(reopened) == 2
+    assert reopened.get("key0") == [TERMS[0]] and reopened.get("key2") is None
+    reopened.record("doc", 2, "key2", [TERMS[2]])
+    reopened.close()
+    assert len(Checkpoint(path)) == 3
@@ -0,0 +1,86 @@
+# Tests for cancellation: tokens and budgets, and runs that stop early with the terms found so far.
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from term_extract import llm, pipeline
+from term_extract.cancel import CancelToken, RunCancelled
+from term_extract.extraction import iter_segments
+from term_extract.llm import RateLimiter
+
+def test_budget_ends_as_deadline():
+    token = CancelToken(0.05)
+    assert not token.cancelled and 0 < token.remaining() <= 0.05
+    time.sleep(0.06)
+    assert token.cancelled and token.reason == "deadline" and token.remaining() == 0
+    with pytest.raises(RunCancelled, match="deadline"):
+        token.check()
+
+def test_cancel_keeps_first_reason_and_calls_back_once():
+    token = CancelToken()
+    called = []
+    token.on_cancel(lambda: called.append("early"))
+    token.cancel("stopped")
+    token.cancel("closed")
+    token.on_cancel(lambda: called.append("late"))
+    assert token.reason == "stopped" and called == ["early", "late"]
+    assert token.remaining() is None
+
+def test_sleep_wakes_up_when_cancelled():
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(RunCancelled):
+        token.sleep(5)
+    assert time.monotonic() - start < 1
+
+def test_rate_limiter_wait_ends_with_budget():
+    limiter = RateLimiter(rate=0.1, burst=1)
+    limiter.acquire()
+    start = time.monotonic()
+    with pytest.raises(RunCancelled):
+        limiter.acquire(CancelToken(0.05))
+    assert time.monotonic() - start < 1
+
+def test_cancelled_segments_stop_without_waiting_for_calls():
+    token = CancelToken()
+    release = threading.Event()
+    started = []
+    
+    def extract_fn(src, tgt):
+        started.append(src)
+        if src != "s0":
+            release.wait(5)
+        return [], ""
+    
+    segments = iter_segments([(f"s{i}", "") for i in range(20)], extract_fn, max_in_flight=2,
+                             limiter=RateLimiter(rate=0), cancel=token)
+    assert next(segments)[0] == 0
+    threading.Timer(0.05, token.cancel).start()
+    start = time.monotonic()
+    assert list(segments) == []
+    assert time.monotonic() - start < 1 and len(started) <= 4
+    release.set()
+
+def test_run_out_of_budget_returns_partial_terms(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", None)
+    monkeypatch.setattr(pipeline, "CHUNK_TOKENS", 30)
+    answer = json.dumps([{'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'}])
+    
+    def create(messages, **kwargs):
+        if "第0段" not in messages[-1]['content']:
+            time.sleep(0.5)
+        choice = SimpleNamespace(message=SimpleNamespace(content=answer), finish_reason="stop")
+        return SimpleNamespace(choices=[choice], usage=None)
+    
+    client = SimpleNamespace(base_url="http://cancel.invalid/v1", api_key="key",
+                             chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    text = "\n\n".join(f"第{i}段：登革熱個案增加，市民應清除積水。" for i in range(12))
+    result = pipeline.run_extraction(text, client=client, limiter=RateLimiter(rate=0), cancel=CancelToken(0.25))
+    assert result['partial'] == "deadline"
+    assert 0 < result['segments_done'] < result['segments']
+    assert [t['source'] for t in result['terms']] == ['登革熱']
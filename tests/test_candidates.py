@@ -0,0 +1,38 @@
+# Tests for statistical candidates: ranking whole spans over their fragments, and handing them out to segments.
+
+from term_extract.candidates import CandidateSet, candidate_terms, format_candidates, rank_candidates
+
+LEFT, RIGHT = "甲乙丙丁戊己庚辛", "說指稱表示提醒宣"
+TEXT = "。".join(f"{LEFT[i]}衞生防護中心{RIGHT[i]}登革熱{RIGHT[-i - 1]}增加" for i in range(8))
+
+def test_whole_spans_outrank_their_fragments():
+    ranked = rank_candidates(TEXT)
+    sources = [c['source'] for c in ranked]
+    assert sources[:2] == ["衞生防護中心", "登革熱"]
+    assert not {"衞生防護中", "生防護中心", "登革"} & set(sources)
+    assert ranked[0]['frequency'] == 8 and ranked[0]['entropy'] == 3.0
+    assert all(a['score'] >= b['score'] for a, b in zip(ranked, ranked[1:]))
+
+def test_rare_spans_and_function_characters_are_not_candidates():
+    text = TEXT + "。" + "。".join(f"{LEFT[i]}的消息{RIGHT[i]}" for i in range(8)) + "。罕見病毒"
+    sources = {c['source'] for c in rank_candidates(text)}
+    # "的消息" varies on both sides but starts with 的; "消息" always follows 的
+    assert "罕見病毒" not in sources and "的消息" not in sources and "消息" not in sources
+
+def test_limit_keeps_the_best():
+    assert [c['source'] for c in rank_candidates(TEXT, limit=1)] == ["衞生防護中心"]
+
+def test_each_candidate_goes_with_the_first_segment_it_occurs_in():
+    candidates = rank_candidates(TEXT)[:2]
+    candidate_set = CandidateSet(candidates, context=1)
+    segments = TEXT.split("。")
+    sent = list(candidate_set.segments([(segments[0], "a"), (segments[1], "b"), ("沒有候選", "c")]))
+    assert sent[0] == ("衞生防護中心 | …甲衞生防護中心說…\n登革熱 | …說登革熱宣…", "a")
+    assert sent[1:] == [("", "b"), ("", "c")]
+    assert candidate_set.segments_sent == 1 and len(candidate_set) == 2
+
+def test_candidate_terms_have_no_target():
+    terms = candidate_terms(rank_candidates(TEXT, limit=1))
+    assert terms == [{'source': "衞生防護中心", 'target': "", 'category': "candidate", 'frequency': 8,
+                      'score': terms[0]['score']}]
+    assert format_candidates([]) == ""
@@ -0,0 +1,45 @@
+# Tests for the token chunker: every character kept, every chunk within budget, and overlap between chunks.
+
+import re
+
+import pytest
+
+from term_extract.chunking import iter_paragraphs, iter_token_chunks, token_chunk
+from term_extract.tokens import count_tokens
+
+PARAGRAPHS = [
+    "衞生署今日公布登革熱個案數字。" * 3,
+    "市民應每星期清除積水，" * 40 + "以免伊蚊滋生。",  # one sentence over the budget
+    "Dengue fever is spread by Aedes mosquitoes. Remove stagnant water every week.",
+    "短段。",
+]
+TEXT = "\n\n".join(PARAGRAPHS)
+
+def squeeze(text):
+    return re.sub(r"\s", "", text)
+
+@pytest.mark.parametrize("budget", [8, 30, 100])
+def test_no_text_is_dropped_and_chunks_fit(budget):
+    chunks = token_chunk(TEXT, budget=budget, overlap=0)
+    assert squeeze("".join(chunks)) == squeeze(TEXT)
+    assert all(count_tokens(chunk) <= budget for chunk in chunks)
+
+def test_text_within_budget_is_one_chunk():
+    assert token_chunk(TEXT, budget=10000) == [TEXT]
+    assert token_chunk(" \n\n ") == []
+
+def test_overlap_repeats_the_last_sentences():
+    chunks = token_chunk(PARAGRAPHS[0], budget=20, overlap=10)
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.startswith("衞生署今日公布登革熱個案數字。") and previous.endswith("衞生署今日公布登革熱個案數字。")
+    assert squeeze("".join(token_chunk(PARAGRAPHS[0], budget=20, overlap=0))) == squeeze(PARAGRAPHS[0])
+
+def test_streamed_lines_chunk_like_the_whole_text():
+    lines = (line + "\n" for line in TEXT.split("\n"))
+    assert list(iter_token_chunks(iter_paragraphs(lines), budget=30, overlap=0)) == token_chunk(TEXT, budget=30, overlap=0)
+
+def test_starts_mark_the_first_unit_of_each_chunk():
+    starts = []
+    chunks = token_chunk(TEXT, budget=30, overlap=0, starts=starts)
+    assert len(starts) == len(chunks) and starts[0] == 0 and starts == sorted(set(starts))
@@ -0,0 +1,27 @@
+# Tests for the command line: argument conflicts and what runs without the model.
+
+import subprocess
+import sys
+
+import pytest
+
+from term_extract import llm
+from term_extract.cli import main
+
+def test_stdin_is_read_for_one_input_only(capsys):
+    assert main(["-", "-t", "-"]) == 2
+    assert main(["-", "-"]) == 2
+    assert "stdin" in capsys.readouterr().err
+
+def test_candidates_only_builds_no_client(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(llm, "new_client", lambda *args: pytest.fail("--candidates-only must not build a client"))
+    source = tmp_path / "zh.txt"
+    source.write_text("登革熱病例增加。衛生署呼籲市民防範登革熱。", encoding="utf-8")
+    assert main([str(source), "--candidates-only"]) == 0
+    assert "登革熱" in capsys.readouterr().out
+
+def test_library_and_cli_load_without_the_ui():
+    code = ("import sys, term_extract, term_extract.cli; term_extract.run_extraction; "
+            "print(sorted({'gradio', 'openai'} & set(sys.modules)))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
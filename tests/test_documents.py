@@ -0,0 +1,63 @@
+# Tests for documents on disk: encoding detection, lazy segments, and file runs past the pasted-text cap.
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from term_extract import llm, memory, pipeline
+from term_extract.chunking import token_chunk
+from term_extract.documents import detect_encoding, iter_document_pairs
+
+TEXT = "\n\n".join(f"第{i}段：衛生署提醒市民清除積水，預防登革熱。" for i in range(30))
+
+class CountingClient:
+    def __init__(self):
+        self.prompts = []
+        self.base_url = "http://documents.invalid/v1"
+        self.api_key = "key"
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def create(self, messages, **kwargs):
+        self.prompts.append(messages[-1]['content'])
+        content = json.dumps([{'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'}], ensure_ascii=False)
+        choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")
+        return SimpleNamespace(choices=[choice], usage=None)
+
+@pytest.mark.parametrize("encoding, expected", [
+    ("utf-8-sig", "utf-8-sig"), ("utf-16", "utf-16"), ("big5", "big5"), ("utf-8", "utf-8"),
+])
+def test_encoding_is_detected(tmp_path, encoding, expected):
+    path = tmp_path / "doc.txt"
+    path.write_text(TEXT, encoding=encoding)
+    assert detect_encoding(str(path)) == expected
+
+def test_sample_cut_inside_a_character_is_still_utf8(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_bytes(("a" + "登革熱" * 100).encode("utf-8"))
+    assert detect_encoding(str(path), sample_size=200) == "utf-8"
+
+def test_source_file_is_cut_as_pasted_text(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text(TEXT, encoding="big5")
+    count, pairs = iter_document_pairs(str(path), budget=40, overlap=0)
+    assert list(pairs) == [(s, "") for s in token_chunk(TEXT, budget=40, overlap=0)]
+    assert count == len(token_chunk(TEXT, budget=40, overlap=0))
+
+def test_file_run_reads_past_the_pasted_text_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", None)
+    monkeypatch.setattr(memory, "sentence_memory", None)
+    monkeypatch.setattr(pipeline, "CHUNK_TOKENS", 40)
+    monkeypatch.setattr(pipeline, "MAX_CHARS", 200)
+    path = tmp_path / "doc.txt"
+    path.write_text(TEXT, encoding="utf-8")
+    
+    client = CountingClient()
+    result = pipeline.run_file_extraction(str(path), client=client, limiter=llm.RateLimiter(rate=0))
+    assert any("第29段" in prompt for prompt in client.prompts)
+    assert len(client.prompts) == result['segments'] == len(token_chunk(TEXT, budget=40, overlap=0))
+    
+    pasted = CountingClient()
+    truncated = pipeline.run_extraction(TEXT, client=pasted, limiter=llm.RateLimiter(rate=0))
+    assert not any("第29段" in prompt for prompt in pasted.prompts)
+    assert "truncated" in truncated['debug_log']
@@ -0,0 +1,83 @@
+# Tests for exports: every format from a one-pass iterable, read back as written.
+
+import csv
+import io
+import json
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pytest
+
+from term_extract import export
+from term_extract.export import export_terms, session_export_path, write_terms, write_xlsx
+from term_extract.glossary import load_glossary
+
+TERMS = [
+    {'source': '衛生署', 'target': 'Department of Health', 'category': 'organization'},
+    {'source': '"引號", 逗號', 'target': 'quotes, "commas"\nand lines', 'category': 'general'},
+    {'source': '控制\x0b字元', 'target': 'A & B <tag>\ttab', 'category': 'technical'},
+]
+
+def once(terms):
+    """The terms as a generator, so a writer that read them twice would write nothing the second time."""
+    return (dict(t) for t in terms)
+
+def written(fmt, terms):
+    f = io.StringIO()
+    write_terms(once(terms), fmt, f)
+    return f.getvalue()
+
+@pytest.mark.parametrize("terms", [TERMS, [], [{'source': '登革熱', 'target': 'dengue', 'extra': {'n': [1]}}]])
+def test_json_matches_json_dump(terms):
+    assert written("json", terms) == json.dumps({"terms": terms}, indent=2, ensure_ascii=False)
+
+def test_csv_reads_back_with_quotes_commas_and_line_breaks():
+    rows = list(csv.reader(io.StringIO(written("csv", TERMS))))
+    assert rows[0] == list(export.CSV_HEADER)
+    assert rows[1:] == [[t['source'], t['target'], t['category']] for t in TERMS]
+
+def test_tsv_has_one_line_per_term():
+    lines = written("tsv", TERMS).split("\n")[:-1]
+    assert lines[1] == '"引號", 逗號\tquotes, "commas" and lines'
+    assert len(lines) == len(TERMS) and all(line.count("\t") == 1 for line in lines)
+
+def test_tbx_is_valid_xml_and_loads_as_a_glossary(tmp_path):
+    path = export_terms(once(TERMS), "tbx", str(tmp_path / "terms.tbx"))
+    ET.parse(path)
+    assert [(t['source'], t['target']) for t in load_glossary(path)] == [
+        (t['source'].replace('\x0b', ''), t['target']) for t in TERMS
+    ]
+
+def test_xlsx_sheet_holds_every_term():
+    f = io.BytesIO()
+    write_xlsx(once(TERMS), f)
+    with zipfile.ZipFile(f) as zf:
+        sheet = ET.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+    ns = {'s': "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+    rows = [[t.text for t in row.iterfind(".//s:t", ns)] for row in sheet.iterfind(".//s:row", ns)]
+    assert rows[0] == list(export.CSV_HEADER)
+    assert rows[1:] == [[t['source'].replace('\x0b', ''), t['target'], t['category']] for t in TERMS]
+
+def test_xlsx_refuses_more_rows_than_a_sheet_holds(monkeypatch):
+    monkeypatch.setattr(export, "XLSX_MAX_ROWS", 3)
+    with pytest.raises(ValueError, match="XLSX"):
+        write_xlsx(once(TERMS), io.BytesIO())
+
+def test_csv_file_starts_with_a_bom(tmp_path):
+    path = export_terms(TERMS, "csv", str(tmp_path / "terms.csv"))
+    with open(path, "rb") as f:
+        assert f.read(3) == b"\xef\xbb\xbf"
+
+def test_unknown_and_binary_formats_are_refused():
+    with pytest.raises(ValueError, match="binary"):
+        write_terms(TERMS, "xlsx", io.StringIO())
+    with pytest.raises(ValueError, match="Unknown"):
+        write_terms(TERMS, "doc", io.StringIO())
+
+def test_sessions_get_their_own_export_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    first, second = session_export_path("abc", "csv"), session_export_path("../xyz", "csv")
+    assert first == os.path.join(str(tmp_path), "abc", "terms.csv")
+    assert second == os.path.join(str(tmp_path), "xyz", "terms.csv")
+    assert session_export_path(None, "csv") != session_export_path(None, "csv")
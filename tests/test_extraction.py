@@ -0,0 +1,92 @@
+# Tests for running segments: concurrency and the window, cached and failed segments, early close, rate limiting.
+
+import threading
+import time
+
+from term_extract.extraction import iter_segments, run_segments
+from term_extract.llm import RateLimiter
+
+def unlimited():
+    return RateLimiter(rate=0)
+
+class Tracker:
+    """extract_fn that records how many calls run at once; each call waits for release, if given."""
+    
+    def __init__(self, release=None, fail=()):
+        self.release = release
+        self.fail = set(fail)
+        self.running = 0
+        self.most = 0
+        self.started = []
+        self.lock = threading.Lock()
+    
+    def __call__(self, src, tgt):
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+            self.started.append(src)
+        try:
+            if self.release is not None:
+                self.release.wait(5)
+            else:
+                time.sleep(0.01)
+            if src in self.fail:
+                raise ValueError(f"bad segment {src}")
+            return [{'source': src}], f"raw {src}"
+        finally:
+            with self.lock:
+                self.running -= 1
+
+def test_results_come_back_in_segment_order_within_the_limit():
+    pairs = [(f"s{i}", "") for i in range(20)]
+    tracker = Tracker()
+    results = run_segments(pairs, tracker, max_in_flight=3, limiter=unlimited())
+    assert results == [([{'source': f"s{i}"}], f"raw s{i}") for i in range(20)]
+    assert 1 < tracker.most <= 3
+
+def test_lazy_pairs_are_pulled_a_window_ahead():
+    pulled = []
+    
+    def pairs():
+        for i in range(50):
+            pulled.append(i)
+            yield f"s{i}", ""
+    
+    release = threading.Event()
+    segments = iter_segments(pairs(), Tracker(release), max_in_flight=2, limiter=unlimited())
+    first = threading.Thread(target=next, args=(segments,))
+    first.start()
+    time.sleep(0.1)
+    assert len(pulled) == 4
+    release.set()
+    first.join()
+    assert len(list(segments)) == 49 and len(pulled) == 50
+
+def test_failed_and_cached_segments():
+    pairs = [(f"s{i}", "") for i in range(6)]
+    tracker = Tracker(fail={"s2"})
+    done = {}
+    for i, pair, result, error in iter_segments(pairs, tracker, max_in_flight=2, limiter=unlimited(),
+                                                cached=lambda src, tgt: ([], "memo") if src == "s4" else None):
+        done[i] = (pair, result, error)
+    assert sorted(done) == list(range(6))
+    assert "s4" not in tracker.started
+    assert done[4][1] == ([], "memo") and done[4][2] is None
+    assert isinstance(done[2][2], ValueError) and done[2][1] == ([], "bad segment s2")
+
+def test_closing_early_drops_queued_segments():
+    release = threading.Event()
+    tracker = Tracker(release)
+    segments = iter_segments([(f"s{i}", "") for i in range(40)], tracker, max_in_flight=2, limiter=unlimited())
+    release.set()
+    next(segments)
+    segments.close()
+    time.sleep(0.1)
+    assert len(tracker.started) <= 6
+
+def test_rate_limiter_spaces_calls_after_the_burst():
+    limiter = RateLimiter(rate=20, burst=2)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert 0.17 <= time.monotonic() - start < 0.5
@@ -0,0 +1,72 @@
+# Tests for glossaries: Aho-Corasick matching, loading termbase exports, and known terms in extraction.
+
+import pytest
+
+from term_extract import pipeline
+from term_extract.glossary import Automaton, Glossary, load_glossary, verify_targets
+
+def test_model_variants_of_known_terms_are_dropped(monkeypatch):
+    glossary = Glossary([{'source': '衛生署', 'target': 'Department of Health', 'category': 'organization'}])
+    answered = [
+        {'source': '卫生署', 'target': 'Department of Health', 'category': 'organization'},
+        {'source': '衛生 署', 'target': 'Health Department', 'category': 'organization'},
+        {'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'},
+    ]
+    monkeypatch.setattr(pipeline, "extract_chunk", lambda *args: ([dict(t) for t in answered], "[]"))
+    extract_fn = pipeline.segment_extractor(False, "", "all", client=None, glossary=glossary)
+    terms, _ = extract_fn("衛生署呼籲市民防範登革熱。", "")
+    assert [t['source'] for t in terms] == ['衛生署', '登革熱']
+    assert terms[0]['target'] == 'Department of Health'
+
+def test_overlapping_and_nested_keys_all_match():
+    automaton = Automaton(["衛生", "衛生署", "生署", "署長", "", "DoH"])
+    matches = sorted(automaton.iter_matches("衛生署署長與doh"))
+    assert matches == [(0, 2, 0), (0, 3, 1), (1, 3, 2), (3, 5, 3), (6, 9, 5)]
+    assert automaton.found("生署署長") == {2, 3}
+    assert automaton.found("") == set()
+
+def test_matches_agree_with_a_naive_scan():
+    keys = ["ab", "bab", "abab", "b", "bb", "aab"]
+    automaton = Automaton(keys)
+    text = "abababbaabbab"
+    naive = sorted((i, i + len(k), n) for n, k in enumerate(keys)
+                   for i in range(len(text)) if text.startswith(k, i))
+    assert sorted(automaton.iter_matches(text)) == naive
+
+def test_glossary_lists_known_terms_in_first_occurrence_order():
+    glossary = Glossary([
+        {'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'},
+        {'source': '衛生署', 'target': 'Department of Health', 'category': 'organization'},
+        {'source': '衛生', 'target': 'health'},
+        {'source': '署', 'target': 'too short'},
+        {'source': '伊蚊', 'target': ''},
+    ])
+    assert len(glossary) == 3
+    found = glossary.match("衛生署提醒：登革熱由伊蚊傳播，衛生署會跟進。")
+    assert [t['source'] for t in found] == ['衛生', '衛生署', '登革熱']
+    assert found[0]['category'] == 'general'
+
+def test_targets_are_verified_in_one_scan():
+    terms = [{'source': '登革熱', 'target': 'Dengue Fever'}, {'source': '伊蚊', 'target': 'Aedes'}]
+    verified, unverified = verify_targets(terms, "Cases of dengue fever rose.")
+    assert verified == terms[:1] and unverified == terms[1:]
+    assert verify_targets(terms, "") == (terms, [])
+
+@pytest.mark.parametrize("name, content", [
+    ("glossary.csv", "source,target,category\n衛生署,Department of Health,organization\n"),
+    ("glossary.tsv", "衛生署\tDepartment of Health\torganization\n"),
+    ("glossary.json", '{"terms": [{"source": "衛生署", "target": "Department of Health", '
+                      '"category": "organization"}]}'),
+])
+def test_termbase_exports_load(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    assert load_glossary(str(path)) == [
+        {'source': '衛生署', 'target': 'Department of Health', 'category': 'organization'},
+    ]
+
+def test_malformed_glossary_raises_value_error(tmp_path):
+    path = tmp_path / "glossary.tbx"
+    path.write_text("<martif><termEntry>", encoding="utf-8")
+    with pytest.raises(ValueError, match="glossary.tbx"):
+        load_glossary(str(path))
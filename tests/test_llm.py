@@ -0,0 +1,212 @@
+# Tests for model calls: the circuit breaker, how chat_completion settles it, the cache and coalesced calls.
+
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from term_extract import extraction, llm
+from term_extract.cancel import CancelToken, RunCancelled
+from term_extract.llm import AdaptiveConcurrency, CircuitBreaker, LLMCallError, breaker_for, chat_completion
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+
+class FakeClient:
+    """
+    Answers chat.completions.create with the given outcomes in turn: text,
+    (text, finish_reason), or an exception to raise.
+    """
+    
+    def __init__(self, *outcomes, api_key="key"):
+        self.outcomes = list(outcomes)
+        self.base_url = f"http://{uuid.uuid4().hex}.invalid/v1"
+        self.api_key = api_key
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def create(self, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        content, finish_reason = outcome if isinstance(outcome, tuple) else (outcome, "stop")
+        choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)
+        return SimpleNamespace(choices=[choice], usage=None)
+
+@pytest.fixture(autouse=True)
+def no_cache_or_backoff(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", None)
+    monkeypatch.setattr(llm, "backoff_delay", lambda attempt: 0.0)
+
+def open_breaker(client, cooldown):
+    breaker = breaker_for(client)
+    breaker.cooldown = cooldown
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+    return breaker
+
+def test_breaker_opens_after_threshold_and_closes_after_trial():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_failed_trial_restarts_cooldown():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+def test_abandon_only_returns_own_trial():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    other = threading.Thread(target=breaker.abandon)
+    other.start()
+    other.join()
+    assert not breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+def test_cancelled_trial_call_gives_trial_back():
+    client = FakeClient(RunCancelled("run cancelled"))
+    breaker = open_breaker(client, cooldown=0)
+    with pytest.raises(RunCancelled):
+        chat_completion(client, "system", "prompt")
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+
+def test_slot_timeout_does_not_take_trial(monkeypatch):
+    monkeypatch.setattr(llm, "CALL_DEADLINE", 0.1)
+    client = FakeClient()
+    breaker = open_breaker(client, cooldown=0)
+    concurrency = AdaptiveConcurrency(1)
+    assert concurrency.acquire()
+    with pytest.raises(LLMCallError, match="call slot"):
+        chat_completion(client, "system", "prompt", concurrency=concurrency)
+    assert client.calls == 0
+    assert breaker.allow()
+
+def test_429s_do_not_open_breaker():
+    client = FakeClient(*[StatusError(429)] * (3 * llm.RETRY_ATTEMPTS), "[]")
+    for _ in range(3):
+        with pytest.raises(LLMCallError, match="after"):
+            chat_completion(client, "system", "prompt")
+    assert breaker_for(client).state == "closed"
+    assert chat_completion(client, "system", "prompt") == "[]"
+
+def test_server_errors_open_breaker_of_that_endpoint_and_token_only(monkeypatch):
+    monkeypatch.setattr(llm, "CALL_DEADLINE", 1)
+    client = FakeClient(*[StatusError(503)] * 8)
+    for _ in range(2):
+        with pytest.raises(LLMCallError):
+            chat_completion(client, "system", "prompt")
+    assert breaker_for(client).state == "open"
+    other_token = FakeClient("[]", api_key="other")
+    other_token.base_url = client.base_url
+    assert breaker_for(other_token).state == "closed"
+    assert chat_completion(other_token, "system", "prompt") == "[]"
+
+def test_call_waits_out_cooldown_within_deadline():
+    client = FakeClient("[]")
+    open_breaker(client, cooldown=0.2)
+    start = time.monotonic()
+    assert chat_completion(client, "system", "prompt") == "[]"
+    assert time.monotonic() - start >= 0.15
+    assert breaker_for(client).state == "closed"
+
+def test_open_breaker_past_deadline_fails_the_call(monkeypatch):
+    monkeypatch.setattr(llm, "CALL_DEADLINE", 0.1)
+    client = FakeClient("[]")
+    open_breaker(client, cooldown=5)
+    with pytest.raises(llm.CircuitOpenError):
+        chat_completion(client, "system", "prompt")
+    assert client.calls == 0
+
+def test_wait_for_breaker_ends_with_cancel():
+    client = FakeClient("[]")
+    open_breaker(client, cooldown=5)
+    with pytest.raises(RunCancelled):
+        chat_completion(client, "system", "prompt", cancel=CancelToken(0.1))
+
+def test_single_flight_follower_stops_waiting_when_cancelled():
+    flight = llm.SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("key", release.wait))
+    leader.start()
+    while not flight.in_flight():
+        time.sleep(0.01)
+    with pytest.raises(RunCancelled):
+        flight.do("key", lambda: pytest.fail("a follower must not call"), CancelToken(0.1))
+    release.set()
+    leader.join()
+    assert flight.shared == 1
+
+def test_identical_prompts_coalesce_per_token(monkeypatch):
+    monkeypatch.setattr(extraction, "COALESCE_CALLS", True)
+    monkeypatch.setattr(extraction, "STREAM_RESPONSES", False)
+    release = threading.Event()
+    answer = '[{"source": "登革熱", "target": "dengue fever", "category": "medical"}]'
+    
+    class SlowClient(FakeClient):
+        def create(self, **kwargs):
+            release.wait(5)
+            return super().create(**kwargs)
+    
+    first = SlowClient(answer, api_key="one")
+    same = SlowClient(answer, api_key="one")
+    same.base_url = first.base_url
+    other = SlowClient(answer, api_key="two")
+    other.base_url = first.base_url
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(extraction._complete(c, "system", "prompt")))
+               for c in (first, same, other)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert first.calls + same.calls == 1 and other.calls == 1
+    assert [terms for terms, _ in results] == [[{'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'}]] * 3
+
+def test_pool_never_evicts_clients_in_use(monkeypatch):
+    closed = []
+    monkeypatch.setattr(llm, "new_client", lambda token, base_url: SimpleNamespace(close=lambda: closed.append(token)))
+    pool = llm.ClientPool(idle_ttl=0.05)
+    pinned = pool.get("pinned")
+    with pool.lease("idle"):
+        pass
+    with pool.lease("leased") as leased:
+        time.sleep(0.1)
+        pool.get("other")
+        assert closed == ["idle"]
+        with pool.lease("leased") as again:
+            assert again is leased
+    time.sleep(0.1)
+    assert pool.get("pinned") is pinned
+    assert closed == ["idle", "leased"]
+
+def test_only_whole_answers_are_cached(monkeypatch, tmp_path):
+    monkeypatch.setattr(extraction, "STREAM_RESPONSES", False)
+    monkeypatch.setattr(llm, "response_cache", llm.ResponseCache(str(tmp_path / "cache.sqlite3")))
+    answer = '[{"source": "登革熱", "target": "dengue fever", "category": "medical"}]'
+    client = FakeClient((answer[:-2], "length"), "Sorry, I cannot help with that.", answer)
+    for _ in range(3):
+        extraction._call_and_parse(client, "system", "prompt")
+        assert llm.response_cache.size() == (client.calls == 3)
+    terms, content = extraction._call_and_parse(client, "system", "prompt")
+    assert client.calls == 3 and content == answer and [t['source'] for t in terms] == ["登革熱"]
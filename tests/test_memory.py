@@ -0,0 +1,110 @@
+# Tests for the sentence memory: what a run stores, when a stored sentence is recalled, and re-runs.
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from term_extract import llm, memory, pipeline
+from term_extract.incremental import SegmentMemo
+from term_extract.memory import SentenceMemory
+
+CONTEXT = ["STANDARD", "", "all"]
+SOURCE = "登革熱病例增加。衛生局呼籲民眾清除積水。噴灑殺幼蟲劑。"
+TERMS = [
+    {'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'},
+    {'source': '衛生局', 'target': 'Department of Health', 'category': 'organization'},
+    {'source': '殺幼蟲劑', 'target': 'larvicide', 'category': 'chemical'},
+]
+
+@pytest.fixture
+def store(tmp_path):
+    return SentenceMemory(str(tmp_path / "sentences.sqlite3"))
+
+def answer(terms):
+    return json.dumps(terms, ensure_ascii=False)
+
+def run(store, answers, source=SOURCE, target="", term_cap=None):
+    """Run one segment through a recall: (source sent to the model, final terms)."""
+    recall = store.recall(CONTEXT, learn=True, term_cap=term_cap)
+    sent = []
+    
+    def extract_fn(src, tgt):
+        sent.append(src)
+        raw = answers.pop(0)
+        return [t for t in TERMS if t['source'] in src and t['source'] in raw], raw
+    
+    extract_fn = recall.learning(extract_fn)
+    (src, tgt), = recall.segments([(source, target)])
+    terms, _ = extract_fn(src, tgt) if src else ([], "")
+    return (sent[0] if sent else None), recall.complete(0, terms)
+
+def test_complete_answer_is_recalled(store):
+    run(store, [answer(TERMS)])
+    sent, terms = run(store, [])
+    assert sent is None
+    assert {t['source'] for t in terms} == {'登革熱', '衛生局', '殺幼蟲劑'}
+
+def test_truncated_answer_is_not_stored(store):
+    run(store, [answer(TERMS)[:-40]])
+    assert store.size() == 0
+    sent, terms = run(store, [answer(TERMS)])
+    assert sent == SOURCE
+    assert {t['source'] for t in terms} == {'登革熱', '衛生局', '殺幼蟲劑'}
+
+def test_answer_without_array_is_not_stored(store):
+    run(store, ["Sorry, I cannot help with that."])
+    assert store.size() == 0
+
+def test_answer_at_term_cap_is_not_stored(store):
+    run(store, [answer(TERMS[:2])], term_cap=2)
+    assert store.size() == 0
+    run(store, [answer(TERMS[:2])], term_cap=3)
+    assert store.size() == 2
+
+def test_sentence_without_terms_is_sent_again(store):
+    run(store, [answer(TERMS[:1])])
+    sent, terms = run(store, [answer(TERMS[1:])])
+    assert sent == "衛生局呼籲民眾清除積水。噴灑殺幼蟲劑。"
+    assert [t['source'] for t in terms] == ['登革熱', '衛生局', '殺幼蟲劑']
+
+def test_sentence_stored_without_terms_is_not_covered(store):
+    recall = store.recall(CONTEXT, learn=True)
+    keys = recall._keys(["登革熱病例增加。"], "")
+    store.store([(key, []) for key in keys.values()])
+    src, recalled = recall.take_out("登革熱病例增加。", "")
+    assert src == "登革熱病例增加。" and recalled == []
+
+def test_stored_targets_must_occur_in_translation(store):
+    run(store, [answer(TERMS)], target="Dengue fever cases rose. Spray larvicide. Department of Health")
+    sent, _ = run(store, [answer(TERMS)], target="Dengue fever cases rose. The Department of Health asks.")
+    assert sent == "噴灑殺幼蟲劑。"
+
+class TermsClient:
+    """Answers every call with the TERMS whose source occurs in the prompt, and counts the calls."""
+    
+    def __init__(self):
+        self.calls = 0
+        self.base_url = "http://memory.invalid/v1"
+        self.api_key = "key"
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        content = answer([t for t in TERMS if t['source'] in messages[-1]['content']])
+        choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")
+        return SimpleNamespace(choices=[choice], usage=None)
+
+def test_rerun_is_served_from_the_segment_memo(store, monkeypatch):
+    monkeypatch.setattr(memory, "sentence_memory", store)
+    monkeypatch.setattr(llm, "response_cache", None)
+    monkeypatch.setattr(pipeline, "CHUNK_TOKENS", 60)
+    text = "\n\n".join(f"第{i}段：{SOURCE}今日天氣晴朗。" for i in range(8))
+    client, memo = TermsClient(), SegmentMemo()
+    first = pipeline.run_extraction(text, client=client, memo=memo)
+    assert first['segments'] > 1 and first['sentence_memory']['recalled']
+    calls = client.calls
+    second = pipeline.run_extraction(text, client=client, memo=memo)
+    assert client.calls == calls
+    assert second['reused_segments'] == second['segments']
+    assert second['terms'] == first['terms']
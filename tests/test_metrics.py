@@ -0,0 +1,89 @@
+# Tests for instrumentation: spans and their summary, the trace file, and the Prometheus registry and endpoint.
+
+import json
+import urllib.request
+
+import pytest
+
+from term_extract import metrics
+from term_extract.metrics import Recorder, Registry, start_metrics_server
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    return registry
+
+def test_span_records_attributes_and_errors():
+    recorder = Recorder(run_id="run1", trace_path="", textfile="")
+    with recorder.span("parse", segment=3) as attrs:
+        attrs["terms"] = 5
+    with pytest.raises(KeyError):
+        with recorder.span("validate"):
+            raise KeyError("term")
+    parse, validate = recorder.spans
+    assert parse["run"] == "run1" and parse["segment"] == 3 and parse["terms"] == 5 and parse["seconds"] >= 0
+    assert validate["error"] == "KeyError"
+
+def test_summary_sums_tokens_retries_and_coalesced_calls():
+    recorder = Recorder(trace_path="", textfile="")
+    recorder.add("llm.call", 1.0, prompt_tokens=100, completion_tokens=20, cached_tokens=60)
+    recorder.add("llm.call", 2.0, attempt=2, prompt_tokens=50)
+    recorder.add("llm.call", 0.5, coalesced=True)
+    recorder.add("llm.call", 0.0, attempt=3, error="CircuitOpen")
+    calls = recorder.summary()["llm.call"]
+    assert calls == {"count": 4, "seconds": 3.5, "prompt_tokens": 150, "completion_tokens": 20,
+                     "cached_tokens": 60, "retries": 1, "coalesced": 1}
+    assert "llm.call" in recorder.format_summary()
+
+def test_timed_iter_records_one_span_when_closed_early():
+    recorder = Recorder(trace_path="", textfile="")
+    items = recorder.timed_iter("chunking", iter(range(10)))
+    assert [next(items) for _ in range(3)] == [0, 1, 2]
+    items.close()
+    assert [(s["span"], s["items"]) for s in recorder.spans] == [("chunking", 3)]
+
+def test_flush_writes_each_span_once(tmp_path, registry):
+    trace, textfile = tmp_path / "trace.jsonl", tmp_path / "metrics.prom"
+    recorder = Recorder(trace_path=str(trace), textfile=str(textfile))
+    recorder.add("segment", 0.2, segment=0)
+    recorder.flush()
+    recorder.add("segment", 0.3, segment=1)
+    recorder.flush()
+    recorder.flush()
+    lines = [json.loads(line) for line in trace.read_text(encoding="utf-8").splitlines()]
+    assert [r["segment"] for r in lines] == [0, 1]
+    assert 'term_extract_span_seconds_count{span="segment"} 2' in textfile.read_text(encoding="utf-8")
+
+def test_registry_renders_cumulative_buckets_and_call_outcomes(registry):
+    for record in [
+        {"span": "llm.call", "seconds": 0.3, "prompt_tokens": 10},
+        {"span": "llm.call", "seconds": 2.0, "attempt": 2, "cached": True},
+        {"span": "llm.call", "seconds": 0.0, "error": "CircuitOpen", "attempt": 2},
+        {"span": "llm.call", "seconds": 0.1, "error": "LLMCallError"},
+        {"span": "llm.call", "seconds": 0.1, "coalesced": True, "stopped_early": True},
+    ]:
+        registry.observe(record)
+    text = registry.render()
+    assert 'term_extract_span_seconds_bucket{span="llm.call",le="0.1"} 3' in text
+    assert 'term_extract_span_seconds_bucket{span="llm.call",le="0.5"} 4' in text
+    assert 'term_extract_span_seconds_bucket{span="llm.call",le="+Inf"} 5' in text
+    for outcome in ("ok", "cache_hit", "circuit_open", "error", "coalesced"):
+        assert f'term_extract_llm_calls_total{{outcome="{outcome}"}} 1' in text
+    assert "term_extract_llm_retries_total 1" in text
+    assert "term_extract_llm_stopped_early_total 1" in text
+    assert 'term_extract_llm_tokens_total{kind="prompt"} 10' in text
+    assert text.count("# TYPE term_extract_llm_calls_total counter") == 1
+
+def test_metrics_endpoint_serves_the_registry(registry):
+    registry.inc("term_extract_runs_total")
+    server = start_metrics_server(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert "term_extract_runs_total 1" in response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
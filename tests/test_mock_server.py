@@ -0,0 +1,45 @@
+# Tests for the benchmarks' mock endpoint, driven through the real OpenAI client as the benchmarks drive it.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+from mock_server import CANNED_TERMS, MockServer, parse_latency
+
+from term_extract import llm, memory, pipeline
+
+TEXT = "\n\n".join(f"第{i}段：衞生防護中心呼籲市民預防登革熱，漁護署在郊野公園使用殺幼蟲劑。" for i in range(6))
+
+@pytest.fixture(autouse=True)
+def no_stores(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", None)
+    monkeypatch.setattr(memory, "sentence_memory", None)
+    monkeypatch.setattr(pipeline, "CHUNK_TOKENS", 40)
+
+def run(server):
+    client = llm.new_client("key", server.url)
+    try:
+        return pipeline.run_extraction(TEXT, client=client, limiter=llm.RateLimiter(rate=0))
+    finally:
+        client.close()
+
+def test_run_retries_past_injected_rate_limits():
+    with MockServer(rate_limit=0.3, retry_after=0.01, seed=1) as server:
+        result = run(server)
+    assert server.stats["rate_limited"] > 0
+    assert server.stats["ok"] == result['segments'] > 1
+    assert {t['source'] for t in CANNED_TERMS} <= {t['source'] for t in result['terms']}
+    assert result['tokens']['prompt'] > 0
+
+def test_prefix_cache_reports_the_shared_instructions():
+    with MockServer(prefix_cache=64) as server:
+        result = run(server)
+    assert 0 < result['tokens']['cached'] < result['tokens']['prompt']
+
+def test_latency_specs():
+    assert parse_latency("fixed:0.2")(None) == 0.2
+    with pytest.raises(ValueError):
+        parse_latency("gaussian:1")
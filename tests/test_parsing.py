@@ -0,0 +1,57 @@
+# Tests for the term parser: however a response is split, streaming gives what parsing it whole does.
+
+import json
+import random
+
+import pytest
+
+from term_extract.parsing import TermStreamParser, complete_answer, parse_terms
+
+TERMS = [
+    {'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'},
+    {'source': '衛生局', 'target': 'Department of "Health"', 'category': 'organization'},
+    {'source': '殺幼蟲劑', 'target': 'larvicide \\ [spray] {x}', 'category': 'chemical'},
+]
+ARRAY = json.dumps(TERMS, ensure_ascii=False, indent=1)
+
+# (response, how many of TERMS it gives)
+RESPONSES = [
+    (ARRAY, 3),
+    (json.dumps(TERMS, ensure_ascii=True), 3),
+    (f"Here are the terms:\n```json\n{ARRAY}\n```\nLet me know if [you] need more.", 3),
+    (json.dumps({'terms': TERMS}, ensure_ascii=False), 3),
+    (ARRAY.replace('"dengue fever"', '"dengue fever",,'), 2),   # one object that is not valid JSON
+    (ARRAY[:-30], 2),                                          # cut short inside the last object
+    ("Sorry, I cannot help with that.", 0),
+]
+
+def feed_in_pieces(text, cuts):
+    parser = TermStreamParser()
+    streamed = []
+    start = 0
+    for cut in sorted(cuts) + [len(text)]:
+        streamed.extend(parser.feed(text[start:cut]))
+        start = cut
+    return parser, streamed
+
+@pytest.mark.parametrize("response, count", RESPONSES)
+def test_every_split_parses_as_the_whole_response(response, count):
+    whole = parse_terms(response)
+    assert len(whole) == count
+    rng = random.Random(response)
+    splits = [[i] for i in range(len(response) + 1)]
+    splits += [rng.sample(range(len(response) + 1), rng.randint(2, 12)) for _ in range(200)]
+    for cuts in splits:
+        parser, streamed = feed_in_pieces(response, cuts)
+        assert streamed == whole and parser.close() == whole
+        assert parser.complete == complete_answer(response)
+
+def test_one_character_at_a_time():
+    parser, streamed = feed_in_pieces(ARRAY, range(len(ARRAY)))
+    assert streamed == TERMS and parser.complete
+
+def test_complete_only_once_the_array_closes():
+    assert complete_answer(ARRAY)
+    assert not complete_answer(ARRAY[:-1])
+    assert not complete_answer("Sorry, I cannot help with that.")
+    assert not complete_answer("")
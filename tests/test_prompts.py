@@ -0,0 +1,50 @@
+# Tests for prompt templates: a prefix that stays the same across segments, token counts, and fitting the target.
+
+import pytest
+
+from term_extract.prompts import candidate_template, custom_template, standard_template
+from term_extract.tokens import count_tokens
+
+SOURCE = "衞生署今日提醒市民清除積水，預防登革熱。"
+TARGET = "The Department of Health reminded the public today. Stagnant water should be removed. Dengue fever can be prevented."
+KNOWN = [{'source': '衞生署', 'target': 'Department of Health'}]
+
+TEMPLATES = [
+    lambda bilingual: standard_template("medical", "all", bilingual),
+    lambda bilingual: custom_template("Only extract diseases", bilingual),
+    lambda bilingual: candidate_template("", bilingual),
+]
+
+@pytest.mark.parametrize("make", TEMPLATES)
+@pytest.mark.parametrize("bilingual", [True, False])
+def test_segments_share_the_instruction_prefix(make, bilingual):
+    template = make(bilingual)
+    first, _ = template.render(SOURCE, TARGET if bilingual else "", KNOWN)
+    second, _ = template.render("伊蚊在積水中繁殖。", "Aedes mosquitoes breed in stagnant water." if bilingual else "")
+    assert first.startswith(template.instructions + "\n\n") and second.startswith(template.instructions + "\n\n")
+    assert "衞生署" not in template.instructions and "衞生署" not in template.system
+    assert make(bilingual) is template
+
+@pytest.mark.parametrize("make", TEMPLATES)
+def test_counted_tokens_match_the_prompt_sent(make):
+    template = make(True)
+    prompt, tokens = template.render(SOURCE, TARGET, KNOWN)
+    assert abs(tokens - (count_tokens(template.system) + count_tokens(prompt))) <= 4
+    assert template.prefix_tokens == count_tokens(template.system) + count_tokens(template.instructions)
+
+def test_target_is_cut_at_sentence_ends_to_fit_the_budget():
+    template = standard_template("", "all", True)
+    budget = count_tokens(SOURCE) + count_tokens("The Department of Health reminded the public today. ") + 2
+    prompt, _ = template.render(SOURCE, TARGET, budget=budget)
+    assert SOURCE in prompt
+    assert "<target_english>\nThe Department of Health reminded the public today.\n</target_english>" in prompt
+    whole, _ = template.render(SOURCE, TARGET)
+    assert TARGET in whole
+
+def test_known_terms_come_after_the_prefix():
+    template = standard_template("", "all", False)
+    prompt, tokens = template.render(SOURCE, known_terms=KNOWN)
+    _, plain_tokens = template.render(SOURCE)
+    skip = prompt[len(template.instructions):prompt.index("<chinese_text>")]
+    assert "Skip these terms, they are already in the glossary: 衞生署" in skip
+    assert tokens > plain_tokens
@@ -0,0 +1,119 @@
+# Tests for the fair scheduler: fair shares between sessions, per-token caps, the queue limit and closing a run.
+
+import threading
+import time
+
+import pytest
+
+from term_extract.scheduler import FairScheduler, QueueFullError, SegmentCancelled
+
+def wait_until(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.005)
+
+def queue_segments(lane, name, count, order):
+    def call():
+        with lane.slot():
+            order.append(name)
+            time.sleep(0.005)
+    
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def hold_slot(lane):
+    """Take a slot of lane on another thread until the returned event is set."""
+    held, release = threading.Event(), threading.Event()
+    
+    def call():
+        with lane.slot():
+            held.set()
+            release.wait(5)
+    
+    thread = threading.Thread(target=call)
+    thread.start()
+    held.wait(5)
+    return release, thread
+
+def test_short_run_is_served_between_the_segments_of_a_long_one():
+    scheduler = FairScheduler(max_in_flight=1)
+    order = []
+    long_run = scheduler.open("long", "", 15)
+    release, holder = hold_slot(long_run)
+    threads = queue_segments(long_run, "long", 14, order)
+    wait_until(lambda: scheduler.snapshot()["waiting"] == 14)
+    short_run = scheduler.open("short", "", 2)
+    threads += queue_segments(short_run, "short", 2, order)
+    wait_until(lambda: scheduler.snapshot()["waiting"] == 16)
+    release.set()
+    for thread in threads + [holder]:
+        thread.join()
+    assert order.count("short") == 2
+    assert max(i for i, name in enumerate(order) if name == "short") < 4
+
+def test_token_session_gets_its_weight():
+    scheduler = FairScheduler(max_in_flight=1, token_weight=2)
+    order = []
+    anonymous = scheduler.open("anonymous", "", 13)
+    release, holder = hold_slot(anonymous)
+    threads = queue_segments(anonymous, "anonymous", 12, order)
+    with_token = scheduler.open("token", "secret", 12)
+    threads += queue_segments(with_token, "token", 12, order)
+    wait_until(lambda: scheduler.snapshot()["waiting"] == 24)
+    release.set()
+    for thread in threads + [holder]:
+        thread.join()
+    assert 7 <= order[:12].count("token") <= 9
+
+def test_anonymous_sessions_share_their_cap():
+    scheduler = FairScheduler(max_in_flight=4, anon_in_flight=1)
+    first, second = scheduler.open("a", "", 1), scheduler.open("b", "", 1)
+    release, holder = hold_slot(first)
+    order = []
+    threads = queue_segments(second, "b", 1, order)
+    time.sleep(0.05)
+    assert order == [] and scheduler.snapshot()["running"] == 1
+    release.set()
+    for thread in threads + [holder]:
+        thread.join()
+    assert order == ["b"]
+
+def test_queue_limit_turns_runs_away_only_when_busy():
+    scheduler = FairScheduler(queue_limit=10)
+    big = scheduler.open("a", "", 25)
+    with pytest.raises(QueueFullError) as raised:
+        scheduler.open("b", "", 1)
+    assert raised.value.wait > 0 and scheduler.snapshot()["rejected"] == 1
+    big.close()
+    scheduler.open("b", "", 25).close()
+    assert scheduler.snapshot()["backlog"] == 0
+
+def test_closing_a_run_releases_its_queued_segments():
+    scheduler = FairScheduler(max_in_flight=1)
+    lane = scheduler.open("a", "", 3)
+    release, holder = hold_slot(lane)
+    errors = []
+    
+    def call():
+        try:
+            with lane.slot():
+                pass
+        except SegmentCancelled as e:
+            errors.append(e)
+    
+    waiting = [threading.Thread(target=call) for _ in range(2)]
+    for thread in waiting:
+        thread.start()
+    wait_until(lambda: scheduler.snapshot()["waiting"] == 2)
+    lane.close()
+    for thread in waiting:
+        thread.join(5)
+    assert len(errors) == 2
+    release.set()
+    holder.join()
+    assert dict(scheduler.snapshot(), service=0) == {
+        "running": 0, "waiting": 0, "sessions": 0, "backlog": 0, "granted": 1, "rejected": 0, "service": 0,
+    }
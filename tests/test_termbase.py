@@ -0,0 +1,65 @@
+# Tests for the termbase: variant keys, target voting and upgrading an earlier file.
+
+import sqlite3
+
+import pytest
+
+from term_extract.termbase import TermBase
+
+@pytest.fixture
+def base(tmp_path):
+    base = TermBase(str(tmp_path / "termbase.sqlite3"))
+    yield base
+    base.close()
+
+def term(source, target, category="general"):
+    return {'source': source, 'target': target, 'category': category}
+
+def test_variants_share_an_entry_with_first_spelling(base):
+    base.upsert([term("衛生署", "Department of Health")])
+    base.upsert([term("卫生署", "Department of Health"), term("衞生 署", "Department of Health")])
+    assert base.size() == 1
+    stored = base.get("衛生署")
+    assert stored['source'] == "衛生署" and stored['frequency'] == 3
+    assert base.get("卫生署") == stored
+    assert [t['source'] for t in base.lookup_prefix("衞生")] == ["衛生署"]
+
+def test_most_frequent_target_wins_over_longer(base):
+    base.upsert([term("登革熱", "dengue")])
+    base.upsert([term("登革熱", "dengue")])
+    base.upsert([term("登革熱", "dengue hemorrhagic fever", "medical")])
+    assert base.get("登革熱")['target'] == "dengue"
+    base.upsert([term("登革熱", "Dengue Hemorrhagic Fever", "medical")] * 2)
+    stored = base.get("登革熱")
+    assert stored['target'] == "dengue hemorrhagic fever" and stored['category'] == "medical"
+    assert stored['frequency'] == 5
+
+def test_tie_goes_to_longer_target(base):
+    base.upsert([term("殺幼蟲劑", "larvicide"), term("殺幼蟲劑", "larvicidal agent")])
+    assert base.get("殺幼蟲劑")['target'] == "larvicidal agent"
+
+def test_earlier_termbase_is_rekeyed(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE terms (key TEXT PRIMARY KEY, source TEXT NOT NULL, target TEXT NOT NULL, "
+        "category TEXT NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL, "
+        "frequency INTEGER NOT NULL) WITHOUT ROWID"
+    )
+    conn.execute("CREATE INDEX terms_category ON terms (category, source)")
+    conn.executemany("INSERT INTO terms VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        ("衛生署", "衛生署", "Department of Health", "organization", 1.0, 2.0, 3),
+        ("卫生署", "卫生署", "Health Department", "organization", 2.0, 5.0, 1),
+    ])
+    conn.commit()
+    conn.close()
+    
+    base = TermBase(path)
+    stored = base.get("衞生署")
+    assert base.size() == 1
+    assert stored['source'] == "衛生署" and stored['target'] == "Department of Health"
+    assert (stored['frequency'], stored['first_seen'], stored['last_seen']) == (4, 1.0, 5.0)
+    base.upsert([term("卫生署", "Health Department")] * 3)
+    assert base.get("衛生署")['target'] == "Health Department"
+    assert [t['source'] for t in base.select("organizations")] == ["衛生署"]
+    base.close()
@@ -0,0 +1,36 @@
+# Tests for term views: local re-filtering, re-capping and re-sorting, and which filters a run covers.
+
+from term_extract.terms import TermMerger, TermView
+
+TERMS = [
+    {'source': '衛生署', 'target': 'Department of Health', 'category': 'organization'},
+    {'source': '登革熱', 'target': 'dengue fever', 'category': 'medical'},
+    {'source': '郊野公園', 'target': 'country park', 'category': 'place'},
+    {'source': '伊蚊', 'target': 'Aedes mosquito', 'category': 'medical'},
+]
+
+def view_of(*batches, extracted_filter="all", command=None):
+    merger = TermMerger()
+    for batch in batches:
+        merger.add([dict(t) for t in batch])
+    return TermView(merger, extracted_filter, command)
+
+def test_query_filters_caps_and_sorts():
+    view = view_of(TERMS, TERMS[3:])
+    filtered, capped = view.query("medical", max_terms=1)
+    assert [t['source'] for t in filtered] == ['伊蚊', '登革熱']
+    assert capped == filtered[:1]
+    assert [t['source'] for t in view.query(sort="document")[0]] == ['衛生署', '登革熱', '郊野公園', '伊蚊']
+    assert view.query(sort="frequency")[0][0]['source'] == '伊蚊'
+
+def test_run_for_all_covers_every_filter():
+    view = view_of(TERMS)
+    assert view.covers("medical") and view.covers("places")
+    narrow = view_of(TERMS[1:2], extracted_filter="medical")
+    assert narrow.covers("medical") and not narrow.covers("all")
+
+def test_custom_command_run_only_covers_its_own_command():
+    view = view_of(TERMS, command="只要醫學術語")
+    assert view.covers("all", "只要醫學術語 ")
+    assert not view.covers("medical", "只要醫學術語")
+    assert not view.covers("all", "only places")